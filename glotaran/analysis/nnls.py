@@ -3,6 +3,7 @@ least-squares method."""
 
 import typing
 
+import numba as nb
 import numpy as np
 from scipy.optimize import nnls
 
@@ -19,8 +20,122 @@ def residual_nnls(
     matrix :
         The model matrix.
     data : np.ndarray
-        The data to analyze.
+        The data to analyze. If the data is 2-dimensional, every column is treated as a right
+        hand side for the same matrix.
     """
+    if data.ndim == 2:
+        clps, residuals, _ = residual_nnls_batched(matrix[np.newaxis], data.T)
+        return clps.T, residuals.T
     clp, _ = nnls(matrix, data)
     residual = data - np.dot(matrix, clp)
     return clp, residual
+
+
+def residual_nnls_batched(
+    matrices: np.ndarray, data: np.ndarray, passive_sets: np.ndarray = None
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculates the conditionally linear parameters and residuals of a batch of problems with
+    the nnls method.
+
+    The problems are solved in parallel with the active set method of Lawson and Hanson on
+    the normal equations, as in the fast nnls algorithm of Bro and De Jong. The passive sets of
+    a previous solution can be given as a warm start, which often leaves nothing to do but
+    one solve of the unconstrained problem.
+
+    Parameters
+    ----------
+    matrices : np.ndarray
+        The model matrices with shape `(n_problems, n_rows, n_clp)`, or with shape
+        `(1, n_rows, n_clp)` if all problems share the same matrix.
+    data : np.ndarray
+        The data to analyze with shape `(n_problems, n_rows)`.
+    passive_sets : np.ndarray
+        The passive sets of the previous solution with shape `(n_problems, n_clp)`, which
+        mark the clps which were not constrained to zero.
+
+    Returns
+    -------
+    typing.Tuple[np.ndarray, np.ndarray, np.ndarray]
+        The conditionally linear parameters with shape `(n_problems, n_clp)`, the residuals
+        with shape `(n_problems, n_rows)` and the passive sets with shape
+        `(n_problems, n_clp)`.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    data = np.asarray(data, dtype=np.float64)
+    products = matrices.transpose(0, 2, 1) @ matrices
+    if matrices.shape[0] == 1:
+        projections = data @ matrices[0]
+        products = np.repeat(products, data.shape[0], axis=0)
+    else:
+        projections = (data[:, np.newaxis, :] @ matrices)[:, 0]
+    if passive_sets is None or passive_sets.shape != projections.shape:
+        passive_sets = np.zeros(projections.shape, dtype=np.bool_)
+    else:
+        passive_sets = passive_sets.copy()
+
+    clps = np.zeros(projections.shape, dtype=np.float64)
+    _fast_nnls(products, projections, passive_sets, clps)
+
+    if matrices.shape[0] == 1:
+        residuals = data - clps @ matrices[0].T
+    else:
+        residuals = data - (matrices @ clps[:, :, np.newaxis])[:, :, 0]
+    return clps, residuals, passive_sets
+
+
+@nb.jit(nopython=True, nogil=True, parallel=True)
+def _fast_nnls(products, projections, passive_sets, clps):
+    """Solves the normal equations of the problems under non-negativity constraints.
+
+    The passive sets are used as a start and replaced by the final passive sets.
+    """
+    for k in nb.prange(projections.shape[0]):
+        _solve_nnls(products[k], projections[k], passive_sets[k], clps[k])
+
+
+@nb.jit(nopython=True, nogil=True)
+def _solve_nnls(product, projection, passive, clp):
+    """Solves the normal equations of one problem under non-negativity constraints."""
+    max_iterations = 3 * projection.size
+    tolerance = 10 * np.finfo(np.float64).eps * np.abs(product).sum() * projection.size
+
+    # drop clps from the warm start until the unconstrained solution is feasible
+    solution = _solve_passive(product, projection, passive)
+    while np.any(passive & (solution <= tolerance)):
+        passive &= solution > tolerance
+        solution = _solve_passive(product, projection, passive)
+    clp[:] = solution
+
+    gradient = projection - product @ clp
+    iteration = 0
+    while iteration < max_iterations:
+        candidates = ~passive & (gradient > tolerance)
+        if not np.any(candidates):
+            break
+        passive[np.argmax(np.where(candidates, gradient, -np.inf))] = True
+
+        solution = _solve_passive(product, projection, passive)
+        while np.any(passive & (solution <= tolerance)) and iteration < max_iterations:
+            iteration += 1
+            infeasible = passive & (solution <= tolerance)
+            alpha = np.min(
+                np.where(infeasible, clp / np.maximum(clp - solution, tolerance), np.inf)
+            )
+            clp += alpha * (solution - clp)
+            passive &= clp > tolerance
+            solution = _solve_passive(product, projection, passive)
+        clp[:] = solution
+        gradient = projection - product @ clp
+        iteration += 1
+
+
+@nb.jit(nopython=True, nogil=True)
+def _solve_passive(product, projection, passive):
+    """Solves the normal equations restricted to the passive set, the other clps are zero."""
+    solution = np.zeros(projection.size)
+    indices = np.nonzero(passive)[0]
+    if indices.size != 0:
+        solution[indices] = np.linalg.solve(
+            product[indices][:, indices], projection[indices].copy()
+        )
+    return solution
@@ -3,6 +3,7 @@ from __future__ import annotations
 from warnings import warn
 
 import numpy as np
+from scipy import sparse
 from scipy.optimize import OptimizeResult
 from scipy.optimize import least_squares
 
@@ -44,10 +45,32 @@ def optimize_problem(problem: Problem, verbose: bool = True) -> Result:
     verbose = 2 if verbose else 0
     termination_reason = ""
 
+    jacobian = "2-point"
+    if problem.scheme.variable_projection_jacobian:
+        if problem.has_variable_projection_jacobian:
+            jacobian = _calculate_jacobian
+        else:
+            warn(
+                "The variable projection Jacobian is not available for problems with NNLS or "
+                "additional penalties, falling back to finite differences."
+            )
+
+    jacobian_sparsity = None
+    if problem.scheme.jacobian_sparsity:
+        if callable(jacobian) or method == "lm":
+            warn(
+                "The Jacobian sparsity can only be used for finite differences with the "
+                "'TrustRegionReflection' or 'Dogbox' method, ignoring it."
+            )
+        else:
+            jacobian_sparsity = problem.jacobian_sparsity(free_parameter_labels)
+
     try:
         ls_result = least_squares(
             _calculate_penalty,
             initial_parameter,
+            jac=jacobian,
+            jac_sparsity=jacobian_sparsity,
             bounds=(lower_bounds, upper_bounds),
             method=method,
             max_nfev=nfev,
@@ -65,7 +88,10 @@ def optimize_problem(problem: Problem, verbose: bool = True) -> Result:
 
     problem.save_parameters_for_history()
 
-    return _create_result(problem, ls_result, free_parameter_labels, termination_reason)
+    result = _create_result(problem, ls_result, free_parameter_labels, termination_reason)
+    # the result keeps the problem for lazy result data, which must not keep idle threads alive
+    problem.close()
+    return result
 
 
 def _calculate_penalty(
@@ -74,7 +100,16 @@ def _calculate_penalty(
     problem.save_parameters_for_history()
     problem.parameters.set_from_label_and_value_arrays(free_parameter_labels, parameters)
     problem.reset()
-    return problem.full_penalty
+    # The full penalty is a view of the penalty buffer of the problem, which is overwritten by
+    # the next evaluation. Since least_squares keeps the penalty across iterations, this copy is
+    # the one remaining allocation per evaluation.
+    return problem.full_penalty.copy()
+
+
+def _calculate_jacobian(
+    parameters: np.ndarray, free_parameter_labels: list[str] = None, problem: Problem = None
+):
+    return problem.variable_projection_jacobian(free_parameter_labels, parameters)
 
 
 def _create_result(
@@ -98,10 +133,15 @@ def _create_result(
     reduced_chi_square = chi_square / degrees_of_freedom if success else None
     root_mean_square_error = np.sqrt(reduced_chi_square) if success else None
     jacobian = ls_result.jac if success else None
+    if sparse.issparse(jacobian):
+        jacobian = jacobian.toarray()
 
     problem.save_parameters_for_history()
     history_index = None if success else -2
-    data = problem.create_result_data(history_index=history_index)
+    # the result data copies the residuals, so it does not keep views of the penalty buffer
+    data = problem.create_result_data(
+        history_index=history_index, lazy=problem.scheme.lazy_result_data
+    )
     # the optimized parameters are those of the last run if the optimization has crashed
     parameters = problem.parameters
     covariance_matrix = None
@@ -1,21 +1,30 @@
 from __future__ import annotations
 
 import collections
+import collections.abc
+import functools
 import itertools
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import Callable
-from typing import Deque
 from typing import Dict
 from typing import NamedTuple
 
 import numpy as np
 import xarray as xr
+from scipy import sparse
 
 from glotaran.analysis.nnls import residual_nnls
+from glotaran.analysis.nnls import residual_nnls_batched
+from glotaran.analysis.variable_projection import jacobian_variable_projection
 from glotaran.analysis.variable_projection import residual_variable_projection
+from glotaran.analysis.variable_projection import residual_variable_projection_batched
+from glotaran.io.prepare_dataset import add_svd_to_dataset
 from glotaran.model import DatasetDescriptor
 from glotaran.model import Model
+from glotaran.parameter import Parameter
 from glotaran.parameter import ParameterGroup
 from glotaran.project import Scheme
 
@@ -25,12 +34,26 @@ class ParameterError(ValueError):
         super().__init__("Parameter not initialized")
 
 
+class DatasetArrays(NamedTuple):
+    """The data of a dataset as contiguous numpy arrays.
+
+    The data and the weight have the shape `(model_axis.size, global_axis.size)`.
+    """
+
+    data: np.ndarray
+    weighted_data: np.ndarray
+    weight: np.ndarray | None
+    """The weight of the data or `None` if the dataset is not weighted."""
+    model_axis: np.ndarray
+    global_axis: np.ndarray
+
+
 class ProblemDescriptor(NamedTuple):
     dataset: DatasetDescriptor
-    data: xr.DataArray
+    data: np.ndarray
     model_axis: np.ndarray
     global_axis: np.ndarray
-    weight: xr.DataArray
+    weight: np.ndarray | None
 
 
 class GroupedProblemDescriptor(NamedTuple):
@@ -51,8 +74,174 @@ class GroupedProblem(NamedTuple):
     descriptor: GroupedProblemDescriptor
 
 
+class GroupedBag(collections.abc.Sequence):
+    """A flat storage of the grouped problems.
+
+    The data and weights of all problems are stored in one contiguous buffer each, the
+    problems are described by offsets into the buffers and by the ids of the involved datasets.
+    Indexing the bag returns a :class:`GroupedProblem` with views into the buffers.
+
+    The keys needed by the residual calculation are computed once when the bag is built:
+    the label of every group, if a problem needs scaling and the id of the weight of every
+    problem, which problems of the same group with equal weights share.
+    """
+
+    def __init__(
+        self,
+        data: np.ndarray,
+        weight: np.ndarray,
+        offsets: np.ndarray,
+        dataset_offsets: np.ndarray,
+        dataset_ids: np.ndarray,
+        global_indices: np.ndarray,
+        group_ids: np.ndarray,
+        labels: list[str],
+        global_axes: list[np.ndarray],
+        model_axes: list[np.ndarray],
+        has_scaling: np.ndarray,
+    ):
+        """
+        Parameters
+        ----------
+        data : np.ndarray
+            The concatenated data of all problems.
+        weight : np.ndarray
+            The concatenated weights of all problems.
+        offsets : np.ndarray
+            The start of every problem in the buffers, followed by the size of the buffers.
+        dataset_offsets : np.ndarray
+            The start of every problem in the dataset ids, followed by the number of ids.
+        dataset_ids : np.ndarray
+            The concatenated ids of the datasets involved in the problems.
+        global_indices : np.ndarray
+            The index on the global axis of the dataset for every dataset id.
+        group_ids : np.ndarray
+            The id of the group of every problem.
+        labels : list[str]
+            The labels of the datasets.
+        global_axes : list[np.ndarray]
+            The global axes of the datasets.
+        model_axes : list[np.ndarray]
+            The model axes of the datasets.
+        has_scaling : np.ndarray
+            Indicates for every dataset if it needs scaling.
+        """
+        self.data = data
+        self.weight = weight
+        self.offsets = offsets
+        self.dataset_offsets = dataset_offsets
+        self.dataset_ids = dataset_ids
+        self.global_indices = global_indices
+        self.group_ids = group_ids
+        self.labels = labels
+        self.global_axes = global_axes
+        self.model_axes = model_axes
+        self.has_scaling = has_scaling
+
+        sizes = np.asarray([axis.size for axis in model_axes], dtype=np.int64)[dataset_ids]
+        self._dataset_data_offsets = np.concatenate([[0], np.cumsum(sizes)])[:-1]
+
+        # the keys of the residual calculation only depend on the structure of the bag
+        number_of_groups = group_ids.max() + 1 if group_ids.size else 0
+        first_problems = np.full(number_of_groups, group_ids.size, dtype=np.int64)
+        np.minimum.at(first_problems, group_ids, np.arange(group_ids.size))
+        self.group_labels = [
+            "".join(
+                labels[i]
+                for i in dataset_ids[dataset_offsets[problem] : dataset_offsets[problem + 1]]
+            )
+            for problem in first_problems
+        ]
+        self.problem_has_scaling = (
+            np.logical_or.reduceat(has_scaling[dataset_ids], dataset_offsets[:-1])
+            if len(self)
+            else np.asarray([], dtype=bool)
+        )
+        self.weight_ids = np.empty(len(self), dtype=np.int64)
+        number_of_weights = 0
+        for group_id, problem in enumerate(first_problems):
+            members = np.nonzero(group_ids == group_id)[0]
+            _, weight_ids = np.unique(
+                self.weight[self.positions(members)], axis=0, return_inverse=True
+            )
+            self.weight_ids[members] = weight_ids.ravel() + number_of_weights
+            number_of_weights += weight_ids.max() + 1
+        order = np.argsort(self.weight_ids, kind="stable")
+        self.weight_groups = np.split(
+            order, np.cumsum(np.bincount(self.weight_ids, minlength=number_of_weights))[:-1]
+        )
+
+    def __len__(self) -> int:
+        return self.offsets.size - 1
+
+    def __getitem__(self, index: int) -> GroupedProblem:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("GroupedBag index out of range")
+        start, end = self.offsets[index], self.offsets[index + 1]
+        ids = self.dataset_ids[self.dataset_offsets[index] : self.dataset_offsets[index + 1]]
+        global_indices = self.global_indices[
+            self.dataset_offsets[index] : self.dataset_offsets[index + 1]
+        ]
+        labels = [self.labels[i] for i in ids]
+        return GroupedProblem(
+            data=self.data[start:end],
+            weight=self.weight[start:end],
+            has_scaling=bool(self.has_scaling[ids].any()),
+            group="".join(labels),
+            data_sizes=[self.model_axes[i].size for i in ids],
+            descriptor=[
+                GroupedProblemDescriptor(
+                    self.labels[i], self.global_axes[i][j], self.model_axes[i]
+                )
+                for i, j in zip(ids, global_indices)
+            ],
+        )
+
+    def positions(self, indices: np.ndarray | list[int]) -> np.ndarray:
+        """Returns the positions of the data of problems of the same group in the buffers.
+
+        Parameters
+        ----------
+        indices : np.ndarray | list[int]
+            The indices of the problems, which must have the same size.
+
+        Returns
+        -------
+        np.ndarray
+            The positions with shape `(len(indices), problem_size)`.
+        """
+        indices = np.asarray(indices)
+        size = self.offsets[indices[0] + 1] - self.offsets[indices[0]]
+        return self.offsets[indices, np.newaxis] + np.arange(size)
+
+    def dataset_positions(self, dataset_id: int) -> tuple[np.ndarray, np.ndarray]:
+        """Returns where the data of a dataset is stored in the buffers.
+
+        Parameters
+        ----------
+        dataset_id : int
+            The id of the dataset.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The global indices of the dataset which are part of the bag and the positions of
+            the data at these indices in the buffers with shape
+            `(global_indices.size, model_axis.size)`.
+        """
+        is_member = self.dataset_ids == dataset_id
+        positions = self._dataset_data_offsets[is_member, np.newaxis] + np.arange(
+            self.model_axes[dataset_id].size
+        )
+        return self.global_indices[is_member], positions
+
+
 UngroupedBag = Dict[str, ProblemDescriptor]
-GroupedBag = Deque[GroupedProblem]
+
+# marks the worker threads of a problem, which must not submit to the thread pool again
+_worker_state = threading.local()
 
 
 class LabelAndMatrix(NamedTuple):
@@ -86,8 +275,18 @@ class Problem:
         self._residual_function = (
             residual_nnls if scheme.non_negative_least_squares else residual_variable_projection
         )
+        self._number_of_threads = scheme.number_of_threads
+        self._executor = None
+        self._closed = False
         self._parameters = None
+        self._parameter_values = None
+        self._parameter_dependencies = None
         self._filled_dataset_descriptors = None
+        self._matrix_cache = {}
+        self._nnls_passive_sets = {}
+        self._matrix_segments = {}
+        self._combine_column_maps = {}
+        self._ungroup_column_maps = {}
 
         self.parameters = scheme.parameters.copy()
         self._parameter_history = []
@@ -98,14 +297,28 @@ class Problem:
         self._matrices = None
         self._reduced_clp_labels = None
         self._reduced_matrices = None
+        self._grouped_clps = None
         self._reduced_clps = None
         self._clps = None
         self._weighted_residuals = None
         self._residuals = None
         self._additional_penalty = None
         self._full_axis = None
+        self._bag_indices = None
         self._full_penalty = None
 
+        self._additional_penalty_size = self._get_additional_penalty_size()
+        self._penalty_buffer = np.empty(
+            self._get_residual_size() + (self._additional_penalty_size or 0), dtype=np.float64
+        )
+        self._grouped_residual_view_cache = None
+        self._prepared_additional_penalty = (
+            self._model.prepare_additional_penalty_function(self)
+            if self._additional_penalty_size != 0
+            and callable(self._model.prepare_additional_penalty_function)
+            else None
+        )
+
     @property
     def scheme(self) -> Scheme:
         """Property providing access to the used scheme
@@ -142,6 +355,7 @@ class Problem:
     @parameters.setter
     def parameters(self, parameters: ParameterGroup):
         self._parameters = parameters
+        self._parameter_values = None
         self.reset()
 
     @property
@@ -209,7 +423,7 @@ class Problem:
         self,
     ) -> dict[str, list[np.ndarray]]:
         if self._reduced_clps is None:
-            self.calculate_residual()
+            self.calculate_clps()
         return self._reduced_clps
 
     @property
@@ -217,7 +431,7 @@ class Problem:
         self,
     ) -> dict[str, list[np.ndarray]]:
         if self._clps is None:
-            self.calculate_residual()
+            self.calculate_clps()
         return self._clps
 
     @property
@@ -231,9 +445,9 @@ class Problem:
     @property
     def residuals(
         self,
-    ) -> dict[str, list[np.ndarray]]:
+    ) -> dict[str, list[np.ndarray]] | list[np.ndarray]:
         if self._residuals is None:
-            self.calculate_residual()
+            self.calculate_unweighted_residual()
         return self._residuals
 
     @property
@@ -246,32 +460,76 @@ class Problem:
 
     @property
     def full_penalty(self) -> np.ndarray:
+        """The weighted residuals followed by the additional penalty.
+
+        The full penalty is written into a buffer, which is allocated once when the problem is
+        created. The returned array is a view of this buffer and is overwritten by the next
+        calculation, so callers which keep it, e.g. between evaluations of the optimizer, have
+        to copy it.
+
+        If the model has an additional penalty but no ``additional_penalty_size_function``, the
+        size of the penalty is unknown when the problem is created and the full penalty is
+        newly allocated on every calculation.
+        """
         if self._full_penalty is None:
-            residuals = self.weighted_residuals
+            self.weighted_residuals
             additional_penalty = self.additional_penalty
-            if not self.grouped:
-                residuals = [np.concatenate(residuals[label]) for label in residuals.keys()]
-
-            self._full_penalty = (
-                np.concatenate((np.concatenate(residuals), additional_penalty))
-                if additional_penalty is not None
-                else np.concatenate(residuals)
-            )
+            if additional_penalty is None:
+                self._full_penalty = self._penalty_buffer
+            elif self._additional_penalty_size is None:
+                self._full_penalty = np.concatenate([self._residual_buffer(), additional_penalty])
+            elif additional_penalty.size != self._additional_penalty_size:
+                raise ValueError(
+                    f"The additional penalty function returned {additional_penalty.size} "
+                    f"penalties, but the model specifies {self._additional_penalty_size}."
+                )
+            else:
+                self._penalty_buffer[
+                    self._penalty_buffer.size - additional_penalty.size :
+                ] = additional_penalty
+                self._full_penalty = self._penalty_buffer
         return self._full_penalty
 
     @property
     def cost(self) -> float:
-        return np.sum(self._full_penalty)
+        return np.sum(self.full_penalty)
 
     def save_parameters_for_history(self):
         self._parameter_history.append(self._parameters)
 
     def reset(self):
-        """Resets all results and `DatasetDescriptors`. Use after updating parameters."""
-        self._filled_dataset_descriptors = {
-            label: descriptor.fill(self._model, self._parameters)
-            for label, descriptor in self._model.dataset.items()
-        }
+        """Resets all results and `DatasetDescriptors`. Use after updating parameters.
+
+        Only the `DatasetDescriptors` and matrices of datasets depending on a changed parameter
+        are recalculated.
+        """
+        parameter_values = {label: parameter.value for label, parameter in self._parameters.all()}
+        if self._parameter_values is None:
+            changed_datasets = set(self._model.dataset)
+        else:
+            changed_datasets = {
+                dataset_label
+                for label, value in parameter_values.items()
+                if value != self._parameter_values.get(label)
+                for dataset_label in self._parameter_dependencies.get(label, ())
+            }
+        self._parameter_values = parameter_values
+
+        if self._filled_dataset_descriptors is None:
+            self._filled_dataset_descriptors = {}
+        for label, descriptor in self._model.dataset.items():
+            if label in changed_datasets:
+                self._filled_dataset_descriptors[label] = descriptor.fill(
+                    self._model, self._parameters
+                )
+                self._matrix_cache.pop(label, None)
+
+        if self._parameter_dependencies is None:
+            self._parameter_dependencies = collections.defaultdict(set)
+            for label, descriptor in self._filled_dataset_descriptors.items():
+                for parameter_label in _get_parameter_labels(descriptor):
+                    self._parameter_dependencies[parameter_label].add(label)
+
         self._reset_results()
 
     def _reset_results(self):
@@ -279,6 +537,7 @@ class Problem:
         self._matrices = None
         self._reduced_clp_labels = None
         self._reduced_matrices = None
+        self._grouped_clps = None
         self._reduced_clps = None
         self._clps = None
         self._weighted_residuals = None
@@ -287,7 +546,10 @@ class Problem:
         self._full_penalty = None
 
     def _prepare_data(self, data: dict[str, xr.DataArray | xr.Dataset]):
+        """Prepares the datasets and converts them into the numpy arrays the calculations run
+        on, so xarray is only used to create the result data."""
         self._data = {}
+        self._dataset_arrays = {}
         for label, dataset in data.items():
             if self.model.model_dimension not in dataset.dims:
                 raise ValueError(
@@ -307,17 +569,27 @@ class Problem:
             dataset = self._transpose_dataset(dataset)
             self._add_weight(label, dataset)
 
-            # TODO: avoid computation if not requested
-            l, s, r = np.linalg.svd(dataset.data, full_matrices=False)
-            dataset["data_left_singular_vectors"] = (("time", "left_singular_value_index"), l)
-            dataset["data_singular_values"] = (("singular_value_index"), s)
-            dataset["data_right_singular_vectors"] = (
-                ("right_singular_value_index", "spectral"),
-                r,
-            )
-
+            arrays = self._create_dataset_arrays(dataset)
+            if arrays.weight is not None:
+                dataset["weighted_data"] = (dataset.data.dims, arrays.weighted_data)
+            self._dataset_arrays[label] = arrays
             self._data[label] = dataset
 
+    def _create_dataset_arrays(self, dataset: xr.Dataset) -> DatasetArrays:
+        data = np.ascontiguousarray(dataset.data.values, dtype=np.float64)
+        weight = (
+            np.ascontiguousarray(dataset.weight.values, dtype=np.float64)
+            if "weight" in dataset
+            else None
+        )
+        return DatasetArrays(
+            data=data,
+            weighted_data=data if weight is None else data * weight,
+            weight=weight,
+            model_axis=np.ascontiguousarray(dataset.coords[self._model_dimension].values),
+            global_axis=np.ascontiguousarray(dataset.coords[self._global_dimension].values),
+        )
+
     def _transpose_dataset(self, dataset):
         new_dims = [self.model.model_dimension, self.model.global_dimension]
         new_dims += [
@@ -369,111 +641,86 @@ class Problem:
     def _init_ungrouped_bag(self):
         self._bag = {}
         for label in self._scheme.model.dataset:
-            dataset = self._data[label]
-            data = dataset.data
-            weight = dataset.weight if "weight" in dataset else None
-            if weight is not None:
-                data = data * weight
-                dataset["weighted_data"] = data
+            arrays = self._dataset_arrays[label]
             self._bag[label] = ProblemDescriptor(
                 self._scheme.model.dataset[label],
-                data,
-                dataset.coords[self._model_dimension].values,
-                dataset.coords[self._global_dimension].values,
-                weight,
+                arrays.weighted_data,
+                arrays.model_axis,
+                arrays.global_axis,
+                arrays.weight,
             )
 
     def _init_grouped_bag(self):
-        datasets = None
-        for label in self._model.dataset:
-            dataset = self._data[label]
-            if "weight" in dataset:
-                weight = dataset.weight
-                data = dataset.data * weight
-                dataset["weighted_data"] = data
-            else:
-                weight = xr.DataArray(np.ones_like(dataset.data), coords=dataset.data.coords)
-                data = dataset.data
-            global_axis = dataset.coords[self._global_dimension].values
-            model_axis = dataset.coords[self._model_dimension].values
-            has_scaling = self._model.dataset[label].scale is not None
-            if self._bag is None:
-                self._bag = collections.deque(
-                    GroupedProblem(
-                        data=data.isel({self._global_dimension: i}).values,
-                        weight=weight.isel({self._global_dimension: i}).values,
-                        has_scaling=has_scaling,
-                        group=label,
-                        data_sizes=[data.isel({self._global_dimension: i}).values.size],
-                        descriptor=[GroupedProblemDescriptor(label, value, model_axis)],
-                    )
-                    for i, value in enumerate(global_axis)
-                )
-                datasets = collections.deque([label] for _, _ in enumerate(global_axis))
-                self._full_axis = collections.deque(global_axis)
-            else:
-                self._append_to_grouped_bag(
-                    label, datasets, global_axis, model_axis, data, weight, has_scaling
-                )
-        self._full_axis = np.asarray(self._full_axis)
-        self._groups = {"".join(d): d for d in datasets}
-
-    def _append_to_grouped_bag(
-        self,
-        label: str,
-        datasets: Deque[str],
-        global_axis: np.ndarray,
-        model_axis: np.ndarray,
-        data: xr.DataArray,
-        weight: xr.DataArray,
-        has_scaling: bool,
-    ):
-        i1, i2 = _find_overlap(self._full_axis, global_axis, atol=self._scheme.group_tolerance)
-
-        for i, j in enumerate(i1):
-            datasets[j].append(label)
-            data_stripe = data.isel({self._global_dimension: i2[i]}).values
-            self._bag[j] = GroupedProblem(
-                data=np.concatenate(
-                    [
-                        self._bag[j].data,
-                        data_stripe,
-                    ]
-                ),
-                weight=np.concatenate(
-                    [
-                        self._bag[j].weight,
-                        weight.isel({self._global_dimension: i2[i]}).values,
-                    ]
-                ),
-                has_scaling=has_scaling or self._bag[j].has_scaling,
-                group=self._bag[j].group + label,
-                data_sizes=self._bag[j].data_sizes + [data_stripe.size],
-                descriptor=self._bag[j].descriptor
-                + [GroupedProblemDescriptor(label, global_axis[i2[i]], model_axis)],
+        labels = list(self._model.dataset)
+
+        # align the global axes of all datasets on one full axis, the bag indices map every
+        # global index of a dataset to the position in the full axis it is grouped into
+        self._full_axis = np.asarray([], dtype=np.float64)
+        self._bag_indices = {}
+        for label in labels:
+            global_axis = self._dataset_arrays[label].global_axis
+            self._full_axis, full_axis_indices, self._bag_indices[label] = _align_axis(
+                self._full_axis, global_axis, atol=self._scheme.group_tolerance
             )
+            for previous_label in self._bag_indices:
+                if previous_label != label:
+                    self._bag_indices[previous_label] = full_axis_indices[
+                        self._bag_indices[previous_label]
+                    ]
 
-        # Add non-overlaping regions
-        begin_overlap = i2[0] if len(i2) != 0 else 0
-        end_overlap = i2[-1] + 1 if len(i2) != 0 else 0
-        for i in itertools.chain(range(begin_overlap), range(end_overlap, len(global_axis))):
-            data_stripe = data.isel({self._global_dimension: i}).values
-            problem = GroupedProblem(
-                data=data_stripe,
-                weight=weight.isel({self._global_dimension: i}).values,
-                has_scaling=has_scaling,
-                group=label,
-                data_sizes=[data_stripe.size],
-                descriptor=[GroupedProblemDescriptor(label, global_axis[i], model_axis)],
-            )
-            if i < end_overlap:
-                datasets.appendleft([label])
-                self._full_axis.appendleft(global_axis[i])
-                self._bag.appendleft(problem)
-            else:
-                datasets.append([label])
-                self._full_axis.append(global_axis[i])
-                self._bag.append(problem)
+        # the membership holds the global index of every dataset at every position in the full
+        # axis or -1 if the dataset is not part of the group
+        membership = np.full((self._full_axis.size, len(labels)), -1, dtype=np.int64)
+        for i, label in enumerate(labels):
+            membership[self._bag_indices[label], i] = np.arange(self._bag_indices[label].size)
+        is_member = membership >= 0
+        problem_ids, dataset_ids = np.nonzero(is_member)
+        global_indices = membership[is_member]
+
+        model_axes = [self._dataset_arrays[label].model_axis for label in labels]
+        sizes = np.asarray([axis.size for axis in model_axes], dtype=np.int64)[dataset_ids]
+        starts = np.concatenate([[0], np.cumsum(sizes)])
+        data = np.empty(starts[-1], dtype=np.float64)
+        weight = np.ones(starts[-1], dtype=np.float64)
+        for i, label in enumerate(labels):
+            arrays = self._dataset_arrays[label]
+            members = dataset_ids == i
+            positions = starts[:-1][members, np.newaxis] + np.arange(model_axes[i].size)
+            dataset_indices = global_indices[members]
+            data[positions] = arrays.weighted_data[:, dataset_indices].T
+            if arrays.weight is not None:
+                weight[positions] = arrays.weight[:, dataset_indices].T
+
+        members_per_problem = np.bincount(problem_ids, minlength=self._full_axis.size)
+        dataset_offsets = np.concatenate([[0], np.cumsum(members_per_problem)])
+
+        # the groups are numbered in order of their first appearance in the bag
+        _, first_problems, group_ids = np.unique(
+            is_member, axis=0, return_index=True, return_inverse=True
+        )
+        group_order = np.argsort(first_problems)
+        group_ranks = np.empty_like(group_order)
+        group_ranks[group_order] = np.arange(group_order.size)
+        self._groups = {}
+        for first_problem in first_problems[group_order]:
+            group_labels = [labels[i] for i in np.nonzero(is_member[first_problem])[0]]
+            self._groups["".join(group_labels)] = group_labels
+
+        self._bag = GroupedBag(
+            data=data,
+            weight=weight,
+            offsets=starts[dataset_offsets],
+            dataset_offsets=dataset_offsets,
+            dataset_ids=dataset_ids,
+            global_indices=global_indices,
+            group_ids=group_ranks[group_ids.ravel()],
+            labels=labels,
+            global_axes=[self._dataset_arrays[label].global_axis for label in labels],
+            model_axes=model_axes,
+            has_scaling=np.asarray(
+                [self._model.dataset[label].scale is not None for label in labels]
+            ),
+        )
 
     def calculate_matrices(self):
         if self._index_dependent:
@@ -498,24 +745,6 @@ class Problem:
         if self._parameters is None:
             raise ParameterError
 
-        def calculate_group(
-            group: GroupedProblem, descriptors: dict[str, DatasetDescriptor]
-        ) -> tuple[list[tuple[LabelAndMatrix, str]], float]:
-            result = [
-                (
-                    _calculate_matrix(
-                        self._model.matrix,
-                        descriptors[problem.label],
-                        problem.axis,
-                        {},
-                        index=problem.index,
-                    ),
-                    problem.label,
-                )
-                for problem in group.descriptor
-            ]
-            return result, group.descriptor[0].index
-
         def reduce_and_combine_matrices(
             results: tuple[list[tuple[LabelAndMatrix, str]], float],
         ) -> LabelAndMatrix:
@@ -528,28 +757,46 @@ class Problem:
                     index_results,
                 )
             )
-            clp, matrix = _combine_matrices(constraint_labels_and_matrices)
-            return LabelAndMatrix(clp, matrix)
-
-        results = list(
-            map(lambda group: calculate_group(group, self._filled_dataset_descriptors), self._bag)
-        )
-
-        clp_labels = list(map(lambda result: [r[0].clp_label for r in result[0]], results))
-        matrices = list(map(lambda result: [r[0].matrix for r in result[0]], results))
+            return _combine_matrices(constraint_labels_and_matrices, self._combine_column_maps)
 
         self._clp_labels = {}
         self._matrices = {}
+        for label in self._model.dataset:
+            matrices = self._calculate_index_dependent_matrices(label)
+            self._clp_labels[label] = [result.clp_label for result in matrices]
+            self._matrices[label] = [result.matrix for result in matrices]
+
+        # problems whose datasets are all in the same matrix segments share the reduced matrix
+        bag = self.bag
+        results = {}
+        keys = []
+        for i in range(len(bag)):
+            members = slice(bag.dataset_offsets[i], bag.dataset_offsets[i + 1])
+            labels = [bag.labels[dataset_id] for dataset_id in bag.dataset_ids[members]]
+            global_indices = bag.global_indices[members]
+            segments = [self._get_matrix_segments(label) for label in labels]
+            key = (
+                tuple(
+                    (label, segment[index])
+                    for label, segment, index in zip(labels, segments, global_indices)
+                )
+                if all(segment is not None for segment in segments)
+                else i
+            )
+            keys.append(key)
+            if key not in results:
+                results[key] = (
+                    [
+                        (self._matrix_cache[label][index], label)
+                        for label, index in zip(labels, global_indices)
+                    ],
+                    bag.global_axes[bag.dataset_ids[members][0]][global_indices[0]],
+                )
 
-        for i, grouped_problem in enumerate(self._bag):
-            for j, descriptor in enumerate(grouped_problem.descriptor):
-                if descriptor.label not in self._clp_labels:
-                    self._clp_labels[descriptor.label] = []
-                    self._matrices[descriptor.label] = []
-                self._clp_labels[descriptor.label].append(clp_labels[i][j])
-                self._matrices[descriptor.label].append(matrices[i][j])
-
-        reduced_results = list(map(reduce_and_combine_matrices, results))
+        reduced_results = dict(
+            zip(results, self._map(reduce_and_combine_matrices, results.values()))
+        )
+        reduced_results = [reduced_results[key] for key in keys]
         self._reduced_clp_labels = list(map(lambda result: result.clp_label, reduced_results))
         self._reduced_matrices = list(map(lambda result: result.matrix, reduced_results))
         return self._clp_labels, self._matrices, self._reduced_clp_labels, self._reduced_matrices
@@ -571,37 +818,114 @@ class Problem:
         self._reduced_matrices = {}
 
         for label, problem in self.bag.items():
-            self._clp_labels[label] = []
-            self._matrices[label] = []
-            self._reduced_clp_labels[label] = []
-            self._reduced_matrices[label] = []
-            descriptor = self._filled_dataset_descriptors[label]
+            results = self._calculate_index_dependent_matrices(label)
+            segments = self._get_matrix_segments(label)
+            # with matrix segments only the first index of every segment is reduced
+            indices = (
+                range(len(results))
+                if segments is None
+                else np.unique(segments, return_index=True)[1]
+            )
+            reduced_results = self._map(
+                lambda index: _reduce_matrix(
+                    self._model,
+                    label,
+                    self._parameters,
+                    results[index],
+                    problem.global_axis[index],
+                ),
+                indices,
+            )
+            if segments is not None:
+                reduced_results = [reduced_results[segment] for segment in segments]
+
+            self._clp_labels[label] = [result.clp_label for result in results]
+            self._matrices[label] = [result.matrix for result in results]
+            self._reduced_clp_labels[label] = [reduced.clp_label for reduced in reduced_results]
+            self._reduced_matrices[label] = [reduced.matrix for reduced in reduced_results]
+
+        return self._clp_labels, self._matrices, self._reduced_clp_labels, self._reduced_matrices
 
-            for index in problem.global_axis:
+    def _calculate_index_dependent_matrices(self, label: str) -> list[LabelAndMatrix]:
+        """Calculates the matrices of a dataset for every index on the global axis.
+
+        The matrices are cached until a parameter of the dataset changes.
+        """
+        if label not in self._matrix_cache:
+            descriptor = self._filled_dataset_descriptors[label]
+            arrays = self._dataset_arrays[label]
+            if self._get_matrix_segments(label) is None:
+                result = (
+                    self._model.matrices(
+                        dataset_descriptor=descriptor,
+                        axis=arrays.model_axis,
+                        global_axis=arrays.global_axis,
+                    )
+                    if self._model.matrices is not None
+                    else None
+                )
+                if result is not None:
+                    # the model calculated the matrices for all indices at once
+                    clp_label, matrices = result
+                    self._matrix_cache[label] = [
+                        LabelAndMatrix(clp_label, matrix) for matrix in matrices
+                    ]
+                else:
+                    self._matrix_cache[label] = self._map(
+                        lambda index: _calculate_matrix(
+                            self._model.matrix, descriptor, arrays.model_axis, {}, index=index
+                        ),
+                        arrays.global_axis,
+                    )
+            else:
+                # the matrix does not depend on the index, so it is calculated only once
                 result = _calculate_matrix(
                     self._model.matrix,
                     descriptor,
-                    problem.model_axis,
+                    arrays.model_axis,
                     {},
-                    index=index,
+                    index=arrays.global_axis[0],
                 )
+                self._matrix_cache[label] = [result] * arrays.global_axis.size
+        return self._matrix_cache[label]
 
-                self._clp_labels[label].append(result.clp_label)
-                self._matrices[label].append(result.matrix)
-                reduced_labels_and_matrix = _reduce_matrix(
-                    self._model, label, self._parameters, result, index
-                )
-                self._reduced_clp_labels[label].append(reduced_labels_and_matrix.clp_label)
-                self._reduced_matrices[label].append(reduced_labels_and_matrix.matrix)
+    def _get_matrix_segments(self, label: str) -> np.ndarray | None:
+        """Returns the matrix segments of a dataset.
 
-        return self._clp_labels, self._matrices, self._reduced_clp_labels, self._reduced_matrices
+        A matrix segment is a set of indices on the global axis with the same matrix signature
+        (see :func:`glotaran.model.model`), which share the same reduced matrix.
+
+        Returns
+        -------
+        np.ndarray | None
+            The id of the segment of every index on the global axis, numbered in order of
+            their first appearance, or `None` if the matrix of the dataset has to be
+            calculated for every index.
+        """
+        if label not in self._matrix_segments:
+            segments = None
+            if callable(self._model.matrix_signature_function):
+                signatures = [
+                    self._model.matrix_signature_function(label, index)
+                    for index in self._dataset_arrays[label].global_axis
+                ]
+                if all(signature is not None for signature in signatures):
+                    segment_ids = {}
+                    segments = np.asarray(
+                        [
+                            segment_ids.setdefault(signature, len(segment_ids))
+                            for signature in signatures
+                        ]
+                    )
+            self._matrix_segments[label] = segments
+        return self._matrix_segments[label]
 
     def calculate_index_independent_grouped_matrices(
         self,
     ) -> tuple[dict[str, list[str]], dict[str, np.ndarray], dict[str, LabelAndMatrix],]:
         # We just need to create groups from the ungrouped matrices
         self.calculate_index_independent_ungrouped_matrices()
-        for group_label, group in self._groups.items():
+        for group_label, group in self.groups.items():
             if group_label not in self._matrices:
                 reduced_labels_and_matrix = _combine_matrices(
                     [
@@ -609,7 +933,8 @@ class Problem:
                             self._reduced_clp_labels[label], self._reduced_matrices[label]
                         )
                         for label in group
-                    ]
+                    ],
+                    self._combine_column_maps,
                 )
                 self._reduced_clp_labels[group_label] = reduced_labels_and_matrix.clp_label
                 self._reduced_matrices[group_label] = reduced_labels_and_matrix.matrix
@@ -632,24 +957,44 @@ class Problem:
         self._reduced_clp_labels = {}
         self._reduced_matrices = {}
 
-        for label, descriptor in self._filled_dataset_descriptors.items():
-            axis = self._data[label].coords[self._model_dimension].values
-            result = _calculate_matrix(
-                self._model.matrix,
-                descriptor,
-                axis,
-                {},
-            )
+        def calculate_and_reduce_matrix(
+            label: str, descriptor: DatasetDescriptor
+        ) -> tuple[LabelAndMatrix, LabelAndMatrix]:
+            if label not in self._matrix_cache:
+                self._matrix_cache[label] = _calculate_matrix(
+                    self._model.matrix,
+                    descriptor,
+                    self._dataset_arrays[label].model_axis,
+                    {},
+                )
+            result = self._matrix_cache[label]
+            return result, _reduce_matrix(self._model, label, self._parameters, result, None)
+
+        results = self._map(
+            calculate_and_reduce_matrix,
+            self._filled_dataset_descriptors.keys(),
+            self._filled_dataset_descriptors.values(),
+        )
 
+        for label, (result, reduced_result) in zip(self._filled_dataset_descriptors, results):
             self._clp_labels[label] = result.clp_label
             self._matrices[label] = result.matrix
-            reduced_result = _reduce_matrix(self._model, label, self._parameters, result, None)
             self._reduced_clp_labels[label] = reduced_result.clp_label
             self._reduced_matrices[label] = reduced_result.matrix
 
         return self._clp_labels, self._matrices, self._reduced_clp_labels, self._reduced_matrices
 
     def calculate_residual(self):
+        """Calculates the weighted residuals and the reduced clps.
+
+        The clps of the datasets and the unweighted residuals are only calculated on demand
+        by :meth:`calculate_clps` and :meth:`calculate_unweighted_residual`, since they are
+        not needed to calculate the penalty during the optimization.
+        """
+        self._grouped_clps = None
+        self._reduced_clps = None
+        self._clps = None
+        self._residuals = None
         if self._index_dependent:
             if self._grouped:
                 self.calculate_index_dependent_grouped_residual()
@@ -663,219 +1008,417 @@ class Problem:
 
     def calculate_index_dependent_grouped_residual(
         self,
-    ) -> tuple[list[np.ndarray], list[np.ndarray], list[np.ndarray], list[np.ndarray],]:
-        def residual_function(
-            problem: GroupedProblem, matrix: np.ndarray
-        ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-
-            matrix = matrix.copy()
-            for i in range(matrix.shape[1]):
-                matrix[:, i] *= problem.weight
-            data = problem.data
-            if problem.has_scaling:
-                for i, descriptor in enumerate(problem.descriptor):
-                    label = descriptor.label
-                    if self.filled_dataset_descriptors[label] is not None:
-                        start = sum(problem.data_sizes[0:i])
-                        end = start + problem.data_sizes[i]
-                        matrix[start:end, :] *= self.filled_dataset_descriptors[label].scale
-
-            clp, residual = self._residual_function(matrix, data)
-            return clp, residual, residual / problem.weight
-
-        results = list(map(residual_function, self.bag, self.reduced_matrices))
-
-        self._weighted_residuals = list(map(lambda result: result[1], results))
-        self._residuals = list(map(lambda result: result[2], results))
-
-        reduced_clps = list(map(lambda result: result[0], results))
-        self._ungroup_clps(reduced_clps)
+    ) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        bag = self.bag
+        self._grouped_clps = [None] * len(bag)
+        self._weighted_residuals = self._grouped_residual_views()
+        # the matrices are calculated before mapping, not lazily in the worker threads
+        reduced_matrices = self.reduced_matrices
+
+        # problems in the same matrix segments share the reduced matrix object
+        bag_indices = collections.defaultdict(list)
+        for indices in bag.weight_groups:
+            for i in indices:
+                bag_indices[(bag.weight_ids[i], id(reduced_matrices[i]))].append(i)
+        self._map(
+            lambda indices: self._calculate_grouped_residual_with_shared_matrix(
+                indices, reduced_matrices[indices[0]]
+            ),
+            bag_indices.values(),
+        )
 
-        return self._reduced_clps, self._clps, self._weighted_residuals, self._residuals
+        return self._grouped_clps, self._weighted_residuals
 
     def calculate_index_dependent_ungrouped_residual(
         self,
-    ) -> tuple[
-        dict[str, list[np.ndarray]],
-        dict[str, list[np.ndarray]],
-        dict[str, list[np.ndarray]],
-        dict[str, list[np.ndarray]],
-    ]:
+    ) -> tuple[dict[str, list[np.ndarray]], dict[str, list[np.ndarray]]]:
 
         self._reduced_clps = {}
-        self._weighted_residuals = {}
-        self._residuals = {}
+        self._weighted_residuals = self._ungrouped_residual_views()
 
         for label, problem in self.bag.items():
-            self._reduced_clps[label] = []
-            self._residuals[label] = []
-            self._weighted_residuals[label] = []
-            data = problem.data
-            for i in range(len(problem.global_axis)):
-                matrix_at_index = self.reduced_matrices[label][i]
-
-                if problem.dataset.scale is not None:
-                    matrix_at_index *= self.filled_dataset_descriptors[label].scale
-                if problem.weight is not None:
-                    matrix_at_index = matrix_at_index.copy()
-                    for j in range(matrix_at_index.shape[1]):
-                        matrix_at_index[:, j] *= problem.weight.isel({self._global_dimension: i})
-                clp, residual = self._residual_function(
-                    matrix_at_index, data.isel({self._global_dimension: i}).values
-                )
+            weighted_residuals = self._weighted_residuals[label]
+            self._reduced_clps[label] = self._calculate_batched_ungrouped_residual(
+                label, problem, weighted_residuals
+            )
+            self._weighted_residuals[label] = list(weighted_residuals.T)
 
-                self._reduced_clps[label].append(clp)
-                self._weighted_residuals[label].append(residual)
-                if problem.weight is not None:
-                    self._residuals[label].append(
-                        residual / problem.weight.isel({self._global_dimension: i})
-                    )
-                else:
-                    self._residuals[label].append(residual)
+        return self._reduced_clps, self._weighted_residuals
 
-        self._clps = (
-            self.model.retrieve_clp_function(
-                self.parameters,
-                self.clp_labels,
-                self.reduced_clp_labels,
-                self.reduced_clps,
-                self.data,
-            )
-            if callable(self.model.retrieve_clp_function)
-            else self.reduced_clps
+    def _calculate_batched_ungrouped_residual(
+        self, label: str, problem: ProblemDescriptor, weighted_residuals: np.ndarray
+    ) -> list[np.ndarray]:
+        """Calculates the weighted residuals of all indices of a dataset, solving all indices
+        with matrices of the same shape in one batch, or all indices of a matrix segment with
+        multiple right hand sides.
+
+        The weighted residuals are written into the given array, the reduced clps of every
+        index are returned. With non-negative least squares the passive sets of the batch are
+        kept as a warm start for the next evaluation.
+        """
+        matrices = self.reduced_matrices[label]
+        data = problem.data
+        scale = (
+            self.filled_dataset_descriptors[label].scale
+            if problem.dataset.scale is not None
+            else None
         )
 
-        return self._reduced_clps, self._clps, self._weighted_residuals, self._residuals
+        segments = self._get_matrix_segments(label)
+        if segments is not None:
+            # the indices of a matrix segment share the matrix and are solved together
+            clps = [None] * len(matrices)
+            for segment in range(segments.max() + 1):
+                indices = np.nonzero(segments == segment)[0]
+                matrix = matrices[indices[0]]
+                if scale is not None:
+                    matrix = matrix * scale
+                (
+                    segment_clps,
+                    weighted_residuals[:, indices],
+                ) = self._calculate_residual_with_shared_matrix(
+                    matrix,
+                    data[:, indices],
+                    None if problem.weight is None else problem.weight[:, indices],
+                )
+                for i, clp in zip(indices, segment_clps.T):
+                    clps[i] = clp
+            return clps
+
+        batches = collections.defaultdict(list)
+        for i, matrix in enumerate(matrices):
+            batches[matrix.shape].append(i)
+
+        clps = [None] * len(matrices)
+        for indices in batches.values():
+            # the transposed matrices are stacked, so the kernel can decompose them in place
+            batch = np.stack([matrices[i].T for i in indices]).swapaxes(1, 2)
+            if scale is not None:
+                batch *= scale
+            if problem.weight is not None:
+                batch *= problem.weight[:, indices].T[:, :, np.newaxis]
+            if self._scheme.non_negative_least_squares:
+                key = (label, matrices[indices[0]].shape)
+                batch_clps, residuals, self._nnls_passive_sets[key] = residual_nnls_batched(
+                    batch, data[:, indices].T, self._nnls_passive_sets.get(key)
+                )
+            else:
+                batch_clps, residuals = residual_variable_projection_batched(
+                    batch, data[:, indices].T, overwrite_matrices=True
+                )
+            weighted_residuals[:, indices] = residuals.T
+            for i, clp in zip(indices, batch_clps):
+                clps[i] = clp
+        return clps
 
     def calculate_index_independent_grouped_residual(
         self,
-    ) -> tuple[list[np.ndarray], list[np.ndarray], list[np.ndarray], list[np.ndarray],]:
-        def residual_function(problem: GroupedProblem):
-            matrix = self.reduced_matrices[problem.group].copy()
-            for i in range(matrix.shape[1]):
-                matrix[:, i] *= problem.weight
-            data = problem.data
-            if problem.has_scaling:
-                for i, descriptor in enumerate(problem.descriptor):
-                    label = descriptor.label
-                    if self.filled_dataset_descriptors[label] is not None:
-                        start = sum(problem.data_sizes[0:i])
-                        end = start + problem.data_sizes[i]
-                        matrix[start:end, :] *= self.filled_dataset_descriptors[label].scale
-            clp, residual = self._residual_function(matrix, data)
-            return clp, residual, residual / problem.weight
-
-        results = list(map(residual_function, self.bag))
-
-        self._weighted_residuals = list(map(lambda result: result[1], results))
-        self._residuals = list(map(lambda result: result[2], results))
-
-        reduced_clps = list(map(lambda result: result[0], results))
-        self._ungroup_clps(reduced_clps)
-
-        return self._reduced_clps, self._clps, self._weighted_residuals, self._residuals
+    ) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        bag = self.bag
+        self._grouped_clps = [None] * len(bag)
+        self._weighted_residuals = self._grouped_residual_views()
+        # the matrices are calculated before mapping, not lazily in the worker threads
+        reduced_matrices = self.reduced_matrices
+
+        self._map(
+            lambda indices: self._calculate_grouped_residual_with_shared_matrix(
+                indices, reduced_matrices[bag.group_labels[bag.group_ids[indices[0]]]]
+            ),
+            bag.weight_groups,
+        )
+
+        return self._grouped_clps, self._weighted_residuals
+
+    def _calculate_grouped_residual_with_shared_matrix(
+        self, indices: np.ndarray | list[int], matrix: np.ndarray
+    ):
+        """Calculates the clps and the weighted residuals of grouped problems which share the
+        reduced matrix and the weight.
+
+        The problems share the weighted matrix, so they are solved together with the data as
+        multiple right hand sides, which are read from and written to the flat buffers.
+        """
+        bag = self.bag
+        matrix = self._weight_grouped_matrix(indices[0], matrix)
+        positions = bag.positions(indices)
+        clps, residuals = self._residual_function(matrix, bag.data[positions].T)
+        self._residual_buffer()[positions] = residuals.T
+        for j, i in enumerate(indices):
+            self._grouped_clps[i] = clps[:, j]
 
     def calculate_index_independent_ungrouped_residual(
         self,
-    ) -> tuple[
-        dict[str, list[np.ndarray]],
-        dict[str, list[np.ndarray]],
-        dict[str, list[np.ndarray]],
-        dict[str, list[np.ndarray]],
-    ]:
+    ) -> tuple[dict[str, list[np.ndarray]], dict[str, list[np.ndarray]]]:
 
-        self._clps = {}
         self._reduced_clps = {}
-        self._weighted_residuals = {}
-        self._residuals = {}
+        self._weighted_residuals = self._ungrouped_residual_views()
         for label, problem in self.bag.items():
 
-            self._clps[label] = []
-            self._reduced_clps[label] = []
-            self._weighted_residuals[label] = []
-            self._residuals[label] = []
-            data = problem.data
+            weighted_residuals = self._weighted_residuals[label]
+            matrix = self.reduced_matrices[label]
+            if problem.dataset.scale is not None:
+                matrix = matrix * self.filled_dataset_descriptors[label].scale
+            clps, weighted_residuals[:] = self._calculate_residual_with_shared_matrix(
+                matrix, problem.data, problem.weight
+            )
+            self._reduced_clps[label] = list(clps.T)
+            self._weighted_residuals[label] = list(weighted_residuals.T)
 
-            for i in range(len(problem.global_axis)):
-                matrix = self.reduced_matrices[label].copy()  # TODO: .copy() or not
-                if problem.dataset.scale is not None:
-                    matrix *= self.filled_dataset_descriptors[label].scale
+        return self._reduced_clps, self._weighted_residuals
 
-                if problem.weight is not None:
-                    for j in range(matrix.shape[1]):
-                        matrix[:, j] *= problem.weight.isel({self._global_dimension: i}).values
+    def _calculate_residual_with_shared_matrix(
+        self, matrix: np.ndarray, data: np.ndarray, weight: np.ndarray | None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Calculates the clps and the weighted residuals of data columns sharing the same
+        unweighted matrix.
 
-                clp, residual = self._residual_function(
-                    matrix, data.isel({self._global_dimension: i}).values
-                )
-                self._reduced_clps[label].append(clp)
-                self._weighted_residuals[label].append(residual)
-                if problem.weight is not None:
-                    self._residuals[label].append(
-                        residual / problem.weight.isel({self._global_dimension: i})
-                    )
-                else:
-                    self._residuals[label].append(residual)
+        All columns with the same weight are solved together with the data as multiple right
+        hand sides.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The clps with shape `(n_clp, n_columns)` and the weighted residuals with the shape
+            of the data.
+        """
+        if weight is None:
+            return self._residual_function(matrix, data)
+
+        clps = np.empty((matrix.shape[1], data.shape[1]), dtype=np.float64)
+        residuals = np.empty(data.shape, dtype=np.float64)
+        index_weights, weight_indices = np.unique(weight.T, axis=0, return_inverse=True)
+        indices = [weight_indices == i for i in range(len(index_weights))]
+        for index, (clp, residual) in zip(
+            indices,
+            self._map(
+                lambda index_weight, index: self._residual_function(
+                    matrix * index_weight[:, np.newaxis], data[:, index]
+                ),
+                index_weights,
+                indices,
+            ),
+        ):
+            clps[:, index], residuals[:, index] = clp, residual
+        return clps, residuals
+
+    def _get_residual_size(self) -> int:
+        if self._grouped:
+            return self.bag.offsets[-1]
+        return sum(problem.data.size for problem in self.bag.values())
+
+    def _get_additional_penalty_size(self) -> int | None:
+        """Returns the number of additional penalties or `None` if the model does not specify
+        it."""
+        if not (
+            callable(self.model.has_additional_penalty_function)
+            and self.model.has_additional_penalty_function()
+        ):
+            return 0
+        if callable(self.model.additional_penalty_size_function):
+            return self.model.additional_penalty_size_function()
+        return None
+
+    def _residual_buffer(self) -> np.ndarray:
+        """Returns the part of the penalty buffer holding the weighted residuals."""
+        return self._penalty_buffer[
+            : self._penalty_buffer.size - (self._additional_penalty_size or 0)
+        ]
+
+    def _grouped_residual_views(self) -> list[np.ndarray]:
+        """Returns views into the penalty buffer for the weighted residuals of the grouped
+        problems."""
+        if self._grouped_residual_view_cache is None:
+            # the buffer is allocated once, so the views are created only once
+            buffer = self._residual_buffer()
+            offsets = self.bag.offsets
+            self._grouped_residual_view_cache = [
+                buffer[offsets[i] : offsets[i + 1]] for i in range(len(self.bag))
+            ]
+        return self._grouped_residual_view_cache
+
+    def _ungrouped_residual_views(self) -> dict[str, np.ndarray]:
+        """Returns views into the penalty buffer with the shape of the data of the datasets.
+
+        The residuals in the buffer are ordered by global index, like the concatenation of the
+        residuals of all indices.
+        """
+        buffer = self._residual_buffer()
+        views = {}
+        start = 0
+        for label, problem in self.bag.items():
+            model_size, global_size = problem.data.shape
+            end = start + problem.data.size
+            views[label] = buffer[start:end].reshape(global_size, model_size).T
+            start = end
+        return views
+
+    def calculate_clps(self) -> dict[str, list[np.ndarray]]:
+        """Calculates the clps of the datasets.
+
+        For grouped problems the clps of the groups are split up into the clps of the datasets
+        first. The clps are retrieved from the reduced clps with the models
+        `retrieve_clp_function`.
+        """
+        if self._weighted_residuals is None:
+            self.calculate_residual()
+
+        if self._grouped:
+            reduced_clp_labels, self._reduced_clps = self._ungroup_clps(self._grouped_clps)
+        else:
+            reduced_clp_labels = self.reduced_clp_labels
 
         self._clps = (
             self.model.retrieve_clp_function(
                 self.parameters,
                 self.clp_labels,
-                self.reduced_clp_labels,
-                self.reduced_clps,
+                reduced_clp_labels,
+                self._reduced_clps,
                 self.data,
             )
             if callable(self.model.retrieve_clp_function)
             else self._reduced_clps
         )
+        return self._clps
 
-        return self._reduced_clps, self._clps, self._weighted_residuals, self._residuals
+    def calculate_unweighted_residual(self) -> dict[str, list[np.ndarray]] | list[np.ndarray]:
+        """Calculates the residuals by removing the weights from the weighted residuals."""
+        weighted_residuals = self.weighted_residuals
+        if self._grouped:
+            self._residuals = [
+                residual / problem.weight
+                for residual, problem in zip(weighted_residuals, self.bag)
+            ]
+        else:
+            self._residuals = {}
+            for label, problem in self.bag.items():
+                if problem.weight is None:
+                    self._residuals[label] = weighted_residuals[label]
+                else:
+                    residuals = np.stack(weighted_residuals[label], axis=1) / problem.weight
+                    self._residuals[label] = list(residuals.T)
+        return self._residuals
+
+    def _map(self, function: Callable, *iterables) -> list:
+        """Applies the function to the items of the iterables like :func:`map`.
+
+        If the scheme requests more than one thread, the items are split into chunks which are
+        processed by a thread pool. Calls from a worker thread are processed serially, since
+        waiting on the same pool from within it can deadlock.
+        """
+        if self._number_of_threads <= 1 or getattr(_worker_state, "active", False):
+            return list(map(function, *iterables))
+
+        if self._closed:
+            with ThreadPoolExecutor(max_workers=self._number_of_threads) as executor:
+                return self._map_chunks(executor, function, *iterables)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._number_of_threads)
+        return self._map_chunks(self._executor, function, *iterables)
+
+    def _map_chunks(self, executor: ThreadPoolExecutor, function: Callable, *iterables) -> list:
+        items = list(zip(*iterables))
+        chunk_size = max(1, -(-len(items) // (4 * self._number_of_threads)))
+        chunks = [items[i : i + chunk_size] for i in range(0, len(items), chunk_size)]
+        results = executor.map(lambda chunk: _map_chunk(function, chunk), chunks)
+        return list(itertools.chain.from_iterable(results))
+
+    def close(self):
+        """Shuts down the thread pool of the problem.
 
-    def _ungroup_clps(self, reduced_clps: np.ndarray):
+        The problem stays usable, but every later calculation uses a thread pool which is
+        shut down when the calculation is done, so no idle threads are kept alive.
+        """
+        self._closed = True
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> Problem:
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _weight_grouped_matrix(self, index: int, matrix: np.ndarray) -> np.ndarray:
+        """Applies the weight and the dataset scales of a grouped problem to a copy of the
+        matrix."""
+        bag = self.bag
+        start, end = bag.offsets[index], bag.offsets[index + 1]
+        matrix = matrix * bag.weight[start:end, np.newaxis]
+        if bag.problem_has_scaling[index]:
+            offset = 0
+            for dataset_id in bag.dataset_ids[
+                bag.dataset_offsets[index] : bag.dataset_offsets[index + 1]
+            ]:
+                size = bag.model_axes[dataset_id].size
+                scale = self.filled_dataset_descriptors[bag.labels[dataset_id]].scale
+                if scale is not None:
+                    matrix[offset : offset + size] *= scale
+                offset += size
+        return matrix
+
+    def _weight_ungrouped_matrix(
+        self, label: str, problem: ProblemDescriptor, index: int, matrix: np.ndarray
+    ) -> np.ndarray:
+        """Applies the dataset scale and the weight at the global index to a copy of the
+        matrix."""
+        if problem.dataset.scale is not None:
+            matrix = matrix * self.filled_dataset_descriptors[label].scale
+        else:
+            matrix = matrix.copy()
+        if problem.weight is not None:
+            matrix *= problem.weight[:, index, np.newaxis]
+        return matrix
+
+    def _ungroup_clps(
+        self, grouped_clps: list[np.ndarray]
+    ) -> tuple[dict[str, list[list[str]]], dict[str, list[np.ndarray]]]:
+        """Splits the clps of the grouped problems into the reduced clp labels and reduced clps
+        of the datasets.
+
+        The reduced clp labels of a dataset are its clp labels which are part of the reduced
+        clp labels of the problem. The positions of the clps of a dataset in the clps of the
+        problem only depend on both clp labels, so they are cached. The reduced clp labels are
+        shared between indices and must not be changed.
+        """
         reduced_clp_labels = self.reduced_clp_labels
-        self._reduced_clp_labels = {}
-        self._reduced_clps = {}
+        group_labels = list(self.groups)
+        group_ids = self.bag.group_ids
+        dataset_reduced_clp_labels = {}
+        dataset_reduced_clps = {}
         for label, clp_labels in self.clp_labels.items():
 
-            # find offset in the full axis
-            offset = _find_closest_index(
-                self.data[label].coords[self._global_dimension][0].values, self._full_axis
-            )
-
-            self._reduced_clp_labels[label] = []
-            self._reduced_clps[label] = []
-            for i in range(self.data[label].coords[self._global_dimension].size):
-                group_label = self.bag[i].group
+            dataset_reduced_clp_labels[label] = []
+            dataset_reduced_clps[label] = []
+            for i, bag_index in enumerate(self._bag_indices[label]):
                 dataset_clp_labels = clp_labels[i] if self._index_dependent else clp_labels
                 index_clp_labels = (
-                    reduced_clp_labels[i + offset]
+                    reduced_clp_labels[bag_index]
                     if self._index_dependent
-                    else reduced_clp_labels[group_label]
+                    else reduced_clp_labels[group_labels[group_ids[bag_index]]]
                 )
-                self._reduced_clp_labels[label].append(
-                    [
-                        clp_label
-                        for clp_label in dataset_clp_labels
-                        if clp_label in index_clp_labels
-                    ]
+                index_reduced_clp_labels, positions = self._get_ungroup_column_map(
+                    dataset_clp_labels, index_clp_labels
                 )
-
-                mask = [
-                    clp_label in self._reduced_clp_labels[label][i]
-                    for clp_label in index_clp_labels
-                ]
-                self._reduced_clps[label].append(reduced_clps[i + offset][mask])
-        self._clps = (
-            self.model.retrieve_clp_function(
-                self.parameters,
-                self.clp_labels,
-                self.reduced_clp_labels,
-                self.reduced_clps,
-                self.data,
+                dataset_reduced_clp_labels[label].append(index_reduced_clp_labels)
+                dataset_reduced_clps[label].append(grouped_clps[bag_index][positions])
+        return dataset_reduced_clp_labels, dataset_reduced_clps
+
+    def _get_ungroup_column_map(
+        self, dataset_clp_labels: list[str], group_clp_labels: list[str]
+    ) -> tuple[list[str], np.ndarray]:
+        """Returns the clp labels of a dataset which are part of the clp labels of a group and
+        their positions in the clp labels of the group."""
+        key = (tuple(dataset_clp_labels), tuple(group_clp_labels))
+        if key not in self._ungroup_column_maps:
+            group_positions = {label: i for i, label in enumerate(group_clp_labels)}
+            labels = [label for label in dataset_clp_labels if label in group_positions]
+            self._ungroup_column_maps[key] = (
+                labels,
+                np.asarray([group_positions[label] for label in labels], dtype=np.int64),
             )
-            if callable(self.model.retrieve_clp_function)
-            else self._reduced_clps
-        )
+        return self._ungroup_column_maps[key]
 
     def calculate_additional_penalty(self) -> np.ndarray | dict[str, np.ndarray]:
         """Calculates additional penalties by calling the model.additional_penalty function."""
@@ -883,6 +1426,11 @@ class Problem:
             callable(self.model.has_additional_penalty_function)
             and self.model.has_additional_penalty_function()
         ):
+            kwargs = (
+                {"prepared": self._prepared_additional_penalty}
+                if self._prepared_additional_penalty is not None
+                else {}
+            )
             self._additional_penalty = self.model.additional_penalty_function(
                 self.parameters,
                 self.clp_labels,
@@ -890,17 +1438,395 @@ class Problem:
                 self.matrices,
                 self.data,
                 self._scheme.group_tolerance,
+                **kwargs,
             )
         else:
             self._additional_penalty = None
         return self._additional_penalty
 
-    def create_result_data(
-        self, copy: bool = True, history_index: int | None = None
-    ) -> dict[str, xr.Dataset]:
+    @property
+    def has_variable_projection_jacobian(self) -> bool:
+        """Indicates if the Jacobian can be calculated with :meth:`variable_projection_jacobian`.
+
+        This is not the case if the clp are estimated with NNLS or the model defines additional
+        penalties, since both depend on the clp in a way which is not captured by the
+        projection.
+        """
+        return not self._scheme.non_negative_least_squares and not (
+            callable(self.model.has_additional_penalty_function)
+            and self.model.has_additional_penalty_function()
+        )
 
+    def variable_projection_jacobian(
+        self, free_parameter_labels: list[str], parameter_values: np.ndarray
+    ) -> np.ndarray:
+        """Calculates the Jacobian of :attr:`full_penalty` with Kaufman's approximation of the
+        variable projection functional.
+
+        For every residual block the derivative is :math:`-P^\\perp (dC/d\\theta) c`, where
+        :math:`P^\\perp` is the projector on the orthogonal complement of the weighted matrix
+        :math:`C` and :math:`c` are the clp. The derivatives of the matrices are calculated
+        analytically if the model provides them (see :meth:`_matrix_derivatives`), for all other
+        parameters they are approximated by forward differences of the reduced matrices only.
+        All blocks sharing a weighted matrix are projected with one QR decomposition.
+
+        Parameters
+        ----------
+        free_parameter_labels :
+            The labels of the free parameters.
+        parameter_values :
+            The values of the free parameters as used by the optimizer.
+
+        Returns
+        -------
+        np.ndarray
+            The Jacobian with shape `(full_penalty.size, len(free_parameter_labels))`.
+        """
+        if not self.has_variable_projection_jacobian:
+            raise ValueError(
+                "The variable projection Jacobian is not available for problems with NNLS "
+                "or additional penalties."
+            )
+
+        # least_squares evaluates the residual at the same parameters before, so its clps are
+        # still valid and are reused
+        self._update_parameters(free_parameter_labels, parameter_values)
+        clps = self._reduced_clps_of_blocks()
+        shared_matrix_blocks = self._shared_matrix_blocks()
+        matrices = [select(self.reduced_matrices) for _, select, _, _ in shared_matrix_blocks]
+        block_clps = [
+            np.column_stack([clps[block] for block in blocks])
+            for _, _, _, blocks in shared_matrix_blocks
+        ]
+        parameter_datasets = self._free_parameter_datasets(free_parameter_labels)
+        derivatives = self._matrix_derivatives(free_parameter_labels, parameter_datasets)
+
+        jacobian = np.zeros(
+            (self._get_residual_size(), len(free_parameter_labels)), dtype=np.float64
+        )
+        for i, label in enumerate(free_parameter_labels):
+            if label in derivatives:
+                parameter = self._parameters.get(label)
+                # non-negative parameters are optimized in log space
+                factor = parameter.value if parameter.non_negative else 1.0
+                reduced_derivatives = derivatives[label]
+            else:
+                _, minimum, maximum = self._parameters.get(
+                    label
+                ).get_value_and_bounds_for_optimization()
+                step = _finite_difference_step(parameter_values[i], minimum, maximum)
+                if step == 0:
+                    continue
+                perturbed_values = parameter_values.copy()
+                perturbed_values[i] += step
+                self._update_parameters(free_parameter_labels, perturbed_values)
+                factor = 1 / step
+                reduced_derivatives = self.reduced_matrices
+
+            datasets = parameter_datasets[i]
+            for (block_datasets, select, positions, _), matrix, clp in zip(
+                shared_matrix_blocks, matrices, block_clps
+            ):
+                if datasets is not None and datasets.isdisjoint(block_datasets):
+                    continue
+                derivative = select(reduced_derivatives)
+                if label not in derivatives:
+                    derivative -= matrix
+                jacobian[positions, i] = factor * (derivative @ clp).T
+
+        self._update_parameters(free_parameter_labels, parameter_values)
+
+        for (_, _, positions, _), matrix in zip(shared_matrix_blocks, matrices):
+            # the blocks are projected together as multiple right hand sides
+            size = positions.shape[1]
+            block_derivatives = np.moveaxis(jacobian[positions], 0, 1).reshape(size, -1)
+            jacobian[positions] = np.moveaxis(
+                jacobian_variable_projection(matrix, block_derivatives).reshape(
+                    size, positions.shape[0], -1
+                ),
+                1,
+                0,
+            )
+        return jacobian
+
+    def _free_parameter_datasets(self, free_parameter_labels: list[str]) -> list[set[str] | None]:
+        """Returns the labels of the datasets whose matrices depend on every free parameter,
+        directly or through parameter expressions.
+
+        Parameters used by model items outside of the datasets, like relations, constraints or
+        penalties, are assumed to affect all datasets, which is indicated by `None`.
+        """
+        global_parameter_labels = set()
+        for attribute in getattr(self._model, "_glotaran_model_attributes"):
+            items = getattr(self._model, attribute)
+            if isinstance(items, list):
+                global_parameter_labels |= _get_parameter_labels(items)
+
+        expression_users = collections.defaultdict(set)
+        for label, parameter in self._parameters.all():
+            for expression_label in parameter.expression_parameter_labels:
+                expression_users[expression_label].add(label)
+
+        parameter_datasets = []
+        for label in free_parameter_labels:
+            labels = {label}
+            unvisited = [label]
+            while unvisited:
+                for expression_label in expression_users[unvisited.pop()] - labels:
+                    labels.add(expression_label)
+                    unvisited.append(expression_label)
+
+            parameter_datasets.append(
+                None
+                if labels & global_parameter_labels
+                else set().union(
+                    *(
+                        self._parameter_dependencies.get(parameter_label, ())
+                        for parameter_label in labels
+                    )
+                )
+            )
+        return parameter_datasets
+
+    def _matrix_derivatives(
+        self, free_parameter_labels: list[str], parameter_datasets: list[set[str] | None]
+    ) -> dict[str, dict[str, np.ndarray]]:
+        """Returns the analytic derivatives of the reduced matrices by the free parameters.
+
+        The derivatives are only calculated for index independent problems with the
+        `matrix_derivatives` function of the model. A parameter is only derived analytically if
+        the model returns its derivative for every dataset depending on it and it is not used
+        by a parameter expression or a model item outside of the datasets.
+
+        Returns
+        -------
+        dict[str, dict[str, np.ndarray]]
+            The derivatives of the reduced matrices of the datasets or, for grouped problems, of
+            the groups depending on the parameter, by the labels of the parameters.
+        """
+        if self._index_dependent or self._model.matrix_derivatives is None:
+            return {}
+
+        expression_labels = set().union(
+            *(parameter.expression_parameter_labels for _, parameter in self._parameters.all())
+        )
+        labels = {
+            label: datasets
+            for label, datasets in zip(free_parameter_labels, parameter_datasets)
+            if datasets is not None and label not in expression_labels
+        }
+        dataset_derivatives = {
+            dataset_label: self._model.matrix_derivatives(
+                dataset_descriptor=self._filled_dataset_descriptors[dataset_label],
+                axis=self._dataset_arrays[dataset_label].model_axis,
+            )
+            for dataset_label in set().union(*labels.values())
+        }
+
+        reduced_matrices = self.reduced_matrices
+        derivatives = {}
+        for label, datasets in labels.items():
+            if any(label not in dataset_derivatives[dataset] for dataset in datasets):
+                continue
+            reduced_derivatives = {
+                dataset: _reduce_matrix(
+                    self._model,
+                    dataset,
+                    self._parameters,
+                    LabelAndMatrix(self._clp_labels[dataset], dataset_derivatives[dataset][label]),
+                    None,
+                ).matrix
+                for dataset in datasets
+            }
+            if self._grouped:
+                reduced_derivatives = {
+                    group_label: _combine_matrices(
+                        [
+                            LabelAndMatrix(
+                                self._reduced_clp_labels[dataset],
+                                reduced_derivatives[dataset]
+                                if dataset in datasets
+                                else np.zeros_like(reduced_matrices[dataset]),
+                            )
+                            for dataset in group
+                        ],
+                        self._combine_column_maps,
+                    ).matrix
+                    for group_label, group in self.groups.items()
+                    if not datasets.isdisjoint(group)
+                }
+            derivatives[label] = reduced_derivatives
+        return derivatives
+
+    def _shared_matrix_blocks(
+        self,
+    ) -> list[tuple[set[str], Callable[[Any], np.ndarray], np.ndarray, list[int]]]:
+        """Returns the residual blocks which share the same weighted reduced matrix.
+
+        Every entry consists of the labels of the datasets of the blocks, a function which
+        selects the matrix of the blocks from reduced matrices like :attr:`reduced_matrices`
+        and returns a weighted copy, the positions of the weighted residuals of the blocks with
+        shape `(number_of_blocks, block_size)` and the indices of the blocks in the order of
+        :attr:`full_penalty`.
+        """
+        reduced_matrices = self.reduced_matrices
+        if self._grouped:
+            bag = self.bag
+            bag_indices = collections.defaultdict(list)
+            for indices in bag.weight_groups:
+                for i in indices:
+                    key = id(reduced_matrices[i]) if self._index_dependent else None
+                    bag_indices[(bag.weight_ids[i], key)].append(i)
+            return [
+                (
+                    set(self.groups[bag.group_labels[bag.group_ids[indices[0]]]]),
+                    functools.partial(self._select_grouped_matrix, indices[0]),
+                    bag.positions(indices),
+                    indices,
+                )
+                for indices in bag_indices.values()
+            ]
+
+        shared_matrix_blocks = []
+        start = 0
+        first_block = 0
+        for label, problem in self.bag.items():
+            model_size, global_size = problem.data.shape
+            weight_ids = (
+                np.zeros(global_size, dtype=np.int64)
+                if problem.weight is None
+                else np.unique(problem.weight.T, axis=0, return_inverse=True)[1].ravel()
+            )
+            global_indices = collections.defaultdict(list)
+            for i, weight_id in enumerate(weight_ids):
+                key = id(reduced_matrices[label][i]) if self._index_dependent else None
+                global_indices[(weight_id, key)].append(i)
+            for indices in global_indices.values():
+                indices = np.asarray(indices)
+                shared_matrix_blocks.append(
+                    (
+                        {label},
+                        functools.partial(self._select_ungrouped_matrix, label, indices[0]),
+                        start + indices[:, np.newaxis] * model_size + np.arange(model_size),
+                        list(first_block + indices),
+                    )
+                )
+            start += problem.data.size
+            first_block += global_size
+        return shared_matrix_blocks
+
+    def _select_grouped_matrix(self, index: int, matrices: Any) -> np.ndarray:
+        """Returns a weighted copy of the reduced matrix of a grouped problem."""
+        bag = self.bag
+        matrix = (
+            matrices[index]
+            if self._index_dependent
+            else matrices[bag.group_labels[bag.group_ids[index]]]
+        )
+        return self._weight_grouped_matrix(index, matrix)
+
+    def _select_ungrouped_matrix(self, label: str, index: int, matrices: Any) -> np.ndarray:
+        """Returns a weighted copy of the reduced matrix of a dataset at a global index."""
+        matrix = matrices[label][index] if self._index_dependent else matrices[label]
+        return self._weight_ungrouped_matrix(label, self.bag[label], index, matrix)
+
+    def jacobian_sparsity(self, free_parameter_labels: list[str]) -> sparse.csr_matrix:
+        """Calculates the sparsity structure of the Jacobian of :attr:`full_penalty`.
+
+        A parameter can only change the residuals of the datasets whose descriptors depend on
+        it, directly or through parameter expressions, and of the datasets grouped with them.
+        Parameters used by model items outside of the datasets, like relations, constraints or
+        penalties, and all additional penalties are assumed to affect every residual.
+
+        Parameters
+        ----------
+        free_parameter_labels :
+            The labels of the free parameters.
+
+        Returns
+        -------
+        sparse.csr_matrix
+            The sparsity structure with shape `(full_penalty.size, len(free_parameter_labels))`.
+        """
+        if self._grouped:
+            block_datasets = [set(self.groups[problem.group]) for problem in self.bag]
+            block_sizes = [residual.size for residual in self.weighted_residuals]
+        else:
+            block_datasets = [{label} for label in self.weighted_residuals]
+            block_sizes = [
+                sum(residual.size for residual in residuals)
+                for residuals in self.weighted_residuals.values()
+            ]
+        additional_penalty_size = (
+            self.additional_penalty.size if self.additional_penalty is not None else 0
+        )
+        number_of_residuals = sum(block_sizes)
+
+        rows = [np.empty(0, dtype=np.int64)]
+        columns = [np.empty(0, dtype=np.int64)]
+        for i, datasets in enumerate(self._free_parameter_datasets(free_parameter_labels)):
+            if datasets is None:
+                affected_rows = np.arange(number_of_residuals)
+            else:
+                affected_blocks = [not datasets.isdisjoint(block) for block in block_datasets]
+                affected_rows = np.nonzero(np.repeat(affected_blocks, block_sizes))[0]
+            affected_rows = np.concatenate(
+                [
+                    affected_rows,
+                    np.arange(number_of_residuals, number_of_residuals + additional_penalty_size),
+                ]
+            )
+            rows.append(affected_rows)
+            columns.append(np.full(affected_rows.size, i))
+
+        return sparse.csr_matrix(
+            (
+                np.ones(sum(row.size for row in rows), dtype=np.int8),
+                (np.concatenate(rows), np.concatenate(columns)),
+            ),
+            shape=(number_of_residuals + additional_penalty_size, len(free_parameter_labels)),
+        )
+
+    def _update_parameters(self, free_parameter_labels: list[str], parameter_values: np.ndarray):
+        """Sets the values of the free parameters and resets the results only if a value has
+        changed."""
+        self._parameters.set_from_label_and_value_arrays(free_parameter_labels, parameter_values)
+        if self._parameter_values is None or any(
+            parameter.value != self._parameter_values.get(label)
+            for label, parameter in self._parameters.all()
+        ):
+            self.reset()
+
+    def _reduced_clps_of_blocks(self) -> list[np.ndarray]:
+        """Returns the reduced clps of every residual block in the order of
+        :attr:`full_penalty`."""
+        self.weighted_residuals
+        if self._grouped:
+            return list(self._grouped_clps)
+        return [clp for label in self.bag for clp in self._reduced_clps[label]]
+
+    def create_result_data(
+        self, copy: bool = True, history_index: int | None = None, lazy: bool = False
+    ) -> dict[str, xr.Dataset] | LazyResultData:
+        """Creates the result datasets.
+
+        Parameters
+        ----------
+        copy : bool
+            If `True`, the results are added to shallow copies of the prepared datasets,
+            which share the data arrays with them. Else they are added to the prepared
+            datasets.
+        history_index : int | None
+            The index of the parameters in the parameter history to create the results for.
+        lazy : bool
+            If `True`, a :class:`LazyResultData` is returned, which creates the result dataset
+            of a dataset on first access.
+        """
         if history_index is not None and history_index != -1:
             self.parameters = self.parameter_history[history_index]
+        if lazy:
+            return LazyResultData(self, copy=copy)
+
         result_data = {label: self._create_result_dataset(label, copy=copy) for label in self.data}
 
         if callable(self.model.finalize_data):
@@ -908,10 +1834,20 @@ class Problem:
 
         return result_data
 
+    def create_result_dataset(self, label: str, copy: bool = True) -> xr.Dataset:
+        """Creates and finalizes the result dataset of a single dataset.
+
+        See :meth:`create_result_data` for the parameters.
+        """
+        dataset = self._create_result_dataset(label, copy=copy)
+        if callable(self.model.finalize_data):
+            self.model.finalize_data(self, {label: dataset})
+        return dataset
+
     def _create_result_dataset(self, label: str, copy: bool = True) -> xr.Dataset:
         dataset = self.data[label]
         if copy:
-            dataset = dataset.copy()
+            dataset = dataset.copy(deep=False)
         if self.grouped:
             if self.index_dependent:
                 dataset = self._create_index_dependent_grouped_result_dataset(label, dataset)
@@ -923,8 +1859,12 @@ class Problem:
             else:
                 dataset = self._create_index_independent_ungrouped_result_dataset(label, dataset)
 
-        self._create_svd("weighted_residual", dataset)
-        self._create_svd("residual", dataset)
+        if self._scheme.add_svd:
+            number_of_singular_vectors = self._scheme.number_of_singular_vectors
+            if "data_singular_values" not in dataset:
+                add_svd_to_dataset(dataset, "data", number_of_singular_vectors)
+            add_svd_to_dataset(dataset, "weighted_residual", number_of_singular_vectors)
+            add_svd_to_dataset(dataset, "residual", number_of_singular_vectors)
 
         # Calculate RMS
         size = dataset.residual.shape[0] * dataset.residual.shape[1]
@@ -944,17 +1884,7 @@ class Problem:
         self, label: str, dataset: xr.Dataset
     ) -> xr.Dataset:
 
-        for index, grouped_problem in enumerate(self.bag):
-
-            if label in grouped_problem.group:
-                group_index = [
-                    descriptor.label for descriptor in grouped_problem.descriptor
-                ].index(label)
-                global_index = grouped_problem.descriptor[group_index].index
-
-                self._add_grouped_residual_to_dataset(
-                    dataset, grouped_problem, index, group_index, global_index
-                )
+        self._add_grouped_residual_to_dataset(label, dataset)
 
         # we assume that the labels are the same, this might not be true in
         # future models
@@ -983,17 +1913,7 @@ class Problem:
 
         self._add_index_independent_matrix_to_dataset(label, dataset)
 
-        for index, grouped_problem in enumerate(self.bag):
-
-            if label in grouped_problem.group:
-                group_index = [
-                    descriptor.label for descriptor in grouped_problem.descriptor
-                ].index(label)
-                global_index = grouped_problem.descriptor[group_index].index
-
-                self._add_grouped_residual_to_dataset(
-                    dataset, grouped_problem, index, group_index, global_index
-                )
+        self._add_grouped_residual_to_dataset(label, dataset)
 
         dataset["clp"] = (
             (
@@ -1049,38 +1969,25 @@ class Problem:
             np.asarray(self.matrices[label]),
         )
 
-    def _add_grouped_residual_to_dataset(
-        self,
-        dataset: xr.Dataset,
-        grouped_problem: GroupedProblem,
-        index: int,
-        group_index: int,
-        global_index: int,
-    ):
-        if "residual" not in dataset:
-            dim1 = dataset.coords[self._model_dimension].size
-            dim2 = dataset.coords[self._global_dimension].size
-            dataset["weighted_residual"] = (
-                (self._model_dimension, self._global_dimension),
-                np.zeros((dim1, dim2), dtype=np.float64),
-            )
-            dataset["residual"] = (
-                (self._model_dimension, self._global_dimension),
-                np.zeros((dim1, dim2), dtype=np.float64),
-            )
-
-        start = sum(
-            self.data[grouped_problem.descriptor[i].label].coords[self._model_dimension].size
-            for i in range(group_index)
+    def _add_grouped_residual_to_dataset(self, label: str, dataset: xr.Dataset):
+        """Adds the residual and the weighted residual of a dataset gathered from the grouped
+        problems to the result dataset."""
+        global_indices, positions = self.bag.dataset_positions(self.bag.labels.index(label))
+        # the grouped weighted residuals are views into the residual buffer, in bag order
+        self.weighted_residuals
+        weighted_residual_buffer = self._residual_buffer()
+
+        shape = (positions.shape[1], dataset.coords[self._global_dimension].size)
+        weighted_residual = np.zeros(shape, dtype=np.float64)
+        weighted_residual[:, global_indices] = weighted_residual_buffer[positions].T
+        residual = np.zeros(shape, dtype=np.float64)
+        residual[:, global_indices] = weighted_residual[:, global_indices] / (
+            self.bag.weight[positions].T
         )
 
-        end = start + dataset.coords[self._model_dimension].size
-        dataset.weighted_residual.loc[
-            {self._global_dimension: global_index}
-        ] = self.weighted_residuals[index][start:end]
-        dataset.residual.loc[{self._global_dimension: global_index}] = self.residuals[index][
-            start:end
-        ]
+        dims = (self._model_dimension, self._global_dimension)
+        dataset["weighted_residual"] = (dims, weighted_residual)
+        dataset["residual"] = (dims, residual)
 
     def _add_ungrouped_residual_and_full_clp_to_dataset(self, label: str, dataset: xr.Dataset):
         dataset["clp"] = (
@@ -1105,36 +2012,142 @@ class Problem:
             np.transpose(np.asarray(self.residuals[label])),
         )
 
-    def _create_svd(self, name: str, dataset: xr.Dataset):
-        l, v, r = np.linalg.svd(dataset[name], full_matrices=False)
-
-        dataset[f"{name}_left_singular_vectors"] = (
-            (self._model_dimension, "left_singular_value_index"),
-            l,
-        )
 
-        dataset[f"{name}_right_singular_vectors"] = (
-            ("right_singular_value_index", self._global_dimension),
-            r,
-        )
+class LazyResultData(collections.abc.Mapping):
+    """The result data of a problem, which creates the result dataset of a dataset on first
+    access.
 
-        dataset[f"{name}_singular_values"] = (("singular_value_index"), v)
+    Only the result datasets which are accessed are kept in memory. The problem must not be
+    changed until all needed datasets have been accessed, since they are created from its
+    current state. Pickling materializes all datasets into a :class:`dict`.
+    """
 
+    def __init__(self, problem: Problem, copy: bool = True):
+        """
+        Parameters
+        ----------
+        problem : Problem
+            The problem to create the result datasets from.
+        copy : bool
+            See :meth:`Problem.create_result_data`.
+        """
+        self._problem = problem
+        self._copy = copy
+        self._data = {}
 
-def _find_overlap(a, b, rtol=1e-05, atol=1e-08):
-    ovr_a = []
-    ovr_b = []
-    start_b = 0
-    for i, ai in enumerate(a):
-        for j, bj in itertools.islice(enumerate(b), start_b, None):
-            if np.isclose(ai, bj, rtol=rtol, atol=atol, equal_nan=False):
-                ovr_a.append(i)
-                ovr_b.append(j)
-            elif bj > ai:  # (more than tolerance)
-                break  # all the rest will be farther away
-            else:  # bj < ai (more than tolerance)
-                start_b += 1  # ignore further tests of this item
-    return (ovr_a, ovr_b)
+    def __getitem__(self, label: str) -> xr.Dataset:
+        if label not in self._data:
+            if label not in self._problem.data:
+                raise KeyError(label)
+            self._data[label] = self._problem.create_result_dataset(label, copy=self._copy)
+        return self._data[label]
+
+    def __iter__(self):
+        return iter(self._problem.data)
+
+    def __len__(self) -> int:
+        return len(self._problem.data)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def _map_chunk(function: Callable, chunk: list[tuple]) -> list:
+    """Applies the function to the items of a chunk in a worker thread."""
+    _worker_state.active = True
+    try:
+        return [function(*item) for item in chunk]
+    finally:
+        _worker_state.active = False
+
+
+def _align_axis(
+    full_axis: np.ndarray, axis: np.ndarray, rtol: float = 1e-05, atol: float = 1e-08
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Aligns an axis with a sorted full axis.
+
+    Every value of the full axis is matched with the closest value of the axis which is close
+    according to :func:`numpy.isclose` with the given tolerances. Values of the axis without a
+    match are merged into the full axis.
+
+    Parameters
+    ----------
+    full_axis : np.ndarray
+        The sorted full axis.
+    axis : np.ndarray
+        The axis to align.
+    rtol : float
+        The relative tolerance.
+    atol : float
+        The absolute tolerance.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        The merged full axis, the indices of the values of the full axis in the merged axis and
+        the indices of the values of the axis in the merged axis.
+    """
+    order = np.argsort(axis, kind="stable")
+    sorted_axis = axis[order]
+    matched = np.zeros(sorted_axis.size, dtype=bool)
+    nearest = np.zeros(sorted_axis.size, dtype=np.int64)
+
+    if full_axis.size != 0:
+        right = np.searchsorted(full_axis, sorted_axis).clip(max=full_axis.size - 1)
+        left = (right - 1).clip(min=0)
+        nearest = np.where(
+            np.abs(full_axis[left] - sorted_axis) <= np.abs(full_axis[right] - sorted_axis),
+            left,
+            right,
+        )
+        distance = np.abs(full_axis[nearest] - sorted_axis)
+        candidates = np.nonzero(distance <= atol + rtol * np.abs(sorted_axis))[0]
+
+        # every value of the full axis can only be matched once, the closest value wins
+        candidates = candidates[np.lexsort((distance[candidates], nearest[candidates]))]
+        _, first_candidates = np.unique(nearest[candidates], return_index=True)
+        matched[candidates[first_candidates]] = True
+
+    merged_axis = np.concatenate([full_axis, sorted_axis[~matched]])
+    merge_order = np.argsort(merged_axis, kind="stable")
+    merged_indices = np.empty_like(merge_order)
+    merged_indices[merge_order] = np.arange(merge_order.size)
+
+    full_axis_indices = merged_indices[: full_axis.size]
+    sorted_axis_indices = np.empty(sorted_axis.size, dtype=np.int64)
+    sorted_axis_indices[matched] = full_axis_indices[nearest[matched]]
+    sorted_axis_indices[~matched] = merged_indices[full_axis.size :]
+    axis_indices = np.empty_like(sorted_axis_indices)
+    axis_indices[order] = sorted_axis_indices
+
+    return merged_axis[merge_order], full_axis_indices, axis_indices
+
+
+def _finite_difference_step(value: float, minimum: float, maximum: float) -> float:
+    """Returns the step of a forward difference which stays within the bounds.
+
+    The step is taken backwards if a forward step exceeds the maximum, and shortened to the
+    larger distance to a bound if neither direction fits.
+    """
+    step = np.sqrt(np.finfo(np.float64).eps) * max(1.0, abs(value))
+    if value + step <= maximum:
+        return step
+    if value - step >= minimum:
+        return -step
+    return maximum - value if maximum - value >= value - minimum else minimum - value
+
+
+def _get_parameter_labels(item: Any) -> set[str]:
+    """Returns the full labels of all parameters in a filled model item."""
+    if isinstance(item, Parameter):
+        return {item.full_label}
+    if isinstance(item, dict):
+        item = list(item.values())
+    elif hasattr(item, "_glotaran_properties"):
+        item = [getattr(item, name) for name in item._glotaran_properties]
+    if isinstance(item, (list, tuple)):
+        return set().union(*map(_get_parameter_labels, item))
+    return set()
 
 
 def _calculate_matrix(
@@ -1172,39 +2185,42 @@ def _reduce_matrix(
     return LabelAndMatrix(clp_labels, result.matrix)
 
 
-def _combine_matrices(labels_and_matrices: list[LabelAndMatrix]) -> LabelAndMatrix:
-    masks = []
-    full_clp_labels = None
-    sizes = []
-    for label_and_matrix in labels_and_matrices:
-        (clp_label, matrix) = label_and_matrix
-        sizes.append(matrix.shape[0])
-        if full_clp_labels is None:
-            full_clp_labels = clp_label
-            masks.append([i for i, _ in enumerate(clp_label)])
-        else:
-            mask = []
-            for c in clp_label:
-                if c not in full_clp_labels:
-                    full_clp_labels.append(c)
-                mask.append(full_clp_labels.index(c))
-            masks.append(mask)
-    dim1 = np.sum(sizes)
-    dim2 = len(full_clp_labels)
-    full_matrix = np.zeros((dim1, dim2), dtype=np.float64)
+def _combine_matrices(
+    labels_and_matrices: list[LabelAndMatrix], column_maps: dict | None = None
+) -> LabelAndMatrix:
+    """Combines the matrices of the datasets of a group into one matrix.
+
+    The matrices are stacked and their columns are mapped onto the union of their clp labels.
+    The column map only depends on the clp labels, so it is cached in `column_maps` if given.
+    The combined clp labels are shared between calls and must not be changed.
+    """
+    key = tuple(tuple(clp_label) for clp_label, _ in labels_and_matrices)
+    column_map = None if column_maps is None else column_maps.get(key)
+    if column_map is None:
+        full_clp_labels = []
+        positions = {}
+        columns = []
+        for clp_label in key:
+            for label in clp_label:
+                if label not in positions:
+                    positions[label] = len(full_clp_labels)
+                    full_clp_labels.append(label)
+            columns.append(np.asarray([positions[label] for label in clp_label], dtype=np.int64))
+        column_map = (full_clp_labels, columns)
+        if column_maps is not None:
+            column_maps[key] = column_map
+
+    full_clp_labels, columns = column_map
+    sizes = [matrix.shape[0] for _, matrix in labels_and_matrices]
+    full_matrix = np.zeros((sum(sizes), len(full_clp_labels)), dtype=np.float64)
     start = 0
-    for i, m in enumerate(labels_and_matrices):
-        end = start + sizes[i]
-        full_matrix[start:end, masks[i]] = m[1]
-        start = end
+    for (_, matrix), column, size in zip(labels_and_matrices, columns, sizes):
+        full_matrix[start : start + size, column] = matrix
+        start += size
 
     return LabelAndMatrix(full_clp_labels, full_matrix)
 
 
-def _find_closest_index(index: float, axis: np.ndarray):
-    return np.abs(axis - index).argmin()
-
-
 def _get_min_max_from_interval(interval, axis):
     minimum = np.abs(axis.values - interval[0]).argmin() if not np.isinf(interval[0]) else 0
     maximum = (
@@ -250,6 +250,7 @@ class GaussianShapeDecayDatasetDescriptor(DatasetDescriptor):
     megacomplex_type=SimpleTestMegacomplex,
     has_additional_penalty_function=lambda model: True,
     additional_penalty_function=additional_penalty_typecheck,
+    additional_penalty_size_function=lambda model: 1,
     has_matrix_constraints_function=lambda model: True,
     constrain_matrix_function=constrain_matrix_function_typecheck,
     retrieve_clp_function=retrieve_clp_typecheck,
@@ -277,6 +278,7 @@ class DecayModel(Model):
     index_dependent=lambda model: model.is_index_dependent,
     has_additional_penalty_function=lambda model: True,
     additional_penalty_function=additional_penalty_typecheck,
+    additional_penalty_size_function=lambda model: 1,
 )
 class GaussianDecayModel(Model):
     additional_penalty_function_called = False
@@ -158,3 +158,62 @@ def test_multi_dataset_overlap():
     assert np.array_equal(bag[4].descriptor[0].axis, axis_c_1)
     assert np.array_equal(bag[5].descriptor[0].axis, axis_c_2)
     assert [p.descriptor[0].index for p in bag[1:4]] == axis_e_1[:-1]
+
+
+def test_multi_dataset_interleaved():
+    model = SimpleTestModel.from_dict(
+        {
+            "dataset": {
+                "dataset1": {
+                    "megacomplex": [],
+                },
+                "dataset2": {
+                    "megacomplex": [],
+                },
+            }
+        }
+    )
+
+    model.grouped = lambda: True
+    assert model.valid()
+
+    parameters = ParameterGroup.from_list([1, 10])
+    assert model.valid(parameters)
+
+    axis_e_1 = [1, 3, 5]
+    axis_c_1 = [5, 7]
+    axis_e_2 = [2, 3.1, 4, 6]
+    axis_c_2 = [5, 7, 9]
+    data = {
+        "dataset1": xr.DataArray(
+            np.ones((3, 2)), coords=[("e", axis_e_1), ("c", axis_c_1)]
+        ).to_dataset(name="data"),
+        "dataset2": xr.DataArray(
+            np.ones((4, 3)), coords=[("e", axis_e_2), ("c", axis_c_2)]
+        ).to_dataset(name="data"),
+    }
+
+    scheme = Scheme(model, parameters, data, group_tolerance=2e-1)
+    problem = Problem(scheme)
+    bag = list(problem.bag)
+    assert len(problem.groups) == 3
+    assert len(bag) == 6
+    assert [p.group for p in bag] == [
+        "dataset1",
+        "dataset2",
+        "dataset1dataset2",
+        "dataset2",
+        "dataset1",
+        "dataset2",
+    ]
+    assert [p.data.size for p in bag] == [2, 3, 5, 3, 2, 3]
+    assert [p.descriptor[0].index for p in bag] == [1, 2, 3, 4, 5, 6]
+    assert bag[2].descriptor[1].index == 3.1
+
+    assert bag[2].data.base is problem.bag.data
+    assert problem.bag.data.size == sum(p.data.size for p in bag)
+    assert problem.bag.group_ids.tolist() == [0, 1, 2, 1, 0, 1]
+
+    global_indices, positions = problem.bag.dataset_positions(1)
+    assert global_indices.tolist() == [0, 1, 2, 3]
+    assert positions.tolist() == [[2, 3, 4], [7, 8, 9], [10, 11, 12], [15, 16, 17]]
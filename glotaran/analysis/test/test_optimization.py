@@ -3,6 +3,8 @@ import pytest
 import xarray as xr
 
 from glotaran.analysis.optimize import optimize
+from glotaran.analysis.optimize import optimize_problem
+from glotaran.analysis.problem import Problem
 from glotaran.analysis.simulation import simulate
 from glotaran.analysis.test.models import DecayModel
 from glotaran.analysis.test.models import MultichannelMulticomponentDecay
@@ -139,3 +141,63 @@ def test_optimization(suite, index_dependent, grouped, weight, method):
     else:
         assert not model.constrain_matrix_function_called
         assert not model.retrieve_clp_function_called
+
+
+@pytest.mark.parametrize("grouped", [True, False])
+def test_optimization_jacobian_sparsity(grouped):
+    model = DecayModel.from_dict(ThreeDatasetDecay.model_dict)
+    model.is_grouped = grouped
+
+    axes = {
+        "dataset1": {"e": ThreeDatasetDecay.e_axis, "c": ThreeDatasetDecay.c_axis},
+        "dataset2": {"e": ThreeDatasetDecay.e_axis2, "c": ThreeDatasetDecay.c_axis2},
+        "dataset3": {"e": ThreeDatasetDecay.e_axis3, "c": ThreeDatasetDecay.c_axis3},
+    }
+    data = {
+        label: simulate(model, label, ThreeDatasetDecay.wanted_parameters, axis)
+        for label, axis in axes.items()
+    }
+    scheme = Scheme(
+        model=model,
+        parameters=ThreeDatasetDecay.initial_parameters,
+        data=data,
+        maximum_number_function_evaluations=10,
+        group_tolerance=0.1,
+        jacobian_sparsity=True,
+    )
+
+    result = optimize(scheme)
+    assert result.success
+    assert result.get_scheme().jacobian_sparsity
+    for label, param in result.optimized_parameters.all():
+        wanted_value = ThreeDatasetDecay.wanted_parameters.get(label).value
+        assert np.allclose(param.value, wanted_value, rtol=1e-1)
+
+
+def test_optimization_closes_problem():
+    suite = OneCompartmentDecay
+    model = suite.model
+    model.is_grouped = False
+    model.is_index_dependent = False
+
+    dataset = simulate(
+        suite.sim_model,
+        "dataset1",
+        suite.wanted_parameters,
+        {"e": suite.e_axis, "c": suite.c_axis},
+    )
+    scheme = Scheme(
+        model=model,
+        parameters=suite.initial_parameters,
+        data={"dataset1": dataset},
+        maximum_number_function_evaluations=5,
+        number_of_threads=2,
+        lazy_result_data=True,
+    )
+    problem = Problem(scheme)
+
+    result = optimize_problem(problem)
+    assert problem._executor is None
+
+    assert "weighted_residual" in result.data["dataset1"]
+    assert problem._executor is None
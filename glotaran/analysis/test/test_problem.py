@@ -1,13 +1,21 @@
-import collections
+import pickle
 
 import numpy as np
 import pytest
 import xarray as xr
 
+from glotaran.analysis.problem import GroupedBag
+from glotaran.analysis.problem import LabelAndMatrix
+from glotaran.analysis.problem import LazyResultData
 from glotaran.analysis.problem import Problem
+from glotaran.analysis.problem import _combine_matrices
+from glotaran.analysis.problem import _finite_difference_step
 from glotaran.analysis.simulation import simulate
+from glotaran.analysis.test.models import DecayModel
 from glotaran.analysis.test.models import MultichannelMulticomponentDecay as suite
 from glotaran.analysis.test.models import SimpleTestModel
+from glotaran.analysis.test.models import ThreeDatasetDecay
+from glotaran.analysis.variable_projection import residual_variable_projection
 from glotaran.parameter import ParameterGroup
 from glotaran.project import Scheme
 
@@ -40,12 +48,18 @@ def test_problem_bag(problem: Problem):
     bag = problem.bag
 
     if problem.grouped:
-        assert isinstance(bag, collections.deque)
+        assert isinstance(bag, GroupedBag)
         assert len(bag) == suite.e_axis.size
         assert problem.groups == {"dataset1": ["dataset1"]}
+        assert bag.group_labels == ["dataset1"]
+        assert len(bag.weight_groups) == 1
+        assert np.array_equal(bag.weight_groups[0], np.arange(len(bag)))
     else:
         assert isinstance(bag, dict)
         assert "dataset1" in bag
+        assert isinstance(bag["dataset1"].data, np.ndarray)
+        assert bag["dataset1"].data.flags.c_contiguous
+        assert np.array_equal(bag["dataset1"].data, problem.data["dataset1"].data)
 
 
 def test_problem_matrices(problem: Problem):
@@ -108,6 +122,49 @@ def test_problem_residuals(problem: Problem):
     )
 
 
+def test_problem_full_penalty_buffer(problem: Problem):
+    problem.reset()
+    penalty = problem.full_penalty
+    residuals = (
+        problem.weighted_residuals if problem.grouped else problem.weighted_residuals["dataset1"]
+    )
+
+    assert all(np.shares_memory(penalty, residual) for residual in residuals)
+    assert np.array_equal(penalty[: penalty.size - 1], np.concatenate(residuals))
+    assert penalty[-1] == problem.additional_penalty[0]
+
+    problem.reset()
+    assert problem.full_penalty is penalty
+
+
+@pytest.mark.parametrize("penalty_size", [None, 2])
+def test_problem_full_penalty_size(monkeypatch, penalty_size):
+    monkeypatch.setattr(
+        suite.model,
+        "additional_penalty_size_function",
+        None if penalty_size is None else lambda: penalty_size,
+    )
+    dataset = simulate(
+        suite.sim_model,
+        "dataset1",
+        suite.wanted_parameters,
+        {"e": suite.e_axis, "c": suite.c_axis},
+    )
+    scheme = Scheme(
+        model=suite.model, parameters=suite.initial_parameters, data={"dataset1": dataset}
+    )
+    problem = Problem(scheme)
+
+    if penalty_size is None:
+        assert np.array_equal(
+            problem.full_penalty,
+            np.concatenate([problem._residual_buffer(), problem.additional_penalty]),
+        )
+    else:
+        with pytest.raises(ValueError):
+            problem.full_penalty
+
+
 def test_problem_result_data(problem: Problem):
 
     data = problem.create_result_data()
@@ -148,9 +205,81 @@ def test_problem_result_data(problem: Problem):
 
     assert "residual" in dataset
     assert dataset.data.shape == dataset.residual.shape
+    residuals = problem.residuals if problem.grouped else problem.residuals["dataset1"]
+    assert np.allclose(dataset.residual, np.stack(residuals, axis=1))
 
     assert "residual_singular_values" in dataset
     assert "weighted_residual_singular_values" in dataset
+    assert "data_singular_values" in dataset
+
+
+@pytest.mark.parametrize("add_svd", [True, False])
+def test_problem_result_data_svd(add_svd: bool):
+    dataset = simulate(
+        suite.sim_model,
+        "dataset1",
+        suite.wanted_parameters,
+        {"e": suite.e_axis, "c": suite.c_axis},
+    )
+    scheme = Scheme(
+        model=suite.model,
+        parameters=suite.initial_parameters,
+        data={"dataset1": dataset},
+        add_svd=add_svd,
+        number_of_singular_vectors=2,
+    )
+    problem = Problem(scheme)
+    assert "data_singular_values" not in problem.data["dataset1"]
+
+    result_dataset = problem.create_result_data()["dataset1"]
+    for name in ["data", "residual", "weighted_residual"]:
+        assert (f"{name}_singular_values" in result_dataset) == add_svd
+    if add_svd:
+        assert result_dataset.residual_singular_values.size == 2
+        assert result_dataset.residual_left_singular_vectors.shape == (suite.c_axis.size, 2)
+        assert result_dataset.residual_right_singular_vectors.shape == (2, suite.e_axis.size)
+        _, singular_values, _ = np.linalg.svd(result_dataset.residual, full_matrices=False)
+        assert np.allclose(result_dataset.residual_singular_values, singular_values[:2])
+
+
+def test_problem_lazy_result_data(problem: Problem):
+    data = problem.create_result_data()
+    lazy_data = problem.create_result_data(lazy=True)
+
+    assert isinstance(lazy_data, LazyResultData)
+    assert list(lazy_data) == list(data)
+    assert len(lazy_data) == len(data)
+    assert lazy_data._data == {}
+    assert lazy_data["dataset1"].identical(data["dataset1"])
+    assert lazy_data["dataset1"] is lazy_data["dataset1"]
+    with pytest.raises(KeyError):
+        lazy_data["dataset2"]
+
+    unpickled_data = pickle.loads(pickle.dumps(lazy_data))
+    assert isinstance(unpickled_data, dict)
+    assert unpickled_data["dataset1"].identical(data["dataset1"])
+
+    # the shallow copy shares the data with the prepared dataset
+    assert np.shares_memory(data["dataset1"].data.values, problem.data["dataset1"].data.values)
+
+
+def test_combine_matrices():
+    column_maps = {}
+    labels_and_matrices = [
+        LabelAndMatrix(["a", "b"], np.asarray([[1.0, 2.0]])),
+        LabelAndMatrix(["c", "a"], np.asarray([[3.0, 4.0], [5.0, 6.0]])),
+    ]
+    clp_labels, matrix = _combine_matrices(labels_and_matrices, column_maps)
+    assert clp_labels == ["a", "b", "c"]
+    assert np.array_equal(matrix, [[1, 2, 0], [4, 0, 3], [6, 0, 5]])
+    assert labels_and_matrices[0].clp_label == ["a", "b"]
+    assert len(column_maps) == 1
+
+    labels_and_matrices[1] = LabelAndMatrix(["c", "a"], np.asarray([[7.0, 8.0]]))
+    cached_clp_labels, matrix = _combine_matrices(labels_and_matrices, column_maps)
+    assert cached_clp_labels is clp_labels
+    assert np.array_equal(matrix, [[1, 2, 0], [8, 0, 7]])
+    assert len(column_maps) == 1
 
 
 def test_prepare_data():
@@ -219,3 +348,317 @@ def test_prepare_data():
         " because weight is already supplied by dataset.",
     ):
         Problem(Scheme(model, parameters, {"dataset1": data}))
+
+
+def test_weighted_index_independent_residual():
+    model_dict = {
+        "dataset": {
+            "dataset1": {
+                "megacomplex": [],
+            },
+        },
+        "weights": [
+            {
+                "datasets": ["dataset1"],
+                "global_interval": (100, 150),
+                "model_interval": (4, 8),
+                "value": 0.5,
+            },
+        ],
+    }
+    model = SimpleTestModel.from_dict(model_dict)
+    assert not model.index_dependent()
+
+    global_axis = np.asarray(range(50, 300))
+    model_axis = np.asarray(range(15))
+    dataset = xr.DataArray(
+        np.random.default_rng(1).uniform(size=(global_axis.size, model_axis.size)),
+        coords={"e": global_axis, "c": model_axis},
+        dims=("e", "c"),
+    )
+
+    problem = Problem(Scheme(model, ParameterGroup.from_list([]), {"dataset1": dataset}))
+    matrix = problem.reduced_matrices["dataset1"]
+    data = problem.data["dataset1"]
+    for i in range(global_axis.size):
+        weight = data.weight.values[:, i]
+        clp, residual = residual_variable_projection(
+            matrix * weight[:, np.newaxis], data.data.values[:, i] * weight
+        )
+        assert np.allclose(problem.reduced_clps["dataset1"][i], clp)
+        assert np.allclose(problem.weighted_residuals["dataset1"][i], residual)
+        assert np.allclose(problem.residuals["dataset1"][i], residual / weight)
+
+
+@pytest.mark.parametrize("index_dependent", [True, False])
+@pytest.mark.parametrize("grouped", [True, False])
+def test_problem_threads(grouped, index_dependent):
+    model = suite.model
+    model.is_grouped = grouped
+    model.is_index_dependent = index_dependent
+
+    dataset = simulate(
+        suite.sim_model,
+        "dataset1",
+        suite.wanted_parameters,
+        {"e": suite.e_axis, "c": suite.c_axis},
+    )
+    problem = Problem(
+        Scheme(model=model, parameters=suite.initial_parameters, data={"dataset1": dataset})
+    )
+    with Problem(
+        Scheme(
+            model=model,
+            parameters=suite.initial_parameters,
+            data={"dataset1": dataset},
+            number_of_threads=3,
+        )
+    ) as threaded_problem:
+        assert np.array_equal(problem.full_penalty, threaded_problem.full_penalty)
+        assert all(
+            np.array_equal(clp, threaded_clp)
+            for clp, threaded_clp in zip(
+                problem.clps["dataset1"], threaded_problem.clps["dataset1"]
+            )
+        )
+    assert threaded_problem._executor is None
+
+    threaded_problem.reset()
+    problem.reset()
+    assert np.array_equal(problem.full_penalty, threaded_problem.full_penalty)
+    assert threaded_problem._executor is None
+
+
+def test_grouped_bag_keys():
+    model = DecayModel.from_dict(ThreeDatasetDecay.model_dict)
+    model.is_grouped = True
+    model.is_index_dependent = False
+
+    axes = {
+        "dataset1": {"e": ThreeDatasetDecay.e_axis, "c": ThreeDatasetDecay.c_axis},
+        "dataset2": {"e": ThreeDatasetDecay.e_axis2, "c": ThreeDatasetDecay.c_axis2},
+        "dataset3": {"e": ThreeDatasetDecay.e_axis3, "c": ThreeDatasetDecay.c_axis3},
+    }
+    data = {
+        label: simulate(model, label, ThreeDatasetDecay.wanted_parameters, axis)
+        for label, axis in axes.items()
+    }
+    data["dataset3"]["weight"] = xr.DataArray(
+        np.ones_like(data["dataset3"].data), coords=data["dataset3"].coords
+    )
+    data["dataset3"]["weight"][:, 1] = 0.5
+
+    problem = Problem(
+        Scheme(model, ThreeDatasetDecay.initial_parameters, data, group_tolerance=0.1)
+    )
+    bag = problem.bag
+
+    assert bag.group_labels == list(problem.groups)
+    assert [bag.group_labels[group_id] for group_id in bag.group_ids] == [
+        problem_.group for problem_ in bag
+    ]
+    assert sorted(np.concatenate(bag.weight_groups)) == list(range(len(bag)))
+    for indices in bag.weight_groups:
+        assert all(bag[i].group == bag[indices[0]].group for i in indices)
+        assert all(np.array_equal(bag[i].weight, bag[indices[0]].weight) for i in indices)
+    assert len(bag.weight_groups) == len(bag)
+
+
+@pytest.mark.parametrize("number_of_threads", [2, 3, 8])
+@pytest.mark.parametrize("weight", [True, False])
+def test_problem_threads_multiple_datasets(weight, number_of_threads):
+    model = DecayModel.from_dict(ThreeDatasetDecay.model_dict)
+    model.is_grouped = True
+    model.is_index_dependent = False
+
+    axes = {
+        "dataset1": {"e": ThreeDatasetDecay.e_axis, "c": ThreeDatasetDecay.c_axis},
+        "dataset2": {"e": ThreeDatasetDecay.e_axis2, "c": ThreeDatasetDecay.c_axis2},
+        "dataset3": {"e": ThreeDatasetDecay.e_axis3, "c": ThreeDatasetDecay.c_axis3},
+    }
+    data = {}
+    for label, axis in axes.items():
+        dataset = simulate(model, label, ThreeDatasetDecay.wanted_parameters, axis)
+        if weight:
+            dataset["weight"] = xr.DataArray(
+                np.ones_like(dataset.data) * 0.5, coords=dataset.coords
+            )
+        data[label] = dataset
+
+    problem = Problem(
+        Scheme(model, ThreeDatasetDecay.initial_parameters, data, group_tolerance=0.1)
+    )
+    with Problem(
+        Scheme(
+            model,
+            ThreeDatasetDecay.initial_parameters,
+            data,
+            group_tolerance=0.1,
+            number_of_threads=number_of_threads,
+        )
+    ) as threaded_problem:
+        assert np.array_equal(problem.full_penalty, threaded_problem.full_penalty)
+        for label in data:
+            assert all(
+                np.array_equal(clp, threaded_clp)
+                for clp, threaded_clp in zip(problem.clps[label], threaded_problem.clps[label])
+            )
+
+
+@pytest.mark.parametrize("index_dependent", [True, False])
+@pytest.mark.parametrize("grouped", [True, False])
+def test_problem_incremental_reset(grouped, index_dependent):
+    model = DecayModel.from_dict(ThreeDatasetDecay.model_dict)
+    model.is_grouped = grouped
+    model.is_index_dependent = index_dependent
+
+    axes = {
+        "dataset1": {"e": ThreeDatasetDecay.e_axis, "c": ThreeDatasetDecay.c_axis},
+        "dataset2": {"e": ThreeDatasetDecay.e_axis2, "c": ThreeDatasetDecay.c_axis2},
+        "dataset3": {"e": ThreeDatasetDecay.e_axis3, "c": ThreeDatasetDecay.c_axis3},
+    }
+    data = {
+        label: simulate(model, label, ThreeDatasetDecay.wanted_parameters, axis)
+        for label, axis in axes.items()
+    }
+    problem = Problem(Scheme(model, ThreeDatasetDecay.initial_parameters, data))
+    problem.full_penalty
+    matrices = problem.matrices
+
+    problem.parameters.get("2").value = 0.25
+    problem.reset()
+    penalty = problem.full_penalty
+
+    def first_matrix(label, matrices):
+        return matrices[label][0] if index_dependent else matrices[label]
+
+    assert first_matrix("dataset1", problem.matrices) is first_matrix("dataset1", matrices)
+    assert first_matrix("dataset2", problem.matrices) is not first_matrix("dataset2", matrices)
+    assert first_matrix("dataset3", problem.matrices) is not first_matrix("dataset3", matrices)
+    assert np.array_equal(penalty, Problem(Scheme(model, problem.parameters, data)).full_penalty)
+
+
+@pytest.mark.parametrize("index_dependent", [True, False])
+@pytest.mark.parametrize("grouped", [True, False])
+def test_problem_jacobian_sparsity(grouped, index_dependent):
+    model = DecayModel.from_dict(ThreeDatasetDecay.model_dict)
+    model.is_grouped = grouped
+    model.is_index_dependent = index_dependent
+
+    axes = {
+        "dataset1": {"e": ThreeDatasetDecay.e_axis, "c": ThreeDatasetDecay.c_axis},
+        "dataset2": {"e": ThreeDatasetDecay.e_axis2, "c": ThreeDatasetDecay.c_axis2},
+        "dataset3": {"e": ThreeDatasetDecay.e_axis3, "c": ThreeDatasetDecay.c_axis3},
+    }
+    data = {
+        label: simulate(model, label, ThreeDatasetDecay.wanted_parameters, axis)
+        for label, axis in axes.items()
+    }
+    problem = Problem(
+        Scheme(model, ThreeDatasetDecay.initial_parameters, data, group_tolerance=0.1)
+    )
+    labels, values, _, _ = problem.parameters.get_label_value_and_bounds_arrays(
+        exclude_non_vary=True
+    )
+    sparsity = problem.jacobian_sparsity(labels).toarray()
+    assert sparsity.shape == (problem.full_penalty.size, len(labels))
+
+    jacobian = np.empty(sparsity.shape)
+    for i in range(len(labels)):
+        step = np.zeros_like(values)
+        step[i] = 1e-6
+        problem.parameters.set_from_label_and_value_arrays(labels, values + step)
+        problem.reset()
+        upper = problem.full_penalty.copy()
+        problem.parameters.set_from_label_and_value_arrays(labels, values - step)
+        problem.reset()
+        jacobian[:, i] = (upper - problem.full_penalty) / 2e-6
+
+    assert not np.any(jacobian[sparsity == 0])
+    if not grouped:
+        # the first dataset does not depend on the second parameter
+        size = data["dataset1"].data.size
+        assert not np.any(sparsity[:size, 1])
+        assert np.all(sparsity[size:, 1])
+
+
+@pytest.mark.parametrize("index_dependent", [True, False])
+@pytest.mark.parametrize("grouped", [True, False])
+def test_problem_variable_projection_jacobian(monkeypatch, grouped, index_dependent):
+    model = DecayModel.from_dict(ThreeDatasetDecay.model_dict)
+    model.is_grouped = grouped
+    model.is_index_dependent = index_dependent
+    monkeypatch.setattr(model, "has_additional_penalty_function", None)
+
+    axes = {
+        "dataset1": {"e": ThreeDatasetDecay.e_axis, "c": ThreeDatasetDecay.c_axis},
+        "dataset2": {"e": ThreeDatasetDecay.e_axis2, "c": ThreeDatasetDecay.c_axis2},
+        "dataset3": {"e": ThreeDatasetDecay.e_axis3, "c": ThreeDatasetDecay.c_axis3},
+    }
+    data = {
+        label: simulate(model, label, ThreeDatasetDecay.wanted_parameters, axis)
+        for label, axis in axes.items()
+    }
+    data["dataset3"]["weight"] = xr.DataArray(
+        np.ones_like(data["dataset3"].data), coords=data["dataset3"].coords
+    )
+    data["dataset3"]["weight"][:, 1] = 0.5
+
+    problem = Problem(
+        Scheme(model, ThreeDatasetDecay.wanted_parameters, data, group_tolerance=0.1)
+    )
+    assert problem.has_variable_projection_jacobian
+    labels, values, _, _ = problem.parameters.get_label_value_and_bounds_arrays(
+        exclude_non_vary=True
+    )
+    jacobian = problem.variable_projection_jacobian(labels, values)
+    assert jacobian.shape == (problem.full_penalty.size, len(labels))
+
+    # at a perfect fit Kaufman's approximation equals the full jacobian
+    wanted_jacobian = np.empty_like(jacobian)
+    for i in range(len(labels)):
+        step = np.zeros_like(values)
+        step[i] = 1e-6
+        problem.parameters.set_from_label_and_value_arrays(labels, values + step)
+        problem.reset()
+        upper = problem.full_penalty.copy()
+        problem.parameters.set_from_label_and_value_arrays(labels, values - step)
+        problem.reset()
+        wanted_jacobian[:, i] = (upper - problem.full_penalty) / 2e-6
+
+    assert np.allclose(jacobian, wanted_jacobian, atol=1e-5 * np.abs(wanted_jacobian).max())
+
+
+@pytest.mark.parametrize(
+    "value, minimum, maximum, wanted_sign",
+    [(0.0, -np.inf, np.inf, 1), (1.0, 0.0, 1.0, -1), (0.0, 0.0, 1e-10, 1), (0.0, -1e-10, 0.0, -1)],
+)
+def test_finite_difference_step(value, minimum, maximum, wanted_sign):
+    step = _finite_difference_step(value, minimum, maximum)
+    assert np.sign(step) == wanted_sign
+    assert minimum <= value + step <= maximum
+
+
+@pytest.mark.parametrize("index_dependent", [True, False])
+@pytest.mark.parametrize("grouped", [True, False])
+def test_problem_full_penalty_without_clps(monkeypatch, grouped, index_dependent):
+    model = SimpleTestModel.from_dict({"dataset": {"dataset1": {"megacomplex": []}}})
+    model.grouped = lambda: grouped
+    model.index_dependent = lambda: index_dependent
+
+    dataset = xr.DataArray(
+        np.random.default_rng(1).uniform(size=(4, 10)),
+        coords={"e": np.arange(4), "c": np.arange(10)},
+        dims=("e", "c"),
+    ).to_dataset(name="data")
+    dataset["weight"] = xr.full_like(dataset.data, 0.5)
+
+    problem = Problem(Scheme(model, ParameterGroup.from_list([]), {"dataset1": dataset}))
+    calculate_clps = problem.calculate_clps
+    monkeypatch.setattr(problem, "calculate_clps", lambda: pytest.fail("clps calculated"))
+    penalty = problem.full_penalty
+    monkeypatch.setattr(problem, "calculate_clps", calculate_clps)
+
+    residuals = problem.residuals if grouped else problem.residuals["dataset1"]
+    assert np.allclose(np.concatenate(residuals), penalty * 2)
+    assert len(problem.clps["dataset1"]) == 4
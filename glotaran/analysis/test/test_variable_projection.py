@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from glotaran.analysis.nnls import residual_nnls
+from glotaran.analysis.nnls import residual_nnls_batched
+from glotaran.analysis.variable_projection import residual_variable_projection
+from glotaran.analysis.variable_projection import residual_variable_projection_batched
+
+
+@pytest.mark.parametrize("residual_function", [residual_variable_projection, residual_nnls])
+def test_multiple_right_hand_sides(residual_function):
+    rng = np.random.default_rng(42)
+    matrix = np.exp(-np.outer(np.arange(50), [0.01, 0.1, 0.5]))
+    data = matrix @ rng.uniform(0, 1, (3, 7)) + rng.normal(0, 0.01, (50, 7))
+
+    clps, residuals = residual_function(matrix, data)
+    assert clps.shape == (3, 7)
+    assert residuals.shape == data.shape
+
+    for i in range(data.shape[1]):
+        clp, residual = residual_function(matrix, data[:, i])
+        assert np.allclose(clps[:, i], clp)
+        assert np.allclose(residuals[:, i], residual)
+
+
+def test_residual_variable_projection_batched():
+    rng = np.random.default_rng(42)
+    rates = rng.uniform(0.01, 1, (9, 3))
+    matrices = np.exp(-np.arange(50)[np.newaxis, :, np.newaxis] * rates[:, np.newaxis, :])
+    data = np.einsum("itc,ic->it", matrices, rng.uniform(0, 1, (9, 3)))
+    data += rng.normal(0, 0.01, data.shape)
+
+    clps, residuals = residual_variable_projection_batched(matrices, data)
+    assert clps.shape == (9, 3)
+    assert residuals.shape == data.shape
+
+    for i in range(data.shape[0]):
+        clp, residual = residual_variable_projection(matrices[i], data[i])
+        assert np.allclose(clps[i], clp)
+        assert np.allclose(residuals[i], residual)
+
+    # the matrices need a copy for the decomposition, even if they may be overwritten
+    overwritten_clps, overwritten_residuals = residual_variable_projection_batched(
+        matrices.copy(), data, overwrite_matrices=True
+    )
+    assert np.array_equal(overwritten_clps, clps)
+    assert np.array_equal(overwritten_residuals, residuals)
+
+
+def test_residual_nnls_batched():
+    rng = np.random.default_rng(42)
+    rates = rng.uniform(0.01, 1, (9, 4))
+    matrices = np.exp(-np.arange(50)[np.newaxis, :, np.newaxis] * rates[:, np.newaxis, :])
+    data = np.einsum("itc,ic->it", matrices, rng.uniform(-1, 1, (9, 4)))
+    data += rng.normal(0, 0.01, data.shape)
+
+    clps, residuals, passive_sets = residual_nnls_batched(matrices, data)
+    assert clps.shape == (9, 4)
+    assert residuals.shape == data.shape
+    assert np.all(clps >= 0)
+    assert np.array_equal(passive_sets, clps > 0)
+
+    for i in range(data.shape[0]):
+        clp, residual = residual_nnls(matrices[i], data[i])
+        assert np.allclose(clps[i], clp)
+        assert np.allclose(residuals[i], residual)
+
+    warm_clps, warm_residuals, warm_passive_sets = residual_nnls_batched(
+        matrices, data, passive_sets
+    )
+    assert np.allclose(warm_clps, clps)
+    assert np.allclose(warm_residuals, residuals)
+    assert np.array_equal(warm_passive_sets, passive_sets)
+
+    # a wrong warm start must not change the solution
+    warm_clps, _, _ = residual_nnls_batched(matrices, data, ~passive_sets)
+    assert np.allclose(warm_clps, clps)
@@ -3,6 +3,7 @@ projection method."""
 
 import typing
 
+import numba as nb
 import numpy as np
 from scipy.linalg import lapack
 
@@ -18,15 +19,18 @@ def residual_variable_projection(
     matrix :
         The model matrix.
     data : np.ndarray
-        The data to analyze.
+        The data to analyze. If the data is 2-dimensional, every column is treated as a right
+        hand side for the same matrix.
     """
     # TODO: Reference Kaufman paper
 
+    lwork = max(1, matrix.shape[1], data.shape[1] if data.ndim == 2 else 1)
+
     # Kaufman Q2 step 3
     qr, tau, _, _ = lapack.dgeqrf(matrix)
 
     # Kaufman Q2 step 4
-    temp, _, _ = lapack.dormqr("L", "T", qr, tau, data, max(1, matrix.shape[1]), overwrite_c=0)
+    temp, _, _ = lapack.dormqr("L", "T", qr, tau, data, lwork, overwrite_c=0)
 
     clp, _ = lapack.dtrtrs(qr, temp)
 
@@ -35,5 +39,124 @@ def residual_variable_projection(
 
     # Kaufman Q2 step 5
 
-    residual, _, _ = lapack.dormqr("L", "N", qr, tau, temp, max(1, matrix.shape[1]), overwrite_c=0)
+    residual, _, _ = lapack.dormqr("L", "N", qr, tau, temp, lwork, overwrite_c=0)
     return clp[: matrix.shape[1]], residual
+
+
+def jacobian_variable_projection(matrix: np.ndarray, derivatives: np.ndarray) -> np.ndarray:
+    """Calculates Kaufman's approximation of the Jacobian of the variable projection residual.
+
+    Parameters
+    ----------
+    matrix :
+        The model matrix.
+    derivatives : np.ndarray
+        The derivatives of the model matrix with respect to the parameters multiplied with the
+        conditionally linear parameters, one column per parameter.
+    """
+    qr, tau, _, _ = lapack.dgeqrf(matrix)
+
+    temp, _, _ = lapack.dormqr(
+        "L", "T", qr, tau, derivatives, max(1, derivatives.shape[1]), overwrite_c=0
+    )
+    temp[: matrix.shape[1]] = 0
+
+    projected, _, _ = lapack.dormqr(
+        "L", "N", qr, tau, temp, max(1, derivatives.shape[1]), overwrite_c=0
+    )
+    return -projected
+
+
+def residual_variable_projection_batched(
+    matrices: np.ndarray, data: np.ndarray, overwrite_matrices: bool = False
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Calculates the conditionally linear parameters and residuals of a batch of problems with
+    the variable projection method.
+
+    All problems are solved in one compiled call, which avoids the overhead of solving many
+    small problems one by one.
+
+    Parameters
+    ----------
+    matrices : np.ndarray
+        The model matrices with shape `(n_problems, n_rows, n_clp)`.
+    data : np.ndarray
+        The data to analyze with shape `(n_problems, n_rows)`.
+    overwrite_matrices : bool
+        If `True` and the columns of the matrices are contiguous in memory, the matrices are
+        overwritten by the decomposition instead of being copied.
+
+    Returns
+    -------
+    typing.Tuple[np.ndarray, np.ndarray]
+        The conditionally linear parameters with shape `(n_problems, n_clp)` and the residuals
+        with shape `(n_problems, n_rows)`.
+    """
+    # the decomposition is stored transposed, so the columns of the matrices are contiguous
+    qr = np.swapaxes(matrices, 1, 2)
+    qr = (
+        np.ascontiguousarray(qr, dtype=np.float64)
+        if overwrite_matrices
+        else np.array(qr, dtype=np.float64, order="C")
+    )
+    residuals = np.array(data, dtype=np.float64)
+    clps = np.empty(qr.shape[:2], dtype=np.float64)
+    _householder_residuals(qr, residuals, clps)
+    return clps, residuals
+
+
+@nb.jit(nopython=True, nogil=True, parallel=True)
+def _householder_residuals(qr, residuals, clps):
+    """Solves the problems with Householder QR decompositions, analogous to
+    :func:`residual_variable_projection`.
+
+    The transposed matrices are decomposed in place and the data is replaced by the residuals.
+    """
+    n_clp, n_rows = qr.shape[1:]
+    for k in nb.prange(qr.shape[0]):
+        columns = qr[k]
+        residual = residuals[k]
+        taus = np.zeros(n_clp)
+
+        # Kaufman Q2 step 3 and 4
+        for j in range(n_clp):
+            column = columns[j]
+            norm = 0.0
+            for i in range(j, n_rows):
+                norm += column[i] * column[i]
+            norm = np.sqrt(norm)
+            if norm == 0:
+                continue
+            alpha = column[j]
+            beta = -norm if alpha >= 0 else norm
+            for i in range(j + 1, n_rows):
+                column[i] /= alpha - beta
+            column[j] = beta
+            taus[j] = (beta - alpha) / beta
+            for c in range(j + 1, n_clp):
+                _apply_householder(column, j, taus[j], columns[c])
+            _apply_householder(column, j, taus[j], residual)
+
+        for i in range(n_clp - 1, -1, -1):
+            clp = residual[i]
+            for c in range(i + 1, n_clp):
+                clp -= columns[c, i] * clps[k, c]
+            clps[k, i] = clp / columns[i, i]
+            residual[i] = 0
+
+        # Kaufman Q2 step 5
+        for j in range(n_clp - 1, -1, -1):
+            _apply_householder(columns[j], j, taus[j], residual)
+
+
+@nb.jit(nopython=True, nogil=True)
+def _apply_householder(reflector, j, tau, vector):
+    """Applies the Householder reflection stored below the diagonal entry j of a column of the
+    decomposition to the vector."""
+    s = vector[j]
+    for i in range(j + 1, vector.size):
+        s += reflector[i] * vector[i]
+    s *= tau
+    vector[j] -= s
+    for i in range(j + 1, vector.size):
+        vector[i] -= s * reflector[i]
@@ -118,22 +118,34 @@ class YmlProjectIo(ProjectIoInterface):
 
         optimization_method = scheme.get("optimization_method", "TrustRegionReflection")
         nnls = scheme.get("non-negative-least-squares", False)
+        variable_projection_jacobian = scheme.get("variable-projection-jacobian", False)
+        jacobian_sparsity = scheme.get("jacobian-sparsity", False)
         nfev = scheme.get("maximum-number-function-evaluations", None)
         ftol = scheme.get("ftol", 1e-8)
         gtol = scheme.get("gtol", 1e-8)
         xtol = scheme.get("xtol", 1e-8)
         group_tolerance = scheme.get("group_tolerance", 0.0)
+        number_of_threads = scheme.get("number-of-threads", 1)
+        add_svd = scheme.get("add-svd", True)
+        number_of_singular_vectors = scheme.get("number-of-singular-vectors", None)
+        lazy_result_data = scheme.get("lazy-result-data", False)
         saving = SavingOptions(**scheme.get("saving", {}))
         return Scheme(
             model=model,
             parameters=parameters,
             data=data,
             non_negative_least_squares=nnls,
+            variable_projection_jacobian=variable_projection_jacobian,
+            jacobian_sparsity=jacobian_sparsity,
             maximum_number_function_evaluations=nfev,
             ftol=ftol,
             gtol=gtol,
             xtol=xtol,
             group_tolerance=group_tolerance,
+            number_of_threads=number_of_threads,
+            add_svd=add_svd,
+            number_of_singular_vectors=number_of_singular_vectors,
+            lazy_result_data=lazy_result_data,
             optimization_method=optimization_method,
             saving=saving,
         )
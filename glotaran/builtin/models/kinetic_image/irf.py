@@ -86,6 +86,21 @@ class IrfMultiGaussian:
 
         return centers, widths, scale, backsweep, backsweep_period
 
+    def parameters_for_axis(self, global_axis):
+        """Returns the irf parameters for all indices on the global axis.
+
+        Centers, widths and scales have the shape (global index, gaussian).
+        """
+        # subclasses may make the parameters index dependent, so the base parameters are used
+        centers, widths, scale, backsweep, backsweep_period = IrfMultiGaussian.parameter(
+            self, None
+        )
+        shape = (global_axis.size, len(centers))
+        centers = np.broadcast_to(np.asarray(centers, dtype=np.float64), shape).copy()
+        widths = np.broadcast_to(np.asarray(widths, dtype=np.float64), shape).copy()
+        scale = np.broadcast_to(np.asarray(scale, dtype=np.float64), shape).copy()
+        return centers, widths, scale, backsweep, backsweep_period
+
     def calculate(self, index, axis):
         center, width, scale, _, _ = self.parameter(index)
         irf = scale[0] * np.exp(-1 * (axis - center[0]) ** 2 / (2 * width[0] ** 2))
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Any
 
+import numpy as np
+
 from glotaran.model import model_attribute
 from glotaran.model import model_attribute_typed
 from glotaran.parameter import Parameter
@@ -18,6 +20,9 @@ class IrfMultiGaussian:
     @property
     def backsweep_period(self) -> Parameter: ...
     def parameter(self, index: Any): ...
+    def parameters_for_axis(
+        self, global_axis: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, bool, float]: ...
     def calculate(self, index: Any, axis: Any): ...
 
 class IrfGaussian(IrfMultiGaussian):
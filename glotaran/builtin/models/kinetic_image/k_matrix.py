@@ -1,9 +1,11 @@
 """ K-Matrix """
 from __future__ import annotations
 
-import itertools
+import functools
+import threading
 import typing
 from collections import OrderedDict
+from typing import NamedTuple
 
 import numpy as np
 import scipy
@@ -12,6 +14,79 @@ from glotaran.builtin.models.kinetic_image.initial_concentration import InitialC
 from glotaran.model import model_attribute
 from glotaran.parameter import Parameter
 
+# The rates and A-matrices are shared between all KMatrix instances with the same values,
+# since the K-matrices get recreated every time the parameters are filled.
+_EIGEN_CACHE_SIZE = 256
+_eigen_cache: dict[tuple, tuple[np.ndarray, np.ndarray | None, np.ndarray]] = {}
+_eigen_cache_lock = threading.Lock()
+
+
+class KMatrixStructure(NamedTuple):
+    """The compiled structure of a K-matrix for an ordered list of compartments.
+
+    ``compartments`` are the involved compartments in the given order and
+    ``compartment_indices`` their positions in the given compartments.
+
+    The full matrix is filled by scattering ``signs * values[entries]`` to ``(rows, columns)``,
+    the reduced matrix by setting ``values`` at ``(to_indices, from_indices)``.
+    """
+
+    compartments: tuple[str, ...]
+    compartment_indices: np.ndarray
+    to_indices: np.ndarray
+    from_indices: np.ndarray
+    rows: np.ndarray
+    columns: np.ndarray
+    entries: np.ndarray
+    signs: np.ndarray
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_k_matrix(
+    matrix_entries: tuple[tuple[str, str], ...], compartments: tuple[str, ...]
+) -> KMatrixStructure:
+    involved = {c for entry in matrix_entries for c in entry}
+    missing = involved.difference(compartments)
+    if missing:
+        raise ValueError(
+            f"Compartments {sorted(missing)} of the K-Matrix are not in {compartments}."
+        )
+    compartment_indices = np.asarray(
+        [i for i, c in enumerate(compartments) if c in involved], dtype=np.int64
+    )
+    compartments = tuple(compartments[i] for i in compartment_indices)
+    to_indices = np.asarray(
+        [compartments.index(to_comp) for to_comp, _ in matrix_entries], dtype=np.int64
+    )
+    from_indices = np.asarray(
+        [compartments.index(from_comp) for _, from_comp in matrix_entries], dtype=np.int64
+    )
+
+    # the scatter elements are in the order of the entries, so the sums are the same as
+    # when filling the matrix entry by entry
+    rows, columns, entries, signs = [], [], [], []
+    for i, (to_idx, fr_idx) in enumerate(zip(to_indices, from_indices)):
+        if to_idx != fr_idx:
+            rows.append(to_idx)
+            columns.append(fr_idx)
+            entries.append(i)
+            signs.append(1.0)
+        rows.append(fr_idx)
+        columns.append(fr_idx)
+        entries.append(i)
+        signs.append(-1.0)
+
+    return KMatrixStructure(
+        compartments,
+        compartment_indices,
+        to_indices,
+        from_indices,
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(columns, dtype=np.int64),
+        np.asarray(entries, dtype=np.int64),
+        np.asarray(signs, dtype=np.float64),
+    )
+
 
 @model_attribute(
     properties={
@@ -37,13 +112,28 @@ class KMatrix:
 
     def involved_compartments(self) -> list[str]:
         """ A list of all compartments in the Matrix. """
-        compartments = []
-        for index in self.matrix:
-            compartments.append(index[0])
-            compartments.append(index[1])
+        return list(dict.fromkeys(c for index in self.matrix for c in index))
 
-        compartments = list(set(compartments))
-        return compartments
+    def structure(self, compartments: list[str]) -> KMatrixStructure:
+        """The compiled structure of the KMatrix.
+
+        The structure only depends on the matrix entries and the compartment order, so it is
+        compiled once and shared between filled copies of the KMatrix.
+
+        Parameters
+        ----------
+        compartments :
+            The compartment order.
+        """
+        return _compile_k_matrix(tuple(self.matrix), tuple(compartments))
+
+    def values(self) -> np.ndarray:
+        """The values of the matrix entries as numpy array."""
+        return np.fromiter(
+            (float(value) for value in self.matrix.values()),
+            dtype=np.float64,
+            count=len(self.matrix),
+        )
 
     def combine(self, k_matrix: KMatrix) -> KMatrix:
         """Creates a combined matrix.
@@ -152,15 +242,10 @@ class KMatrix:
         compartments :
             The compartment order.
         """
-
-        compartments = [c for c in compartments if c in self.involved_compartments()]
-        size = len(compartments)
+        structure = self.structure(compartments)
+        size = len(structure.compartments)
         array = np.zeros((size, size), dtype=np.float64)
-        # Matrix is a dict
-        for index in self.matrix:
-            i = compartments.index(index[0])
-            j = compartments.index(index[1])
-            array[i, j] = self.matrix[index]
+        array[structure.to_indices, structure.from_indices] = self.values()
         return array
 
     def full(self, compartments: list[str]) -> np.ndarray:
@@ -171,18 +256,14 @@ class KMatrix:
         compartments :
             The compartment order.
         """
-        compartments = [c for c in compartments if c in self.involved_compartments()]
-        size = len(compartments)
+        structure = self.structure(compartments)
+        size = len(structure.compartments)
         mat = np.zeros((size, size), np.float64)
-        for (to_comp, from_comp), param in self.matrix.items():
-            to_idx = compartments.index(to_comp)
-            fr_idx = compartments.index(from_comp)
-
-            if to_idx == fr_idx:
-                mat[to_idx, fr_idx] -= param
-            else:
-                mat[to_idx, fr_idx] += param
-                mat[fr_idx, fr_idx] -= param
+        np.add.at(
+            mat,
+            (structure.rows, structure.columns),
+            structure.signs * self.values()[structure.entries],
+        )
         return mat
 
     def eigen(self, compartments: list[str]) -> tuple[np.ndarray, np.ndarray]:
@@ -208,10 +289,49 @@ class KMatrix:
         initial_concentration :
             The initial concentration.
         """
+        rates, _, _ = self._rates_eigenvectors_and_a_matrix(initial_concentration)
+        return rates.copy()
+
+    def _rates_eigenvectors_and_a_matrix(
+        self, initial_concentration: InitialConcentration
+    ) -> tuple[np.ndarray, np.ndarray | None, np.ndarray]:
+        """Returns the rates, eigenvectors and the A-matrix of the KMatrix.
+
+        The result only depends on the rate values and the initial concentration, so it is
+        shared between all KMatrix instances with the same values. The eigenvectors are `None`
+        for unibranched models. The returned arrays must not be modified.
+
+        Parameters
+        ----------
+        initial_concentration :
+            The initial concentration.
+        """
+        key = (
+            tuple(
+                (to_comp, from_comp, float(value))
+                for (to_comp, from_comp), value in self.matrix.items()
+            ),
+            tuple(initial_concentration.compartments),
+            tuple(float(value) for value in initial_concentration.parameters),
+        )
+        cached = _eigen_cache.get(key)
+        if cached is not None:
+            return cached
+
         if self.is_unibranched(initial_concentration):
-            return np.diag(self.full(initial_concentration.compartments)).copy()
-        rates, _ = self.eigen(initial_concentration.compartments)
-        return rates
+            rates = np.diag(self.full(initial_concentration.compartments)).copy()
+            eigenvectors = None
+            a_matrix = self.a_matrix_unibranch(initial_concentration)
+        else:
+            rates, eigenvectors = self.eigen(initial_concentration.compartments)
+            a_matrix = (eigenvectors @ self._gamma(eigenvectors, initial_concentration)).T
+
+        cached = (rates, eigenvectors, a_matrix)
+        with _eigen_cache_lock:
+            if len(_eigen_cache) >= _EIGEN_CACHE_SIZE:
+                del _eigen_cache[next(iter(_eigen_cache))]
+            _eigen_cache[key] = cached
+        return cached
 
     def _gamma(
         self,
@@ -237,11 +357,8 @@ class KMatrix:
         initial_concentration :
             The initial concentration.
         """
-        return (
-            self.a_matrix_unibranch(initial_concentration)
-            if self.is_unibranched(initial_concentration)
-            else self.a_matrix_non_unibranch(initial_concentration)
-        )
+        _, _, a_matrix = self._rates_eigenvectors_and_a_matrix(initial_concentration)
+        return a_matrix.copy()
 
     def a_matrix_non_unibranch(self, initial_concentration: InitialConcentration) -> np.ndarray:
         """The resulting A matrix of the KMatrix for a non-unibranched model.
@@ -266,21 +383,17 @@ class KMatrix:
         initial_concentration :
             The initial concentration.
         """
-        compartments = [
-            c for c in initial_concentration.compartments if c in self.involved_compartments()
-        ]
-        matrix = self.full(compartments).T
-        rates = np.diag(matrix)
-
-        a_matrix = np.zeros(matrix.shape, dtype=np.float64)
-        a_matrix[0, 0] = 1.0
-        for i, j in itertools.product(range(rates.size), range(1, rates.size)):
-            if i > j:
-                continue
-            a_matrix[i, j] = np.prod([rates[m] for m in range(j)]) / np.prod(
-                [rates[m] - rates[i] for m in range(j + 1) if i != m]
-            )
+        rates = np.diag(self.full(initial_concentration.compartments))
 
+        # a[i, j] = prod(rates[:j]) / prod(rates[m] - rates[i] for m <= j if m != i) for i <= j
+        numerator = np.concatenate(([1.0], np.cumprod(rates)[:-1]))
+        differences = rates[:, np.newaxis] - rates[np.newaxis, :]
+        np.fill_diagonal(differences, 1.0)
+        denominator = np.cumprod(differences, axis=0)
+
+        a_matrix = np.zeros((rates.size, rates.size), dtype=np.float64)
+        i, j = np.triu_indices(rates.size)
+        a_matrix[i, j] = numerator[j] / denominator[j, i]
         return a_matrix
 
     def is_unibranched(self, initial_concentration: InitialConcentration) -> bool:
@@ -291,13 +404,9 @@ class KMatrix:
         initial_concentration :
             The initial concentration.
         """
+        structure = self.structure(initial_concentration.compartments)
         if (
-            np.sum(
-                [
-                    initial_concentration.parameters[initial_concentration.compartments.index(c)]
-                    for c in self.involved_compartments()
-                ]
-            )
+            np.sum([initial_concentration.parameters[i] for i in structure.compartment_indices])
             != 1
         ):
             return False
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 from typing import Any
+from typing import NamedTuple
 
 import numpy as np
 
@@ -8,10 +9,22 @@ from glotaran.builtin.models.kinetic_image.initial_concentration import InitialC
 from glotaran.model import model_attribute
 from glotaran.parameter import Parameter
 
+class KMatrixStructure(NamedTuple):
+    compartments: tuple[str, ...]
+    compartment_indices: np.ndarray
+    to_indices: np.ndarray
+    from_indices: np.ndarray
+    rows: np.ndarray
+    columns: np.ndarray
+    entries: np.ndarray
+    signs: np.ndarray
+
 class KMatrix:
     @classmethod
     def empty(cls: Any, label: str, compartments: list[str]) -> KMatrix: ...
     def involved_compartments(self) -> list[str]: ...
+    def structure(self, compartments: list[str]) -> KMatrixStructure: ...
+    def values(self) -> np.ndarray: ...
     def combine(self, k_matrix: KMatrix) -> KMatrix: ...
     def matrix_as_markdown(
         self, compartments: list[str] = ..., fill_parameters: bool = ...
@@ -21,6 +34,9 @@ class KMatrix:
     def full(self, compartments: list[str]) -> np.ndarray: ...
     def eigen(self, compartments: list[str]) -> tuple[np.ndarray, np.ndarray]: ...
     def rates(self, initial_concentration: InitialConcentration) -> np.ndarray: ...
+    def _rates_eigenvectors_and_a_matrix(
+        self, initial_concentration: InitialConcentration
+    ) -> tuple[np.ndarray, np.ndarray | None, np.ndarray]: ...
     def a_matrix(self, initial_concentration: InitialConcentration) -> np.ndarray: ...
     def a_matrix_non_unibranch(
         self, initial_concentration: InitialConcentration
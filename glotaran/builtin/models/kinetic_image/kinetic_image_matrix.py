@@ -2,8 +2,11 @@
 
 import numba as nb
 import numpy as np
+import scipy
 
 from glotaran.builtin.models.kinetic_image.irf import IrfMultiGaussian
+from glotaran.builtin.models.kinetic_image.k_matrix import KMatrix
+from glotaran.parameter import Parameter
 
 sqrt2 = np.sqrt(2)
 
@@ -18,19 +21,14 @@ def kinetic_matrix(
     dataset_descriptor=None, axis=None, index=None, irf=None, matrix_implementation=None
 ):
 
-    compartments = None
-    matrix = None
     megacomplex_scales, k_matrices = dataset_descriptor.get_megacomplex_k_matrices()
 
     if len(k_matrices) == 0:
         return (None, None)
 
-    if dataset_descriptor.initial_concentration is None:
-        raise Exception(
-            f'No initial concentration specified in dataset "{dataset_descriptor.label}"'
-        )
-    initial_concentration = dataset_descriptor.initial_concentration.normalized()
+    initial_concentration = _get_initial_concentration(dataset_descriptor)
 
+    k_matrix_results = []
     for k_matrix_index, k_matrix in enumerate(k_matrices):
 
         if k_matrix is None:
@@ -49,31 +47,316 @@ def kinetic_matrix(
         if megacomplex_scales is not None:
             this_matrix *= megacomplex_scales[k_matrix_index]
 
-        if matrix is None:
-            compartments = this_compartments
-            matrix = this_matrix
-        else:
-            new_compartments = compartments + [
-                c for c in this_compartments if c not in compartments
-            ]
-            new_matrix = np.zeros((matrix.shape[0], len(new_compartments)), dtype=np.float64)
-            for idx, comp in enumerate(new_compartments):
-                if comp in compartments:
-                    new_matrix[:, idx] += matrix[:, compartments.index(comp)]
-                if comp in this_compartments:
-                    new_matrix[:, idx] += this_matrix[:, this_compartments.index(comp)]
-            compartments = new_compartments
-            matrix = new_matrix
+        k_matrix_results.append((this_compartments, this_matrix))
+
+    return _combine_megacomplex_matrices(dataset_descriptor, k_matrix_results, (axis.size,))
+
+
+def kinetic_matrices(dataset_descriptor=None, axis=None, global_axis=None):
+    """Calculates the kinetic matrices for all indices on the global axis at once.
+
+    Only datasets with a multi gaussian irf are calculated with the fused kernel, for all
+    others `None` is returned to calculate the matrices index by index.
+    """
+    irf = dataset_descriptor.irf
+    megacomplex_scales, k_matrices = dataset_descriptor.get_megacomplex_k_matrices()
+
+    if not isinstance(irf, IrfMultiGaussian) or len(k_matrices) == 0:
+        return None
+
+    initial_concentration = _get_initial_concentration(dataset_descriptor)
+
+    centers, widths, irf_scales, backsweep, backsweep_period = irf.parameters_for_axis(global_axis)
+    normalizations = (
+        np.sum(irf_scales, axis=1) if irf.normalize else np.ones(global_axis.size, np.float64)
+    )
+
+    k_matrix_results = []
+    for k_matrix_index, k_matrix in enumerate(k_matrices):
+
+        if k_matrix is None:
+            continue
+
+        compartments = list(k_matrix.structure(initial_concentration.compartments).compartments)
+        rates, _, a_matrix = k_matrix._rates_eigenvectors_and_a_matrix(initial_concentration)
+        megacomplex_scale = (
+            float(megacomplex_scales[k_matrix_index]) if megacomplex_scales is not None else 1.0
+        )
+
+        matrices = np.empty((global_axis.size, axis.size, a_matrix.shape[1]), dtype=np.float64)
+        finite = calculate_kinetic_matrices_gaussian_irf(
+            matrices,
+            rates,
+            np.ascontiguousarray(a_matrix),
+            axis,
+            centers,
+            widths,
+            irf_scales,
+            normalizations,
+            megacomplex_scale,
+            backsweep,
+            backsweep_period,
+        )
+        if not finite:
+            raise ValueError(
+                f"Non-finite concentrations for K-Matrix '{k_matrix.label}':\n"
+                f"{k_matrix.matrix_as_markdown(fill_parameters=True)}"
+            )
+
+        k_matrix_results.append((compartments, matrices))
+
+    return _combine_megacomplex_matrices(
+        dataset_descriptor, k_matrix_results, (global_axis.size, axis.size)
+    )
+
+
+def kinetic_matrix_derivatives(dataset_descriptor=None, axis=None):
+    """Calculates the derivatives of the kinetic matrix of an index independent dataset by its
+    parameters.
+
+    The derivatives by the rates of the K-matrices are calculated from the derivatives of their
+    eigenvalues and eigenvectors, the derivatives by the centers and widths of a multi gaussian
+    irf and by the megacomplex scales directly. A parameter which the matrix also depends on in
+    any other way, e.g. as initial concentration or irf scale, is left out. Datasets with a
+    measured irf, a backsweep or K-matrices with complex or degenerate rates have no derivatives.
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        The derivatives of the matrix by the full labels of the parameters.
+    """
+    megacomplex_scales, k_matrices = dataset_descriptor.get_megacomplex_k_matrices()
+    irf = dataset_descriptor.irf
+    if len(k_matrices) == 0 or (
+        irf is not None
+        and (
+            not isinstance(irf, IrfMultiGaussian)
+            or irf.backsweep
+            or getattr(irf, "dispersion_center", None) is not None
+        )
+    ):
+        return {}
+
+    initial_concentration = _get_initial_concentration(dataset_descriptor)
+
+    k_matrix_results = []
+    for k_matrix_index, k_matrix in enumerate(k_matrices):
+
+        if k_matrix is None:
+            continue
+
+        compartments = list(k_matrix.structure(initial_concentration.compartments).compartments)
+        derivatives = _calculate_derivatives_for_k_matrix(
+            axis, k_matrix, initial_concentration, irf
+        )
+        if derivatives is None:
+            return {}
+
+        if megacomplex_scales is not None:
+            scale = megacomplex_scales[k_matrix_index]
+            matrix = derivatives.pop(None)
+            derivatives = {label: derivative * scale for label, derivative in derivatives.items()}
+            if isinstance(scale, Parameter):
+                derivatives[scale.full_label] = derivatives.get(scale.full_label, 0) + matrix
+
+        derivatives.pop(None, None)
+        k_matrix_results.append((compartments, derivatives))
+
+    # parameters which are used anywhere else in the dataset are not derived analytically
+    excluded_labels = _get_parameter_labels(
+        dataset_descriptor,
+        lambda item, name: (
+            isinstance(item, KMatrix)
+            and name == "matrix"
+            or item is dataset_descriptor
+            and name == "megacomplex_scale"
+            or item is irf
+            and name in ("center", "width")
+        ),
+    )
+    labels = {label for _, derivatives in k_matrix_results for label in derivatives}
+
+    result = {}
+    for label in labels - excluded_labels:
+        _, matrix = _combine_megacomplex_matrices(
+            dataset_descriptor,
+            [
+                (
+                    compartments,
+                    derivatives.get(label, np.zeros((axis.size, len(compartments)))),
+                )
+                for compartments, derivatives in k_matrix_results
+            ],
+            (axis.size,),
+        )
+        if dataset_descriptor.baseline:
+            # the baseline does not depend on any parameter
+            matrix[:, -1] = 0
+        result[label] = matrix
+    return result
+
+
+def _calculate_derivatives_for_k_matrix(axis, k_matrix, initial_concentration, irf):
+    """Calculates the derivatives of the matrix of a K-matrix.
+
+    With the eigenvectors ``V`` and the eigenvalues of the full K-matrix ``K`` the A-matrix is
+    ``diag(gamma) V.T`` with ``gamma = V^-1 j``. For a derivative ``dK`` the eigenvalues change
+    by the diagonal of ``M = V^-1 dK V`` and the eigenvectors by ``dV = V C`` with
+    ``C[k, i] = M[k, i] / (rates[i] - rates[k])``, which gives ``dgamma = -C gamma``.
+
+    Returns
+    -------
+    dict[str | None, np.ndarray] | None
+        The derivatives by the full labels of the parameters and the matrix itself as `None`,
+        or `None` if the rates are complex or degenerate.
+    """
+    structure = k_matrix.structure(initial_concentration.compartments)
+    rates, eigenvectors = scipy.linalg.eig(k_matrix.full(initial_concentration.compartments))
+    differences = rates[np.newaxis, :] - rates[:, np.newaxis]
+    np.fill_diagonal(differences, 1.0)
+    if np.any(rates.imag != 0) or np.any(
+        np.abs(differences) <= np.sqrt(np.finfo(np.float64).eps) * np.max(np.abs(rates))
+    ):
+        return None
+    rates, eigenvectors, differences = rates.real, eigenvectors.real, differences.real
+
+    inverse = np.linalg.inv(eigenvectors)
+    gamma = inverse @ np.asarray(
+        [float(initial_concentration.parameters[i]) for i in structure.compartment_indices]
+    )
+    a_matrix = gamma[:, np.newaxis] * eigenvectors.T
+
+    matrix = np.zeros((axis.size, rates.size), dtype=np.float64)
+    rate_derivatives = np.zeros((axis.size, rates.size), dtype=np.float64)
+    derivatives = {}
+    if irf is None:
+        matrix[:] = np.exp(axis[:, np.newaxis] * rates)
+        rate_derivatives[:] = axis[:, np.newaxis] * matrix
+    else:
+        centers, widths, irf_scales, _, _ = irf.parameter(None)
+        normalization = np.sum(irf_scales) if irf.normalize else 1.0
+        center_labels = _get_full_labels(irf.center, len(centers))
+        width_labels = _get_full_labels(irf.width, len(widths))
+        for center, width, irf_scale, center_label, width_label in zip(
+            centers, widths, irf_scales, center_labels, width_labels
+        ):
+            center_derivatives = np.zeros_like(matrix)
+            width_derivatives = np.zeros_like(matrix)
+            calculate_kinetic_matrix_gaussian_irf_derivatives(
+                matrix,
+                rate_derivatives,
+                center_derivatives,
+                width_derivatives,
+                rates,
+                axis,
+                center,
+                width,
+                irf_scale / normalization,
+            )
+            for label, derivative in (
+                (center_label, center_derivatives),
+                (width_label, width_derivatives),
+            ):
+                if label is not None:
+                    derivatives[label] = derivatives.get(label, 0) + derivative @ a_matrix
+
+    if not np.all(np.isfinite(matrix)) or not np.all(np.isfinite(rate_derivatives)):
+        return None
+
+    full_derivatives = {}
+    parameters = list(k_matrix.matrix.values())
+    for row, column, entry, sign in zip(
+        structure.rows, structure.columns, structure.entries, structure.signs
+    ):
+        if isinstance(parameters[entry], Parameter):
+            full_derivative = full_derivatives.setdefault(
+                parameters[entry].full_label, np.zeros((rates.size, rates.size))
+            )
+            full_derivative[row, column] += sign
+
+    for label, full_derivative in full_derivatives.items():
+        transformed = inverse @ full_derivative @ eigenvectors
+        coefficients = transformed / differences
+        np.fill_diagonal(coefficients, 0.0)
+        a_matrix_derivative = (-coefficients @ gamma)[:, np.newaxis] * eigenvectors.T + gamma[
+            :, np.newaxis
+        ] * (eigenvectors @ coefficients).T
+        derivatives[label] = (
+            derivatives.get(label, 0)
+            + (rate_derivatives * np.diag(transformed)) @ a_matrix
+            + matrix @ a_matrix_derivative
+        )
+
+    derivatives[None] = matrix @ a_matrix
+    return derivatives
+
+
+def _get_full_labels(parameters, size):
+    """Returns the full labels of a parameter or a list of parameters of an irf, repeated to
+    the number of gaussians if there is only one, and `None` for values which are no
+    parameters."""
+    parameters = parameters if isinstance(parameters, list) else [parameters]
+    if len(parameters) == 1:
+        parameters = parameters * size
+    return [
+        parameter.full_label if isinstance(parameter, Parameter) else None
+        for parameter in parameters
+    ]
+
+
+def _get_parameter_labels(item, skip):
+    """Returns the full labels of all parameters in a filled model item, leaving out the
+    properties for which ``skip(item, name)`` is true."""
+    if isinstance(item, Parameter):
+        return {item.full_label}
+    if isinstance(item, dict):
+        item = list(item.values())
+    elif hasattr(item, "_glotaran_properties"):
+        item = [getattr(item, name) for name in item._glotaran_properties if not skip(item, name)]
+    if isinstance(item, (list, tuple)):
+        return set().union(*(_get_parameter_labels(value, skip) for value in item))
+    return set()
+
+
+def _get_initial_concentration(dataset_descriptor):
+    if dataset_descriptor.initial_concentration is None:
+        raise Exception(
+            f'No initial concentration specified in dataset "{dataset_descriptor.label}"'
+        )
+    return dataset_descriptor.initial_concentration.normalized()
+
+
+def _combine_megacomplex_matrices(dataset_descriptor, k_matrix_results, shape):
+    """Sums up the matrices of the megacomplexes and adds the baseline.
+
+    The compartments are the last axis of the matrices, ``shape`` are the leading axes.
+    """
+
+    if len(k_matrix_results) == 0:
+        compartments, matrix = None, None
+    elif len(k_matrix_results) == 1:
+        compartments, matrix = k_matrix_results[0]
+    else:
+        # the matrices of the megacomplexes are summed up in the union of their compartments
+        compartments = list(
+            dict.fromkeys(
+                c for this_compartments, _ in k_matrix_results for c in this_compartments
+            )
+        )
+        column_map = {c: i for i, c in enumerate(compartments)}
+        matrix = np.zeros(shape + (len(compartments),), dtype=np.float64)
+        for this_compartments, this_matrix in k_matrix_results:
+            matrix[..., [column_map[c] for c in this_compartments]] += this_matrix
 
     if dataset_descriptor.baseline:
         baseline_compartment = f"{dataset_descriptor.label}_baseline"
-        baseline = np.ones((axis.size, 1), dtype=np.float64)
+        baseline = np.ones(shape + (1,), dtype=np.float64)
         if matrix is None:
             compartments = [baseline_compartment]
             matrix = baseline
         else:
             compartments.append(baseline_compartment)
-            matrix = np.concatenate((matrix, baseline), axis=1)
+            matrix = np.concatenate((matrix, baseline), axis=-1)
 
     return (compartments, matrix)
 
@@ -83,14 +366,10 @@ def _calculate_for_k_matrix(
 ):
 
     # we might have more compartments in the model then in the k matrix
-    compartments = [
-        comp
-        for comp in initial_concentration.compartments
-        if comp in k_matrix.involved_compartments()
-    ]
+    compartments = list(k_matrix.structure(initial_concentration.compartments).compartments)
 
     # the rates are the eigenvalues of the k matrix
-    rates = k_matrix.rates(initial_concentration)
+    rates, _, a_matrix = k_matrix._rates_eigenvectors_and_a_matrix(initial_concentration)
 
     # init the matrix
     size = (axis.size, rates.size)
@@ -105,7 +384,7 @@ def _calculate_for_k_matrix(
         )
 
     # apply A matrix
-    matrix = matrix @ k_matrix.a_matrix(initial_concentration)
+    matrix = matrix @ a_matrix
 
     # done
     return (compartments, matrix)
@@ -139,7 +418,7 @@ def kinetic_image_matrix_implementation(
         calculate_kinetic_matrix_no_irf(matrix, rates, axis)
 
 
-@nb.jit(nopython=True, parallel=True)
+@nb.jit(nopython=True, nogil=True, parallel=True)
 def calculate_kinetic_matrix_no_irf(matrix, rates, times):
     for n_r in nb.prange(rates.size):
         r_n = rates[n_r]
@@ -148,43 +427,251 @@ def calculate_kinetic_matrix_no_irf(matrix, rates, times):
             matrix[n_t, n_r] += np.exp(r_n * t_n)
 
 
-@nb.jit(nopython=True, parallel=True)
+@nb.jit(nopython=True, nogil=True, parallel=True)
 def calculate_kinetic_matrix_gaussian_irf(
     matrix, rates, times, center, width, scale, backsweep, backsweep_period
 ):
     """Calculates a kinetic matrix with a gaussian irf."""
+    for n_r in nb.prange(rates.size):
+        for n_t in nb.prange(times.size):
+            _add_kinetic_gaussian_irf(
+                matrix, n_t, n_r, rates, times, center, width, scale, backsweep, backsweep_period
+            )
+
+
+@nb.jit(nopython=True, nogil=True, parallel=True)
+def calculate_kinetic_matrices_gaussian_irf(
+    matrices,
+    rates,
+    a_matrix,
+    times,
+    centers,
+    widths,
+    scales,
+    normalizations,
+    megacomplex_scale,
+    backsweep,
+    backsweep_period,
+):
+    """Calculates the kinetic matrices with a multi gaussian irf for all global indices.
+
+    ``centers``, ``widths`` and ``scales`` have the shape (global index, gaussian) and
+    ``normalizations`` the shape (global index). The matrices are normalized, multiplied
+    with the A-matrix and scaled with the megacomplex scale. Returns `False` if the matrix
+    of an index had non-finite values before applying the A-matrix.
+    """
+    finite = np.ones(centers.shape[0], dtype=np.bool_)
+    for n_i in nb.prange(centers.shape[0]):
+        finite[n_i] = _calculate_kinetic_matrix_multi_gaussian_irf(
+            matrices[n_i],
+            rates,
+            a_matrix,
+            times,
+            centers[n_i],
+            widths[n_i],
+            scales[n_i],
+            normalizations[n_i],
+            megacomplex_scale,
+            backsweep,
+            backsweep_period,
+        )
+    return np.all(finite)
+
+
+@nb.jit(nopython=True, nogil=True)
+def _calculate_kinetic_matrix_multi_gaussian_irf(
+    result,
+    rates,
+    a_matrix,
+    times,
+    centers,
+    widths,
+    scales,
+    normalization,
+    megacomplex_scale,
+    backsweep,
+    backsweep_period,
+):
+    matrix = np.zeros((times.size, rates.size), dtype=np.float64)
+    for n_g in range(centers.size):
+        for n_r in range(rates.size):
+            for n_t in range(times.size):
+                _add_kinetic_gaussian_irf(
+                    matrix,
+                    n_t,
+                    n_r,
+                    rates,
+                    times,
+                    centers[n_g],
+                    widths[n_g],
+                    scales[n_g],
+                    backsweep,
+                    backsweep_period,
+                )
+    matrix /= normalization
+    for n_t in range(times.size):
+        for n_s in range(a_matrix.shape[1]):
+            value = 0.0
+            for n_r in range(rates.size):
+                value += matrix[n_t, n_r] * a_matrix[n_r, n_s]
+            result[n_t, n_s] = value * megacomplex_scale
+    return np.all(np.isfinite(matrix))
+
+
+@nb.jit(nopython=True, nogil=True, parallel=True)
+def calculate_kinetic_matrix_gaussian_irf_derivatives(
+    matrix,
+    rate_derivatives,
+    center_derivatives,
+    width_derivatives,
+    rates,
+    times,
+    center,
+    width,
+    scale,
+):
+    """Adds a kinetic matrix with a gaussian irf and its derivatives by the rates and the
+    center and width of the irf.
+
+    With ``alpha = -rate * width / sqrt(2)`` and ``beta = (time - center) / (width * sqrt(2))``
+    the value is ``0.5 * exp(alpha**2 - 2 * alpha * beta) * erfc(alpha - beta)``, whose
+    derivatives are ``2 * (alpha - beta) * value - exp(-beta**2) / sqrt(pi)`` by ``alpha`` and
+    ``-2 * alpha * value + exp(-beta**2) / sqrt(pi)`` by ``beta``.
+    """
     for n_r in nb.prange(rates.size):
         r_n = -rates[n_r]
-        backsweep_valid = abs(r_n) * backsweep_period > 0.001
         alpha = (r_n * width) / sqrt2
-        for n_t in nb.prange(times.size):
-            t_n = times[n_t]
-            beta = (t_n - center) / (width * sqrt2)
+        for n_t in range(times.size):
+            beta = (times[n_t] - center) / (width * sqrt2)
             thresh = beta - alpha
+            gauss = np.exp(-beta * beta)
             if thresh < -1:
-                matrix[n_t, n_r] += scale * 0.5 * erfcx(-thresh) * np.exp(-beta * beta)
+                value = 0.5 * erfcx(-thresh) * gauss
+                d_alpha = gauss * (-thresh * erfcx(-thresh) - _SQRT_PI_INV)
             else:
-                matrix[n_t, n_r] += (
-                    scale * 0.5 * (1 + erf(thresh)) * np.exp(alpha * (alpha - 2 * beta))
-                )
-            if backsweep and backsweep_valid:
-                x1 = np.exp(-r_n * (t_n - center + backsweep_period))
-                x2 = np.exp(-r_n * ((backsweep_period / 2) - (t_n - center)))
-                x3 = np.exp(-r_n * backsweep_period)
-                matrix[n_t, n_r] += scale * (x1 + x2) / (1 - x3)
-
-
-import ctypes  # noqa: E402
-
-# This is a work around to use scipy.special function with numba
-from numba.extending import get_cython_function_address  # noqa: E402
-
-_dble = ctypes.c_double
-
-functype = ctypes.CFUNCTYPE(_dble, _dble)
-
-erf_addr = get_cython_function_address("scipy.special.cython_special", "__pyx_fuse_1erf")
-erfcx_addr = get_cython_function_address("scipy.special.cython_special", "__pyx_fuse_1erfcx")
-
-erf = functype(erf_addr)
-erfcx = functype(erfcx_addr)
+                value = 0.5 * (1 + erf(thresh)) * np.exp(alpha * (alpha - 2 * beta))
+                d_alpha = -2 * thresh * value - gauss * _SQRT_PI_INV
+            d_beta = -2 * alpha * value + gauss * _SQRT_PI_INV
+            matrix[n_t, n_r] += scale * value
+            rate_derivatives[n_t, n_r] -= scale * d_alpha * width / sqrt2
+            center_derivatives[n_t, n_r] -= scale * d_beta / (width * sqrt2)
+            width_derivatives[n_t, n_r] += scale * (d_alpha * r_n / sqrt2 - d_beta * beta / width)
+
+
+@nb.jit(nopython=True, nogil=True)
+def _add_kinetic_gaussian_irf(
+    matrix, n_t, n_r, rates, times, center, width, scale, backsweep, backsweep_period
+):
+    """Adds the decay of a rate convolved with a gaussian irf at a time to the matrix."""
+    r_n = -rates[n_r]
+    backsweep_valid = abs(r_n) * backsweep_period > 0.001
+    alpha = (r_n * width) / sqrt2
+    t_n = times[n_t]
+    beta = (t_n - center) / (width * sqrt2)
+    thresh = beta - alpha
+    if thresh < -1:
+        matrix[n_t, n_r] += scale * 0.5 * erfcx(-thresh) * np.exp(-beta * beta)
+    else:
+        matrix[n_t, n_r] += scale * 0.5 * (1 + erf(thresh)) * np.exp(alpha * (alpha - 2 * beta))
+    if backsweep and backsweep_valid:
+        x1 = np.exp(-r_n * (t_n - center + backsweep_period))
+        x2 = np.exp(-r_n * ((backsweep_period / 2) - (t_n - center)))
+        x3 = np.exp(-r_n * backsweep_period)
+        matrix[n_t, n_r] += scale * (x1 + x2) / (1 - x3)
+
+
+# Rational approximations of the error functions by W. J. Cody,
+# "Rational Chebyshev approximations for the error function", Math. Comp. 23 (1969) 631-637,
+# as implemented in the CALERF routine of the SPECFUN package. The polynomials are written
+# out, so that numba can inline them with constant coefficients.
+_SQRT_PI_INV = 5.6418958354775628695e-1
+_ERFC_X_BIG = 26.543
+_ERFCX_X_HUGE = 6.71e7
+_ERFCX_X_NEG = -26.628
+
+
+@nb.jit(nopython=True, nogil=True)
+def _erf_small(x):
+    """``erf(x)`` for ``|x| <= 0.46875``."""
+    ysq = x * x
+    xnum = 1.85777706184603153e-1 * ysq
+    xden = ysq
+    xnum = (xnum + 3.16112374387056560e00) * ysq
+    xden = (xden + 2.36012909523441209e01) * ysq
+    xnum = (xnum + 1.13864154151050156e02) * ysq
+    xden = (xden + 2.44024637934444173e02) * ysq
+    xnum = (xnum + 3.77485237685302021e02) * ysq
+    xden = (xden + 1.28261652607737228e03) * ysq
+    return x * (xnum + 3.20937758913846947e03) / (xden + 2.84423683343917062e03)
+
+
+@nb.jit(nopython=True, nogil=True)
+def _erfcx_positive(y):
+    """``erfcx(y)`` for ``y > 0.46875``."""
+    if y <= 4.0:
+        xnum = 2.15311535474403846e-8 * y
+        xden = y
+        xnum = (xnum + 5.64188496988670089e-1) * y
+        xden = (xden + 1.57449261107098347e01) * y
+        xnum = (xnum + 8.88314979438837594e00) * y
+        xden = (xden + 1.17693950891312499e02) * y
+        xnum = (xnum + 6.61191906371416295e01) * y
+        xden = (xden + 5.37181101862009858e02) * y
+        xnum = (xnum + 2.98635138197400131e02) * y
+        xden = (xden + 1.62138957456669019e03) * y
+        xnum = (xnum + 8.81952221241769090e02) * y
+        xden = (xden + 3.29079923573345963e03) * y
+        xnum = (xnum + 1.71204761263407058e03) * y
+        xden = (xden + 4.36261909014324716e03) * y
+        xnum = (xnum + 2.05107837782607147e03) * y
+        xden = (xden + 3.43936767414372164e03) * y
+        return (xnum + 1.23033935479799725e03) / (xden + 1.23033935480374942e03)
+
+    if y >= _ERFCX_X_HUGE:
+        return _SQRT_PI_INV / y
+    ysq = 1.0 / (y * y)
+    xnum = 1.63153871373020978e-2 * ysq
+    xden = ysq
+    xnum = (xnum + 3.05326634961232344e-1) * ysq
+    xden = (xden + 2.56852019228982242e00) * ysq
+    xnum = (xnum + 3.60344899949804439e-1) * ysq
+    xden = (xden + 1.87295284992346725e00) * ysq
+    xnum = (xnum + 1.25781726111229246e-1) * ysq
+    xden = (xden + 5.27905102951428412e-1) * ysq
+    xnum = (xnum + 1.60837851487422766e-2) * ysq
+    xden = (xden + 6.05183413124413191e-2) * ysq
+    result = ysq * (xnum + 6.58749161529837803e-4) / (xden + 2.33520497626869185e-3)
+    return (_SQRT_PI_INV - result) / y
+
+
+@nb.jit(nopython=True, nogil=True)
+def _exp_square(x):
+    """``exp(x * x)`` with x * x split into an exact part and a small remainder."""
+    xsq = np.trunc(x * 16.0) / 16.0
+    delta = (x - xsq) * (x + xsq)
+    return np.exp(xsq * xsq) * np.exp(delta)
+
+
+@nb.jit(nopython=True, nogil=True)
+def erf(x):
+    """The error function."""
+    y = abs(x)
+    if y <= 0.46875:
+        return _erf_small(x)
+    # the rounding error of y * y is negligible, since erfc(y) * y**2 < 0.16 for y > 0.46875
+    erfc = 0.0 if y >= _ERFC_X_BIG else _erfcx_positive(y) * np.exp(-y * y)
+    result = (0.5 - erfc) + 0.5
+    return result if x > 0 else -result
+
+
+@nb.jit(nopython=True, nogil=True)
+def erfcx(x):
+    """The scaled complementary error function ``exp(x**2) * erfc(x)``."""
+    if abs(x) <= 0.46875:
+        return np.exp(x * x) * (1.0 - _erf_small(x))
+    if x > 0:
+        return _erfcx_positive(x)
+    if x < _ERFCX_X_NEG:
+        return np.inf
+    y = _exp_square(x)
+    return (y + y) - _erfcx_positive(-x)
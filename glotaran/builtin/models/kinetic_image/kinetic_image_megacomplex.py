@@ -30,4 +30,5 @@ class KineticImageMegacomplex:
 
     @property
     def involved_compartments(self):
-        return self.full_k_matrix().involved_compartments() if self.full_k_matrix() else []
+        full_k_matrix = self.full_k_matrix()
+        return full_k_matrix.involved_compartments() if full_k_matrix else []
@@ -5,6 +5,7 @@ from glotaran.builtin.models.kinetic_image.kinetic_image_dataset_descriptor impo
     KineticImageDatasetDescriptor,
 )
 from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_image_matrix
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_matrix_derivatives
 from glotaran.builtin.models.kinetic_image.kinetic_image_megacomplex import KineticImageMegacomplex
 from glotaran.builtin.models.kinetic_image.kinetic_image_result import (
     finalize_kinetic_image_result,
@@ -23,6 +24,7 @@ from glotaran.model import model
     dataset_type=KineticImageDatasetDescriptor,
     megacomplex_type=KineticImageMegacomplex,
     matrix=kinetic_image_matrix,
+    matrix_derivatives=kinetic_matrix_derivatives,
     model_dimension="time",
     global_dimension="pixel",
     grouped=False,
@@ -300,3 +300,66 @@ def test_combine_matrices():
     assert combined.matrix[("s1", "s1")].full_label == "1"
     assert combined.matrix[("s2", "s2")].full_label == "3"
     assert combined.matrix[("s3", "s3")].full_label == "4"
+
+
+@pytest.mark.parametrize(
+    "matrix",
+    [SequentialModel, SequentialModelWithBacktransfer, ParallelModelWithEquilibria],
+)
+def test_rates_and_a_matrix_cache(matrix):
+
+    params = ParameterGroup.from_list(matrix.params)
+
+    def create_filled(params):
+        mat = KMatrix()
+        mat.label = ""
+        mat.matrix = matrix.matrix
+        con = InitialConcentration()
+        con.label = ""
+        con.compartments = matrix.compartments
+        con.parameters = matrix.jvec
+        return mat.fill(None, params), con.fill(None, params)
+
+    mat, con = create_filled(params)
+    cached = mat._rates_eigenvectors_and_a_matrix(con)
+    assert np.allclose(mat.a_matrix(con), matrix.wanted_a_matrix)
+    assert np.allclose(np.sort(mat.rates(con)), np.sort(matrix.wanted_eigen_vals))
+
+    other_mat, other_con = create_filled(params)
+    assert other_mat._rates_eigenvectors_and_a_matrix(other_con) is cached
+
+    params.get("1").value += 0.1
+    perturbed_mat, perturbed_con = create_filled(params)
+    assert perturbed_mat._rates_eigenvectors_and_a_matrix(perturbed_con) is not cached
+
+
+def test_structure():
+
+    matrix = {
+        ("s3", "s1"): "1",
+        ("s2", "s2"): "2",
+        ("s2", "s3"): "3",
+    }
+    params = ParameterGroup.from_list([0.5, 0.2, 0.1])
+    mat = KMatrix()
+    mat.label = ""
+    mat.matrix = matrix
+    mat = mat.fill(None, params)
+
+    structure = mat.structure(["s0", "s1", "s2", "s3"])
+    assert structure.compartments == ("s1", "s2", "s3")
+    assert np.array_equal(structure.compartment_indices, [1, 2, 3])
+    assert structure is mat.structure(["s0", "s1", "s2", "s3"])
+    assert np.array_equal(mat.values(), [0.5, 0.2, 0.1])
+
+    wanted_full = np.asarray(
+        [
+            [-0.5, 0, 0],
+            [0, -0.2, 0.1],
+            [0.5, 0, -0.1],
+        ]
+    )
+    assert np.array_equal(mat.full(["s0", "s1", "s2", "s3"]), wanted_full)
+
+    with pytest.raises(ValueError):
+        mat.full(["s1", "s2"])
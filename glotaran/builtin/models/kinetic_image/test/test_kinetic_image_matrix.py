@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+import scipy.special
+
+from glotaran.builtin.models.kinetic_image import KineticImageModel
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import erf
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import erfcx
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_image_matrix
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_matrix_derivatives
+from glotaran.parameter import ParameterGroup
+
+EPS = np.finfo(np.float64).eps
+
+
+def _evaluate(function, values):
+    return np.asarray([function(value) for value in values])
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        np.linspace(-10, 10, 20001),
+        np.geomspace(1e-300, 1e300, 601),
+        -np.geomspace(1e-300, 1e300, 601),
+        np.asarray([0.0, 0.46875, -0.46875, 4.0, -4.0, 26.543, np.inf, -np.inf]),
+    ],
+)
+def test_erf(values):
+    assert np.allclose(_evaluate(erf, values), scipy.special.erf(values), rtol=4 * EPS, atol=0)
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        np.linspace(0, 50, 50001),
+        np.geomspace(1e-300, 1e308, 609),
+        np.asarray([0.46875, 4.0, 26.543, 6.71e7, np.inf]),
+    ],
+)
+def test_erfcx(values):
+    assert np.allclose(_evaluate(erfcx, values), scipy.special.erfcx(values), rtol=8 * EPS, atol=0)
+
+
+def test_erfcx_negative():
+    values = -np.linspace(0, 26, 26001)
+    # for negative values erfcx grows with exp(x**2), so the rounding error
+    # of x**2 limits the accuracy of the reference
+    assert np.all(
+        np.abs(_evaluate(erfcx, values) - scipy.special.erfcx(values))
+        <= 8 * EPS * np.maximum(values ** 2, 1) * scipy.special.erfcx(values)
+    )
+    assert erfcx(-27.0) == np.inf
+
+
+@pytest.mark.parametrize("irf", [None, "irf1"])
+def test_kinetic_matrix_derivatives(irf):
+    model = KineticImageModel.from_dict(
+        {
+            "initial_concentration": {
+                "j1": {
+                    "compartments": ["s1", "s2", "s3", "s4"],
+                    "parameters": ["j.1", "j.2", "j.0", "j.1"],
+                },
+            },
+            "megacomplex": {
+                "mc1": {"k_matrix": ["k1"]},
+                "mc2": {"k_matrix": ["k2"]},
+            },
+            "k_matrix": {
+                "k1": {
+                    "matrix": {
+                        ("s2", "s1"): "kinetic.1",
+                        ("s3", "s1"): "kinetic.2",
+                        ("s3", "s2"): "kinetic.3",
+                        ("s3", "s3"): "kinetic.4",
+                        ("s1", "s2"): "kinetic.5",
+                    }
+                },
+                "k2": {"matrix": {("s4", "s4"): "kinetic.2"}},
+            },
+            "irf": {
+                "irf1": {
+                    "type": "multi-gaussian",
+                    "center": ["irf.center"],
+                    "width": ["irf.width1", "irf.width2"],
+                    "scale": ["irf.scale1", "irf.scale2"],
+                },
+            },
+            "dataset": {
+                "dataset1": {
+                    "initial_concentration": "j1",
+                    "megacomplex": ["mc1", "mc2"],
+                    "megacomplex_scale": ["scale.1", "scale.2"],
+                    "irf": irf,
+                    "baseline": True,
+                },
+            },
+        }
+    )
+    parameters = ParameterGroup.from_dict(
+        {
+            "kinetic": [0.5, 0.2, 0.05, 0.01, 0.03],
+            "j": [["0", 0], ["1", 1], ["2", 0.3]],
+            "irf": [
+                ["center", 0.3],
+                ["width1", 0.7],
+                ["width2", 2.5],
+                ["scale1", 1],
+                ["scale2", 0.4],
+            ],
+            "scale": [1.3, 0.7],
+        }
+    )
+    time = np.arange(-5, 60, 0.37)
+
+    derivatives = kinetic_matrix_derivatives(
+        model.dataset["dataset1"].fill(model, parameters), time
+    )
+
+    # the initial concentration and the irf scales are not derived
+    wanted_labels = {f"kinetic.{i}" for i in range(1, 6)} | {"scale.1", "scale.2"}
+    if irf is not None:
+        wanted_labels |= {"irf.center", "irf.width1", "irf.width2"}
+    assert set(derivatives) == wanted_labels
+
+    for label, derivative in derivatives.items():
+        parameter = parameters.get(label)
+        value = parameter.value
+        step = 1e-6 * max(1.0, abs(value))
+        matrices = []
+        for direction in [1, -1]:
+            parameter.value = value + direction * step
+            dataset = model.dataset["dataset1"].fill(model, parameters)
+            matrices.append(kinetic_image_matrix(dataset, time, None)[1])
+        parameter.value = value
+        wanted_derivative = (matrices[0] - matrices[1]) / (2 * step)
+        assert np.allclose(
+            derivative, wanted_derivative, atol=1e-7 * np.abs(wanted_derivative).max()
+        )
@@ -3,7 +3,10 @@
 import numpy as np
 
 from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_image_matrix
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_matrices
+from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_matrix_derivatives
 from glotaran.builtin.models.kinetic_spectrum.spectral_irf import IrfGaussianCoherentArtifact
+from glotaran.parameter import Parameter
 
 
 def kinetic_spectrum_matrix(dataset_descriptor=None, axis=None, index=None, irf=None):
@@ -22,3 +25,46 @@ def kinetic_spectrum_matrix(dataset_descriptor=None, axis=None, index=None, irf=
             matrix = np.concatenate((matrix, irf_matrix), axis=1)
 
     return (clp_label, matrix)
+
+
+def kinetic_spectrum_matrices(dataset_descriptor=None, axis=None, global_axis=None):
+
+    result = kinetic_matrices(dataset_descriptor, axis, global_axis)
+    if result is None:
+        return None
+    clp_label, matrices = result
+
+    if isinstance(dataset_descriptor.irf, IrfGaussianCoherentArtifact):
+        # the coherent artifact does not depend on the index
+        irf_clp_label, irf_matrix = dataset_descriptor.irf.calculate_coherent_artifact(axis)
+        clp_label += irf_clp_label
+        matrices = np.concatenate(
+            (matrices, np.broadcast_to(irf_matrix, (global_axis.size,) + irf_matrix.shape)),
+            axis=2,
+        )
+
+    return (clp_label, matrices)
+
+
+def kinetic_spectrum_matrix_derivatives(dataset_descriptor=None, axis=None):
+
+    derivatives = kinetic_matrix_derivatives(dataset_descriptor, axis)
+
+    irf = dataset_descriptor.irf
+    if isinstance(irf, IrfGaussianCoherentArtifact):
+        # the coherent artifact depends on the center and width of the irf, too
+        irf_labels = {
+            parameter.full_label
+            for parameter in (irf.center, irf.width)
+            if isinstance(parameter, Parameter)
+        }
+        artifact_size = len(irf.clp_labels())
+        derivatives = {
+            label: np.concatenate(
+                (derivative, np.zeros((axis.size, artifact_size), dtype=np.float64)), axis=1
+            )
+            for label, derivative in derivatives.items()
+            if label not in irf_labels
+        }
+
+    return derivatives
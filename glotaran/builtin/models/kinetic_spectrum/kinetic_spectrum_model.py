@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import collections
 from typing import TYPE_CHECKING
+from typing import Any
 
 import numpy as np
 import xarray as xr
@@ -10,13 +12,21 @@ from glotaran.builtin.models.kinetic_image.kinetic_image_model import KineticIma
 from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_dataset_descriptor import (
     KineticSpectrumDatasetDescriptor,
 )
+from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_matrix import (
+    kinetic_spectrum_matrices,
+)
 from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_matrix import (
     kinetic_spectrum_matrix,
 )
+from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_matrix import (
+    kinetic_spectrum_matrix_derivatives,
+)
 from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_result import (
     finalize_kinetic_spectrum_result,
 )
+from glotaran.builtin.models.kinetic_spectrum.spectral_constraints import OnlyConstraint
 from glotaran.builtin.models.kinetic_spectrum.spectral_constraints import SpectralConstraint
+from glotaran.builtin.models.kinetic_spectrum.spectral_constraints import ZeroConstraint
 from glotaran.builtin.models.kinetic_spectrum.spectral_constraints import (
     apply_spectral_constraints,
 )
@@ -25,6 +35,10 @@ from glotaran.builtin.models.kinetic_spectrum.spectral_matrix import spectral_ma
 from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import EqualAreaPenalty
 from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import apply_spectral_penalties
 from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import has_spectral_penalties
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import (
+    number_of_spectral_penalties,
+)
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import prepare_spectral_penalties
 from glotaran.builtin.models.kinetic_spectrum.spectral_relations import SpectralRelation
 from glotaran.builtin.models.kinetic_spectrum.spectral_relations import apply_spectral_relations
 from glotaran.builtin.models.kinetic_spectrum.spectral_relations import retrieve_related_clps
@@ -54,6 +68,30 @@ def apply_kinetic_model_constraints(
     return clp_labels, matrix
 
 
+def kinetic_model_matrix_signature(
+    model: KineticSpectrumModel, dataset: str, index: Any
+) -> tuple[tuple[bool, ...], tuple[bool, ...]] | None:
+    """Returns which spectral relations and constraints apply at the index.
+
+    Returns `None` if the irf of the dataset has a dispersion, since then the matrix itself
+    depends on the index.
+    """
+    irf = model.dataset[dataset].irf
+    if (
+        irf is not None
+        and isinstance(model.irf[irf], IrfSpectralMultiGaussian)
+        and model.irf[irf].dispersion_center is not None
+    ):
+        return None
+    return (
+        tuple(relation.applies(index) for relation in model.spectral_relations),
+        tuple(
+            isinstance(constraint, (OnlyConstraint, ZeroConstraint)) and constraint.applies(index)
+            for constraint in model.spectral_constraints
+        ),
+    )
+
+
 def retrieve_spectral_clps(
     model: KineticSpectrumModel,
     parameters: ParameterGroup,
@@ -66,20 +104,44 @@ def retrieve_spectral_clps(
         return reduced_clps
 
     # Note: we are always in index_dependent case when we have constraints
-    clps = {}
-    for label in clp_labels:
-        clps[label] = []
-        for i, index_reduced_clp_labels in enumerate(reduced_clp_labels[label]):
-            index_clp_labels = clp_labels[label][i]
-            index_reduced_clps = reduced_clps[label][i]
-            index_clps = np.zeros((len(index_clp_labels)), dtype=np.float64)
-            for j, clp_label in enumerate(index_reduced_clp_labels):
-                index_clps[index_clp_labels.index(clp_label)] = index_reduced_clps[j]
-            clps[label].append(index_clps)
+    clps = {
+        label: expand_reduced_clps(
+            clp_labels[label], reduced_clp_labels[label], reduced_clps[label]
+        )
+        for label in clp_labels
+    }
     clps = retrieve_related_clps(model, parameters, clp_labels, clps, data)
     return clps
 
 
+def expand_reduced_clps(
+    clp_labels: list[list[str]],
+    reduced_clp_labels: list[list[str]],
+    reduced_clps: list[np.ndarray],
+) -> list[np.ndarray]:
+    """Scatters the reduced clps of every index into vectors of all clps of the index.
+
+    All indices with the same clp labels and reduced clp labels are expanded at once, the clps
+    which are not part of the reduced clps are zero.
+    """
+    label_indices = collections.defaultdict(list)
+    for i, (index_clp_labels, index_reduced_clp_labels) in enumerate(
+        zip(clp_labels, reduced_clp_labels)
+    ):
+        label_indices[(tuple(index_clp_labels), tuple(index_reduced_clp_labels))].append(i)
+
+    clps = [None] * len(clp_labels)
+    for (index_clp_labels, index_reduced_clp_labels), indices in label_indices.items():
+        positions = {clp_label: i for i, clp_label in enumerate(index_clp_labels)}
+        index_clps = np.zeros((len(indices), len(index_clp_labels)), dtype=np.float64)
+        index_clps[:, [positions[clp_label] for clp_label in index_reduced_clp_labels]] = [
+            reduced_clps[i] for i in indices
+        ]
+        for i, index_clp in zip(indices, index_clps):
+            clps[i] = index_clp
+    return clps
+
+
 def index_dependent(model: KineticSpectrumModel) -> bool:
     return (
         any(
@@ -88,7 +150,6 @@ def index_dependent(model: KineticSpectrumModel) -> bool:
         )
         or len(model.spectral_relations) != 0
         or len(model.spectral_constraints) != 0
-        or len(model.weights) != 0
     )
 
 
@@ -107,14 +168,19 @@ def grouped(model: KineticSpectrumModel):
     dataset_type=KineticSpectrumDatasetDescriptor,
     megacomplex_type=KineticImageMegacomplex,
     matrix=kinetic_spectrum_matrix,
+    matrices=kinetic_spectrum_matrices,
+    matrix_derivatives=kinetic_spectrum_matrix_derivatives,
     model_dimension="time",
     global_matrix=spectral_matrix,
     global_dimension="spectral",
     has_matrix_constraints_function=has_kinetic_model_constraints,
     constrain_matrix_function=apply_kinetic_model_constraints,
     retrieve_clp_function=retrieve_spectral_clps,
+    matrix_signature_function=kinetic_model_matrix_signature,
     has_additional_penalty_function=has_spectral_penalties,
     additional_penalty_function=apply_spectral_penalties,
+    additional_penalty_size_function=number_of_spectral_penalties,
+    prepare_additional_penalty_function=prepare_spectral_penalties,
     grouped=grouped,
     index_dependent=index_dependent,
     finalize_data_function=finalize_kinetic_spectrum_result,
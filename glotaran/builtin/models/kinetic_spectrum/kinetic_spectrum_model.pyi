@@ -40,6 +40,9 @@ def apply_kinetic_model_constraints(
     matrix: np.ndarray,
     index: float,
 ) -> Any: ...
+def kinetic_model_matrix_signature(
+    model: KineticSpectrumModel, dataset: str, index: Any  # noqa: F811
+) -> tuple[tuple[bool, ...], tuple[bool, ...]] | None: ...
 def retrieve_spectral_clps(
     model: KineticSpectrumModel,  # noqa: F811
     parameters: ParameterGroup,
@@ -48,6 +51,11 @@ def retrieve_spectral_clps(
     reduced_clps: np.ndarray | list[np.ndarray],
     global_axis: np.ndarray,
 ) -> Any: ...
+def expand_reduced_clps(
+    clp_labels: list[list[str]],
+    reduced_clp_labels: list[list[str]],
+    reduced_clps: list[np.ndarray],
+) -> list[np.ndarray]: ...
 def index_dependent(model: KineticSpectrumModel) -> Any: ...  # noqa: F811
 def grouped(model: KineticSpectrumModel) -> bool: ...  # noqa: F811
 
@@ -74,6 +82,9 @@ class KineticSpectrumModel(KineticImageModel):
         reduced_clps: np.ndarray | list[np.ndarray],
         global_axis: np.ndarray,
     ) -> np.ndarray | list[np.ndarray]: ...
+    def matrix_signature_function(
+        self, dataset: str, index: Any
+    ) -> tuple[tuple[bool, ...], tuple[bool, ...]] | None: ...
     def has_additional_penalty_function(self) -> bool: ...
     def additional_penalty_function(
         self,
@@ -70,12 +70,39 @@ class IrfSpectralMultiGaussian(IrfMultiGaussian):
 
         return centers, widths, scale, backsweep, backsweep_period
 
+    def parameters_for_axis(self, global_axis):
+        """Returns the irf parameters for all indices on the global axis.
+
+        Centers, widths and scales have the shape (global index, gaussian). The dispersion is
+        evaluated for the whole axis at once.
+        """
+        centers, widths, scale, backsweep, backsweep_period = super().parameters_for_axis(
+            global_axis
+        )
+
+        if len(self.center_dispersion) == 0 and len(self.width_dispersion) == 0:
+            return centers, widths, scale, backsweep, backsweep_period
+
+        if self.dispersion_center is None:
+            raise Exception(self, f'No dispersion center defined for irf "{self.label}"')
+        dispersion_center = float(self.dispersion_center)
+        dist = (
+            (1e3 / global_axis - 1e3 / dispersion_center)
+            if self.model_dispersion_with_wavenumber
+            else (global_axis - dispersion_center) / 100
+        )[:, np.newaxis]
+
+        for i, disp in enumerate(self.center_dispersion):
+            centers += float(disp) * np.power(dist, i + 1)
+
+        for i, disp in enumerate(self.width_dispersion):
+            widths += float(disp) * np.power(dist, i + 1)
+
+        return centers, widths, scale, backsweep, backsweep_period
+
     def calculate_dispersion(self, axis):
-        dispersion = []
-        for index in axis:
-            center, _, _, _, _ = self.parameter(index)
-            dispersion.append(center)
-        return np.asarray(dispersion).T
+        centers, _, _, _, _ = self.parameters_for_axis(np.asarray(axis))
+        return centers.T
 
 
 @model_attribute(
@@ -122,7 +149,7 @@ class IrfGaussianCoherentArtifact(IrfSpectralGaussian):
         return clp_label, matrix
 
     @staticmethod
-    @nb.jit(nopython=True, parallel=True)
+    @nb.jit(nopython=True, nogil=True, parallel=True)
     def _calculate_coherent_artifact_matrix(center, width, axis, order):
         matrix = np.zeros((axis.size, order), dtype=np.float64)
 
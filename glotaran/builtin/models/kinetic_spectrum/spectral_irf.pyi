@@ -2,6 +2,8 @@ from __future__ import annotations
 
 from typing import Any
 
+import numpy as np
+
 from glotaran.builtin.models.kinetic_image.irf import IrfMultiGaussian
 from glotaran.parameter import Parameter
 
@@ -15,6 +17,9 @@ class IrfSpectralMultiGaussian(IrfMultiGaussian):
     @property
     def model_dispersion_with_wavenumber(self) -> bool: ...
     def parameter(self, index: Any): ...
+    def parameters_for_axis(
+        self, global_axis: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, bool, float]: ...
     def calculate_dispersion(self, axis: Any): ...
 
 class IrfSpectralGaussian(IrfSpectralMultiGaussian):
@@ -16,6 +16,7 @@ if TYPE_CHECKING:
     from typing import Any
     from typing import Sequence
 
+    from glotaran.analysis.problem import Problem
     from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_model import (
         KineticSpectrumModel,
     )
@@ -65,6 +66,16 @@ def has_spectral_penalties(model: KineticSpectrumModel) -> bool:
     return len(model.equal_area_penalties) != 0
 
 
+def number_of_spectral_penalties(model: KineticSpectrumModel) -> int:
+    return len(model.equal_area_penalties)
+
+
+def prepare_spectral_penalties(
+    model: KineticSpectrumModel, problem: Problem
+) -> EqualAreaPenaltyPositions:
+    return EqualAreaPenaltyPositions(model, problem.data)
+
+
 def apply_spectral_penalties(
     model: KineticSpectrumModel,
     parameters: ParameterGroup,
@@ -73,67 +84,136 @@ def apply_spectral_penalties(
     matrices: dict[str, np.ndarray | list[np.ndarray]],
     data: dict[str, xr.Dataset],
     group_tolerance: float,
+    prepared: EqualAreaPenaltyPositions | None = None,
 ) -> np.ndarray:
 
-    penalties = []
-    for penalty in model.equal_area_penalties:
-
-        penalty = penalty.fill(model, parameters)
-        source_area = _get_area(
-            model.index_dependent(),
-            model.global_dimension,
-            clp_labels,
-            clps,
-            data,
-            group_tolerance,
-            penalty.source_intervals,
-            penalty.source,
-        )
-
-        target_area = _get_area(
-            model.index_dependent(),
-            model.global_dimension,
-            clp_labels,
-            clps,
-            data,
-            group_tolerance,
-            penalty.target_intervals,
-            penalty.target,
-        )
+    if prepared is None:
+        prepared = EqualAreaPenaltyPositions(model, data)
+    stacked_clps = {}
 
-        area_penalty = np.abs(np.sum(source_area) - penalty.parameter * np.sum(target_area))
+    penalties = []
+    for penalty, (source_positions, target_positions) in zip(
+        model.equal_area_penalties, prepared.positions(clp_labels)
+    ):
+        source_area = _get_area(clps, stacked_clps, source_positions)
+        target_area = _get_area(clps, stacked_clps, target_positions)
+
+        parameter = parameters.get(penalty.parameter.full_label).value
+        area_penalty = np.abs(np.sum(source_area) - parameter * np.sum(target_area))
         penalties.append(area_penalty * penalty.weight)
     return np.asarray(penalties)
 
 
+class EqualAreaPenaltyPositions:
+    """The positions of the clps of the equal area penalties of a problem.
+
+    The positions point into the concatenated clps of every dataset. The intervals on the
+    global axes are resolved when the problem is created, the clp positions on the first
+    evaluation, since the clp labels of a model do not change with the parameters.
+    """
+
+    def __init__(self, model: KineticSpectrumModel, data: dict[str, xr.Dataset]):
+        self._index_dependent = model.index_dependent()
+        global_axes = {
+            label: dataset.coords[model.global_dimension].values for label, dataset in data.items()
+        }
+        self._interval_indices = [
+            tuple(
+                (
+                    compartment,
+                    {
+                        label: _get_interval_indices(intervals, global_axis)
+                        for label, global_axis in global_axes.items()
+                    },
+                )
+                for compartment, intervals in (
+                    (penalty.source, penalty.source_intervals),
+                    (penalty.target, penalty.target_intervals),
+                )
+            )
+            for penalty in model.equal_area_penalties
+        ]
+        self._positions = None
+
+    def positions(
+        self, clp_labels: dict[str, list[str] | list[list[str]]]
+    ) -> list[tuple[dict[str, np.ndarray], dict[str, np.ndarray]]]:
+        """Returns for every penalty the positions of the source and the target clps in the
+        concatenated clps of the datasets."""
+        if self._positions is None:
+            self._positions = []
+            for penalty_indices in self._interval_indices:
+                penalty_positions = []
+                for compartment, dataset_indices in penalty_indices:
+                    area_positions = {}
+                    for label, indices in dataset_indices.items():
+                        positions = _get_clp_positions(
+                            indices, clp_labels[label], compartment, self._index_dependent
+                        )
+                        if positions.size != 0:
+                            area_positions[label] = positions
+                    penalty_positions.append(area_positions)
+                self._positions.append(tuple(penalty_positions))
+        return self._positions
+
+
 def _get_area(
-    index_dependent: bool,
-    global_dimension: str,
-    clp_labels: dict[str, list[list[str]]],
     clps: dict[str, list[np.ndarray]],
-    data: dict[str, xr.Dataset],
-    group_tolerance: float,
-    intervals: list[tuple[float, float]],
-    compartment: str,
+    stacked_clps: dict[str, np.ndarray],
+    positions: dict[str, np.ndarray],
 ) -> np.ndarray:
     area = []
-    area_indices = []
-
-    for label, dataset in data.items():
-        global_axis = dataset.coords[global_dimension]
-        for interval in intervals:
-            if interval[0] > global_axis[-1]:
-                # interval not in this dataset
-                continue
-
-            start_idx, end_idx = _get_idx_from_interval(interval, global_axis)
-            for i in range(start_idx, end_idx + 1):
-                index_clp_labels = clp_labels[label][i] if index_dependent else clp_labels[label]
-                if compartment in index_clp_labels:
-                    area.append(clps[label][i][index_clp_labels.index(compartment)])
-                    area_indices.append(global_axis[i])
-
-    return np.asarray(area)  # TODO: normalize for distance on global axis
+
+    for label, dataset_positions in positions.items():
+        if label not in stacked_clps:
+            stacked_clps[label] = np.concatenate(clps[label])
+        area.append(stacked_clps[label][dataset_positions])
+
+    # TODO: normalize for distance on global axis
+    return np.concatenate(area) if area else np.asarray([])
+
+
+def _get_clp_positions(
+    indices: np.ndarray,
+    clp_labels: list[str] | list[list[str]],
+    compartment: str,
+    index_dependent: bool,
+) -> np.ndarray:
+    """Retrieves the positions of the clps of a compartment at the global indices within the
+    concatenated clps of a dataset."""
+    if not index_dependent:
+        if compartment not in clp_labels:
+            return np.asarray([], dtype=int)
+        return indices * len(clp_labels) + clp_labels.index(compartment)
+
+    offsets = np.cumsum([0] + [len(index_labels) for index_labels in clp_labels])
+    return np.asarray(
+        [
+            offsets[i] + clp_labels[i].index(compartment)
+            for i in indices
+            if compartment in clp_labels[i]
+        ],
+        dtype=int,
+    )
+
+
+def _get_interval_indices(
+    intervals: list[tuple[float, float]], global_axis: np.ndarray
+) -> np.ndarray:
+    """Retrieves the global indices covered by the intervals on the global axis.
+
+    Intervals starting after the end of the axis are skipped, overlapping
+    intervals contribute their common indices once per interval.
+    """
+    ranges = [
+        np.arange(start, end + 1)
+        for start, end in (
+            _get_idx_from_interval(interval, global_axis)
+            for interval in intervals
+            if interval[0] <= global_axis[-1]
+        )
+    ]
+    return np.concatenate(ranges) if ranges else np.asarray([], dtype=int)
 
 
 def _get_idx_from_interval(
@@ -3,7 +3,9 @@ from __future__ import annotations
 from typing import Any
 
 import numpy as np
+import xarray as xr
 
+from glotaran.analysis.problem import Problem
 from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_model import KineticSpectrumModel
 from glotaran.model import model_attribute
 from glotaran.parameter import Parameter
@@ -23,10 +25,23 @@ class EqualAreaPenalty:
     def applies(self, index: Any) -> bool: ...
 
 def has_spectral_penalties(model: KineticSpectrumModel) -> bool: ...
+def number_of_spectral_penalties(model: KineticSpectrumModel) -> int: ...
+def prepare_spectral_penalties(
+    model: KineticSpectrumModel, problem: Problem
+) -> EqualAreaPenaltyPositions: ...
 def apply_spectral_penalties(
     model: KineticSpectrumModel,
     parameters: ParameterGroup,
-    clp_labels: list[str] | list[list[str]],
-    clps: np.ndarray,
-    global_axis: np.ndarray,
+    clp_labels: dict[str, list[str] | list[list[str]]],
+    clps: dict[str, list[np.ndarray]],
+    matrices: dict[str, np.ndarray | list[np.ndarray]],
+    data: dict[str, xr.Dataset],
+    group_tolerance: float,
+    prepared: EqualAreaPenaltyPositions | None = ...,
 ) -> np.ndarray: ...
+
+class EqualAreaPenaltyPositions:
+    def __init__(self, model: KineticSpectrumModel, data: dict[str, xr.Dataset]) -> None: ...
+    def positions(
+        self, clp_labels: dict[str, list[str] | list[list[str]]]
+    ) -> list[tuple[dict[str, np.ndarray], dict[str, np.ndarray]]]: ...
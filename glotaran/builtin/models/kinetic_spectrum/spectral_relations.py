@@ -1,6 +1,7 @@
 """ Glotaran Spectral Relation """
 from __future__ import annotations
 
+import collections
 import warnings
 from typing import TYPE_CHECKING
 from typing import List
@@ -31,19 +32,26 @@ if TYPE_CHECKING:
     no_label=True,
 )
 class SpectralRelation:
-    def applies(self, index: Any) -> bool:
+    def applies(self, index: Any) -> bool | np.ndarray:
         """
         Returns true if the index is in one of the intervals.
 
         Parameters
         ----------
         index :
+            The index or an array of indices.
 
         Returns
         -------
-        applies : bool
+        applies : bool | np.ndarray
+            If the relation applies, or a mask of the indices where it applies.
 
         """
+        if isinstance(index, np.ndarray):
+            mask = np.zeros(index.shape, dtype=bool)
+            for interval in self.interval:
+                mask |= (interval[0] <= index) & (index <= interval[1])
+            return mask
         return any(interval[0] <= index <= interval[1] for interval in self.interval)
 
 
@@ -69,10 +77,11 @@ def create_spectral_relation_matrix(
                 )
                 continue
 
-            relation = relation.fill(model, parameters)
             source_idx = clp_labels.index(relation.compartment)
             target_idx = clp_labels.index(relation.target)
-            relation_matrix[target_idx, source_idx] = relation.parameter
+            relation_matrix[target_idx, source_idx] = relation_parameter_value(
+                relation, parameters
+            )
             idx_to_delete.append(target_idx)
 
     clp_labels = [label for i, label in enumerate(clp_labels) if i not in idx_to_delete]
@@ -109,17 +118,38 @@ def retrieve_related_clps(
     data: dict[str, xr.Dataset],
 ) -> dict[str, list[np.ndarray]]:
 
-    for relation in model.spectral_relations:
-        relation = relation.fill(model, parameters)
-        for label, dataset_clp_labels in clp_labels.items():
-            for i, index in enumerate(data[label].coords[model.global_dimension]):
-                if (
-                    relation.target in dataset_clp_labels[i]
-                    and relation.compartment in dataset_clp_labels[i]
-                    and relation.applies(index)
-                ):
-                    target_idx = dataset_clp_labels[i].index(relation.target)
-                    source_idx = dataset_clp_labels[i].index(relation.compartment)
-                    clps[label][i][target_idx] = clps[label][i][source_idx] * relation.parameter
+    if not model.spectral_relations:
+        return clps
+
+    relation_values = [
+        relation_parameter_value(relation, parameters) for relation in model.spectral_relations
+    ]
+    for label, dataset_clp_labels in clp_labels.items():
+        global_axis = data[label].coords[model.global_dimension].values
+        applies = [relation.applies(global_axis) for relation in model.spectral_relations]
+
+        # the relations are applied on all indices with the same clp labels at once
+        label_indices = collections.defaultdict(list)
+        for i, index_clp_labels in enumerate(dataset_clp_labels):
+            label_indices[tuple(index_clp_labels)].append(i)
+
+        for index_clp_labels, indices in label_indices.items():
+            positions = {clp_label: i for i, clp_label in enumerate(index_clp_labels)}
+            index_clps = np.asarray([clps[label][i] for i in indices])
+            for relation, value, relation_applies in zip(
+                model.spectral_relations, relation_values, applies
+            ):
+                if relation.target in positions and relation.compartment in positions:
+                    mask = relation_applies[indices]
+                    index_clps[mask, positions[relation.target]] = (
+                        index_clps[mask, positions[relation.compartment]] * value
+                    )
+            for i, index_clp in zip(indices, index_clps):
+                clps[label][i] = index_clp
 
     return clps
+
+
+def relation_parameter_value(relation: SpectralRelation, parameters: ParameterGroup) -> float:
+    """Returns the value of the parameter of a relation without filling the relation."""
+    return parameters.get(relation.parameter.full_label).value
@@ -18,7 +18,7 @@ class SpectralRelation:
     def parameter(self) -> Parameter: ...
     @property
     def interval(self) -> list[tuple[float, float]]: ...
-    def applies(self, index: Any) -> bool: ...
+    def applies(self, index: Any) -> bool | np.ndarray: ...
 
 def create_spectral_relation_matrix(
     model: KineticSpectrumModel,
@@ -41,3 +41,4 @@ def retrieve_related_clps(
     clps: np.ndarray,
     index: float,
 ) -> tuple[list[str], np.ndarray]: ...
+def relation_parameter_value(relation: SpectralRelation, parameters: ParameterGroup) -> float: ...
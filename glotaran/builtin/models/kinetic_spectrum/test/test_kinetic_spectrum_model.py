@@ -1,7 +1,9 @@
 import numpy as np
 import pytest
+import xarray as xr
 
 from glotaran.analysis.optimize import optimize
+from glotaran.analysis.problem import Problem
 from glotaran.io import load_model
 from glotaran.io import load_parameters
 from glotaran.project import Scheme
@@ -291,3 +293,112 @@ def test_kinetic_model(suite, nnls):
 
     assert "species_associated_spectra" in resultdata
     assert "decay_associated_spectra" in resultdata
+
+
+@pytest.mark.parametrize(
+    "suite",
+    [OneComponentOneChannelGaussianIrf, ThreeComponentParallel, ThreeComponentSequential],
+)
+def test_variable_projection_jacobian(suite):
+    model = suite.model
+    dataset = model.simulate("dataset1", suite.wanted_parameters, suite.axis)
+    scheme = Scheme(model=model, parameters=suite.wanted_parameters, data={"dataset1": dataset})
+    problem = Problem(scheme)
+    assert problem.has_variable_projection_jacobian
+
+    labels, values, _, _ = scheme.parameters.get_label_value_and_bounds_arrays(
+        exclude_non_vary=True
+    )
+    jacobian = problem.variable_projection_jacobian(labels, values)
+    assert jacobian.shape == (dataset.data.size, len(labels))
+
+    # at a perfect fit Kaufman's approximation equals the full jacobian
+    wanted_jacobian = np.empty_like(jacobian)
+    for i in range(len(labels)):
+        step = 1e-6 * max(1.0, abs(values[i]))
+        penalties = []
+        for direction in [1, -1]:
+            perturbed = values.copy()
+            perturbed[i] += direction * step
+            problem.parameters.set_from_label_and_value_arrays(labels, perturbed)
+            problem.reset()
+            penalties.append(problem.full_penalty.copy())
+        wanted_jacobian[:, i] = (penalties[0] - penalties[1]) / (2 * step)
+
+    assert np.allclose(jacobian, wanted_jacobian, atol=1e-5 * np.abs(wanted_jacobian).max())
+
+
+def test_variable_projection_jacobian_multiple_datasets():
+    suite = ThreeComponentSequential
+    model = load_model(
+        MODEL_3C_SEQUENTIAL.replace(
+            "megacomplex:\n", "    dataset2:\n        <<: *dataset1\nmegacomplex:\n", 1
+        ),
+        format_name="yml_str",
+    )
+    data = {
+        "dataset1": model.simulate("dataset1", suite.wanted_parameters, suite.axis),
+        "dataset2": model.simulate(
+            "dataset2",
+            suite.wanted_parameters,
+            {"time": suite.time[::2], "spectral": suite.spectral[10:] + 0.01},
+        ),
+    }
+    data["dataset2"]["weight"] = xr.full_like(data["dataset2"].data, 1.0)
+    data["dataset2"]["weight"][:, :3] = 0.5
+    parameters = suite.wanted_parameters.copy()
+    for label in ["kinetic.1", "kinetic.2", "kinetic.3"]:
+        parameters.get(label).non_negative = True
+    scheme = Scheme(model=model, parameters=parameters, data=data, group_tolerance=0.1)
+    problem = Problem(scheme)
+    assert "dataset1dataset2" in problem.groups
+
+    labels, values, _, _ = scheme.parameters.get_label_value_and_bounds_arrays(
+        exclude_non_vary=True
+    )
+    jacobian = problem.variable_projection_jacobian(labels, values)
+    # the rates and the irf are derived analytically
+    assert set(problem._matrix_derivatives(labels, problem._free_parameter_datasets(labels))) == {
+        "kinetic.1",
+        "kinetic.2",
+        "kinetic.3",
+        "irf.center",
+        "irf.width",
+    }
+
+    wanted_jacobian = np.empty_like(jacobian)
+    for i in range(len(labels)):
+        step = 1e-6 * max(1.0, abs(values[i]))
+        penalties = []
+        for direction in [1, -1]:
+            perturbed = values.copy()
+            perturbed[i] += direction * step
+            problem.parameters.set_from_label_and_value_arrays(labels, perturbed)
+            problem.reset()
+            penalties.append(problem.full_penalty.copy())
+        wanted_jacobian[:, i] = (penalties[0] - penalties[1]) / (2 * step)
+
+    assert np.allclose(jacobian, wanted_jacobian, atol=1e-5 * np.abs(wanted_jacobian).max())
+
+
+def test_kinetic_model_variable_projection_jacobian():
+    suite = ThreeComponentSequential
+    dataset = suite.model.simulate("dataset1", suite.wanted_parameters, suite.axis)
+    scheme = Scheme(
+        model=suite.model,
+        parameters=suite.initial_parameters,
+        data={"dataset1": dataset},
+        maximum_number_function_evaluations=20,
+        variable_projection_jacobian=True,
+    )
+    result = optimize(scheme)
+
+    for label, param in result.optimized_parameters.all():
+        assert np.allclose(param.value, suite.wanted_parameters.get(label).value, rtol=1e-1)
+
+    scheme.variable_projection_jacobian = False
+    wanted_result = optimize(scheme)
+
+    assert result.cost is not None
+    assert np.isclose(result.cost, wanted_result.cost, atol=1e-6)
+    assert np.isclose(result.chi_square, wanted_result.chi_square, atol=1e-10)
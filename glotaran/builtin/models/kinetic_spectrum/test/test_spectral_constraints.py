@@ -3,6 +3,7 @@ import pytest
 import xarray as xr
 
 from glotaran.analysis.optimize import optimize
+from glotaran.analysis.problem import Problem
 from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_image_matrix
 from glotaran.builtin.models.kinetic_spectrum import KineticSpectrumModel
 from glotaran.builtin.models.kinetic_spectrum.spectral_constraints import (
@@ -108,3 +109,71 @@ def test_spectral_constraint():
     print(result_data.species_associated_spectra)
     assert result_data.species_associated_spectra.shape == (1, 2)
     assert result_data.species_associated_spectra[0, 1] == 0
+
+
+@pytest.mark.parametrize("number_of_datasets", [1, 2])
+@pytest.mark.parametrize("nnls", [True, False])
+def test_spectral_constraint_matrix_segments(monkeypatch, number_of_datasets, nnls):
+    model = KineticSpectrumModel.from_dict(
+        {
+            "initial_concentration": {
+                "j1": {"compartments": ["s1", "s2", "s3"], "parameters": ["j.1", "j.0", "j.0"]},
+            },
+            "megacomplex": {"mc1": {"k_matrix": ["k1"]}},
+            "k_matrix": {
+                "k1": {
+                    "matrix": {
+                        ("s2", "s1"): "kinetic.1",
+                        ("s3", "s2"): "kinetic.2",
+                        ("s3", "s3"): "kinetic.3",
+                    }
+                }
+            },
+            "spectral_constraints": [
+                {"type": "zero", "compartment": "s3", "interval": [(0, 2)]},
+                {"type": "only", "compartment": "s1", "interval": [(5, 8)]},
+            ],
+            "spectral_relations": [
+                {"compartment": "s1", "target": "s2", "parameter": "rel.1", "interval": [(8, 9)]}
+            ],
+            "weights": [{"datasets": ["dataset0"], "global_interval": (1, 6), "value": 0.5}],
+            "dataset": {
+                f"dataset{i}": {"initial_concentration": "j1", "megacomplex": ["mc1"]}
+                for i in range(number_of_datasets)
+            },
+        }
+    )
+    parameters = ParameterGroup.from_dict(
+        {
+            "j": [["1", 1, {"vary": False}], ["0", 0, {"vary": False}]],
+            "kinetic": [0.5, 0.1, 0.01],
+            "rel": [0.5],
+        }
+    )
+    rng = np.random.default_rng(42)
+    time = np.arange(0, 50, 0.5)
+    spectral = np.arange(0, 10, 0.5)
+    data = {
+        label: xr.DataArray(
+            rng.uniform(size=(time.size, spectral.size)),
+            coords=[("time", time), ("spectral", spectral)],
+        ).to_dataset(name="data")
+        for label in model.dataset
+    }
+    scheme = Scheme(model, parameters, data, non_negative_least_squares=nnls)
+
+    problem = Problem(scheme)
+    penalty = problem.full_penalty.copy()
+    clps = problem.clps
+    segments = problem._get_matrix_segments("dataset0")
+    assert np.unique(segments).size == 5
+    assert all(
+        matrix is problem.matrices["dataset0"][0] for matrix in problem.matrices["dataset0"]
+    )
+
+    monkeypatch.setattr(model, "matrix_signature_function", None)
+    problem = Problem(scheme)
+    assert problem._get_matrix_segments("dataset0") is None
+    assert np.allclose(problem.full_penalty, penalty)
+    for label in model.dataset:
+        assert np.allclose(problem.clps[label], clps[label])
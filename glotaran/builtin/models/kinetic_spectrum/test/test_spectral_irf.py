@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 
 from glotaran.analysis.optimize import optimize
+from glotaran.analysis.problem import Problem
 from glotaran.io import load_model
 from glotaran.io import load_parameters
 from glotaran.project import Scheme
@@ -152,3 +153,98 @@ def test_spectral_irf(suite):
 
     assert "species_associated_spectra" in resultdata
     assert "decay_associated_spectra" in resultdata
+
+
+@pytest.mark.parametrize(
+    "suite",
+    [
+        SimpleIrfDispersion,
+        MultiIrfDispersion,
+    ],
+)
+def test_kinetic_spectrum_matrices(suite):
+
+    model = suite.model
+    dataset = model.dataset["dataset1"].fill(model, suite.parameters)
+    time = suite.axis["time"]
+    spectral = suite.axis["spectral"]
+
+    clp_label, matrices = model.matrices(
+        dataset_descriptor=dataset, axis=time, global_axis=spectral
+    )
+
+    assert matrices.shape == (spectral.size, time.size, len(clp_label))
+    for index, matrix in zip(spectral, matrices):
+        wanted_clp_label, wanted_matrix = model.matrix(
+            dataset_descriptor=dataset, axis=time, index=index
+        )
+        assert clp_label == wanted_clp_label
+        assert np.allclose(matrix, wanted_matrix)
+
+
+@pytest.mark.parametrize(
+    "suite",
+    [
+        SimpleIrfDispersion,
+        MultiIrfDispersion,
+    ],
+)
+@pytest.mark.parametrize("model_dispersion_with_wavenumber", [True, False])
+def test_parameters_for_axis(suite, model_dispersion_with_wavenumber):
+
+    model = suite.model
+    irf = model.dataset["dataset1"].fill(model, suite.parameters).irf
+    irf.model_dispersion_with_wavenumber = model_dispersion_with_wavenumber
+    spectral = suite.axis["spectral"]
+
+    centers, widths, scales, backsweep, backsweep_period = irf.parameters_for_axis(spectral)
+
+    assert centers.shape == widths.shape == scales.shape
+    assert centers.shape[0] == spectral.size
+    for i, index in enumerate(spectral):
+        wanted = irf.parameter(index)
+        assert np.allclose(centers[i], wanted[0])
+        assert np.allclose(widths[i], wanted[1])
+        assert np.allclose(scales[i], wanted[2])
+        assert backsweep == wanted[3]
+        assert backsweep_period == wanted[4]
+    assert np.array_equal(irf.calculate_dispersion(spectral), centers.T)
+
+
+MODEL_MULTI_IRF_DISPERSION_GROUPED = f"""\
+{MODEL_MULTI_IRF_DISPERSION}
+dataset:
+    dataset1: &dataset1
+        megacomplex: [mc1]
+        initial_concentration: j1
+        irf: irf1
+        shape:
+            s1: sh1
+    dataset2:
+        <<: *dataset1
+"""
+
+
+def test_spectral_irf_threads():
+    model = load_model(MODEL_MULTI_IRF_DISPERSION_GROUPED, format_name="yml_str")
+    parameters = load_parameters(PARAMETERS_MULTI_IRF_DISPERSION, format_name="yml_str")
+    assert model.grouped()
+    assert model.index_dependent()
+
+    time = np.arange(-1, 5, 0.2)
+    data = {
+        "dataset1": model.simulate(
+            "dataset1", parameters, {"time": time, "spectral": np.arange(300, 500, 10)}
+        ),
+        "dataset2": model.simulate(
+            "dataset2", parameters, {"time": time, "spectral": np.arange(350, 550, 20)}
+        ),
+    }
+
+    problem = Problem(Scheme(model=model, parameters=parameters, data=data))
+    with Problem(
+        Scheme(model=model, parameters=parameters, data=data, number_of_threads=4)
+    ) as threaded_problem:
+        assert np.array_equal(problem.full_penalty, threaded_problem.full_penalty)
+        assert threaded_problem._executor is not None
+    assert threaded_problem._executor is None
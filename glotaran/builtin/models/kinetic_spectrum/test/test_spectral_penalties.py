@@ -10,8 +10,14 @@ import numpy as np
 import pytest
 
 from glotaran.analysis.optimize import optimize
+from glotaran.analysis.problem import Problem
 from glotaran.builtin.models.kinetic_spectrum import KineticSpectrumModel
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import EqualAreaPenaltyPositions
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import _get_area
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import _get_clp_positions
 from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import _get_idx_from_interval
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import _get_interval_indices
+from glotaran.builtin.models.kinetic_spectrum.spectral_penalties import apply_spectral_penalties
 from glotaran.io import prepare_time_trace_dataset
 from glotaran.parameter import ParameterGroup
 from glotaran.project import Scheme
@@ -71,6 +77,44 @@ def test__get_idx_from_interval(type_factory, interval, axis, expected):
     assert expected == _get_idx_from_interval(interval, axis)
 
 
+@pytest.mark.parametrize("index_dependent", [True, False])
+def test__get_area(index_dependent):
+    global_axes = {"d1": np.linspace(400, 800, 9), "d2": np.linspace(600, 700, 3)}
+    intervals = [(450, 550), (500, 650), (900, 1000)]
+    clp_labels = {}
+    clps = {}
+    for label, axis in global_axes.items():
+        if index_dependent:
+            clp_labels[label] = [["s1", "s2"] if i % 2 else ["s2"] for i in range(axis.size)]
+            index_labels = clp_labels[label]
+        else:
+            clp_labels[label] = ["s1", "s2"]
+            index_labels = [clp_labels[label]] * axis.size
+        clps[label] = [
+            np.arange(len(labels)) + 10 * i + axis[0] for i, labels in enumerate(index_labels)
+        ]
+
+    expected = []
+    for label, axis in global_axes.items():
+        for interval in intervals:
+            if interval[0] > axis[-1]:
+                continue
+            start, end = _get_idx_from_interval(interval, axis)
+            for i in range(start, end + 1):
+                labels = clp_labels[label][i] if index_dependent else clp_labels[label]
+                if "s1" in labels:
+                    expected.append(clps[label][i][labels.index("s1")])
+
+    positions = {
+        label: _get_clp_positions(
+            _get_interval_indices(intervals, axis), clp_labels[label], "s1", index_dependent
+        )
+        for label, axis in global_axes.items()
+    }
+    area = _get_area(clps, {}, positions)
+    assert np.array_equal(area, expected)
+
+
 def test_equal_area_penalties(debug=False):
     # %%
 
@@ -260,6 +304,27 @@ def test_equal_area_penalties(debug=False):
     result_wp = optimize(scheme_wp)
     print(result_wp)
 
+    # the problem prepares the positions of the penalty clps once
+    problem_wp = Problem(scheme_wp)
+    prepared = problem_wp._prepared_additional_penalty
+    assert isinstance(prepared, EqualAreaPenaltyPositions)
+    positions = prepared.positions(problem_wp.clp_labels)
+    assert np.array_equal(
+        problem_wp.additional_penalty,
+        apply_spectral_penalties(
+            model_wp,
+            problem_wp.parameters,
+            problem_wp.clp_labels,
+            problem_wp.clps,
+            problem_wp.matrices,
+            problem_wp.data,
+            scheme_wp.group_tolerance,
+        ),
+    )
+    problem_wp.reset()
+    problem_wp.additional_penalty
+    assert prepared.positions(problem_wp.clp_labels) is positions
+
     if debug:
         # %% Plot results
         plt_spec = importlib.util.find_spec("matplotlib")
@@ -4,6 +4,8 @@ import xarray as xr
 from glotaran.analysis.optimize import optimize
 from glotaran.builtin.models.kinetic_image.kinetic_image_matrix import kinetic_image_matrix
 from glotaran.builtin.models.kinetic_spectrum import KineticSpectrumModel
+from glotaran.builtin.models.kinetic_spectrum.kinetic_spectrum_model import expand_reduced_clps
+from glotaran.builtin.models.kinetic_spectrum.spectral_relations import SpectralRelation
 from glotaran.builtin.models.kinetic_spectrum.spectral_relations import (
     create_spectral_relation_matrix,
 )
@@ -134,3 +136,21 @@ def test_spectral_relation():
 
 if __name__ == "__main__":
     test_spectral_relation()
+
+
+def test_spectral_relation_applies_on_axis():
+    relation = SpectralRelation.from_dict(
+        {"compartment": "s1", "target": "s2", "parameter": "rel.1", "interval": [(1, 2), (4, 5)]}
+    )
+    axis = np.arange(7.0)
+    assert np.array_equal(relation.applies(axis), [False, True, True, False, True, True, False])
+    assert [relation.applies(index) for index in axis] == relation.applies(axis).tolist()
+
+
+def test_expand_reduced_clps():
+    clp_labels = [["s1", "s2", "s3"]] * 3
+    reduced_clp_labels = [["s1", "s3"], ["s3", "s2"], ["s1", "s3"]]
+    reduced_clps = [np.asarray([1.0, 3.0]), np.asarray([6.0, 5.0]), np.asarray([7.0, 9.0])]
+
+    clps = expand_reduced_clps(clp_labels, reduced_clp_labels, reduced_clps)
+    assert np.array_equal(clps, [[1, 0, 3], [0, 5, 6], [7, 0, 9]])
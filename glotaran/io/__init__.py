@@ -8,6 +8,7 @@ reexports functions from the pluginsystem from a common place.
 
 from glotaran.io.interface import DataIoInterface
 from glotaran.io.interface import ProjectIoInterface
+from glotaran.io.prepare_dataset import add_svd_to_dataset
 from glotaran.io.prepare_dataset import prepare_time_trace_dataset
 from glotaran.plugin_system.data_io_registration import data_io_plugin_table
 from glotaran.plugin_system.data_io_registration import get_dataloader
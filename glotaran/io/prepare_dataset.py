@@ -8,6 +8,8 @@ def prepare_time_trace_dataset(
     dataset: typing.Union[xr.DataArray, xr.Dataset],
     weight: np.ndarray = None,
     irf: typing.Union[np.ndarray, xr.DataArray] = None,
+    add_svd: bool = True,
+    number_of_singular_vectors: typing.Optional[int] = None,
 ) -> xr.Dataset:
     """Prepares a time trace for global analysis.
 
@@ -19,16 +21,18 @@ def prepare_time_trace_dataset(
         A weight for the dataset.
     irf :
         An IRF for the dataset.
+    add_svd :
+        If `True`, the singular value decomposition of the data is added to the dataset.
+    number_of_singular_vectors :
+        If given, only this number of singular vectors is calculated.
+        See :func:`add_svd_to_dataset`.
     """
 
     if isinstance(dataset, xr.DataArray):
         dataset = dataset.to_dataset(name="data")
 
-    if "data_singular_values" not in dataset:
-        l, s, r = np.linalg.svd(dataset.data, full_matrices=False)
-        dataset["data_left_singular_vectors"] = (("time", "left_singular_value_index"), l)
-        dataset["data_singular_values"] = (("singular_value_index"), s)
-        dataset["data_right_singular_vectors"] = (("right_singular_value_index", "spectral"), r)
+    if add_svd and "data_singular_values" not in dataset:
+        add_svd_to_dataset(dataset, "data", number_of_singular_vectors)
 
     if weight is not None:
         dataset["weight"] = (dataset.data.dims, weight)
@@ -43,3 +47,73 @@ def prepare_time_trace_dataset(
             dataset["irf"] = irf
 
     return dataset
+
+
+def add_svd_to_dataset(
+    dataset: xr.Dataset,
+    name: str = "data",
+    number_of_singular_vectors: typing.Optional[int] = None,
+):
+    """Adds the singular value decomposition of a 2-dimensional variable to the dataset.
+
+    The decomposition is added as `{name}_left_singular_vectors`, `{name}_singular_values`
+    and `{name}_right_singular_vectors`.
+
+    Parameters
+    ----------
+    dataset :
+        The dataset.
+    name :
+        The name of the variable to decompose.
+    number_of_singular_vectors :
+        If given, only the singular vectors of the largest singular values are calculated with
+        a randomized algorithm, which is much faster than the full decomposition for large data.
+    """
+    data = dataset[name]
+    l, s, r = calculate_svd(data.values, number_of_singular_vectors)
+    dataset[f"{name}_left_singular_vectors"] = ((data.dims[0], "left_singular_value_index"), l)
+    dataset[f"{name}_singular_values"] = (("singular_value_index"), s)
+    dataset[f"{name}_right_singular_vectors"] = (
+        ("right_singular_value_index", data.dims[1]),
+        r,
+    )
+
+
+def calculate_svd(
+    data: np.ndarray, number_of_singular_vectors: typing.Optional[int] = None
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculates the (truncated) singular value decomposition of a matrix.
+
+    The truncated decomposition is calculated with the randomized range finder of Halko,
+    Martinsson and Tropp with a fixed seed, so the result is reproducible.
+
+    Parameters
+    ----------
+    data :
+        The matrix to decompose.
+    number_of_singular_vectors :
+        The number of singular vectors to calculate. If `None`, the full decomposition is
+        calculated.
+
+    Returns
+    -------
+    typing.Tuple[np.ndarray, np.ndarray, np.ndarray]
+        The left singular vectors, the singular values and the right singular vectors.
+    """
+    if number_of_singular_vectors is None or number_of_singular_vectors >= min(data.shape):
+        return np.linalg.svd(data, full_matrices=False)
+
+    oversampling = 10
+    power_iterations = 4
+    sketch_size = min(number_of_singular_vectors + oversampling, min(data.shape))
+    rng = np.random.default_rng(0)
+    basis = np.linalg.qr(data @ rng.standard_normal((data.shape[1], sketch_size)))[0]
+    for _ in range(power_iterations):
+        basis = np.linalg.qr(data.T @ basis)[0]
+        basis = np.linalg.qr(data @ basis)[0]
+    l, s, r = np.linalg.svd(basis.T @ data, full_matrices=False)
+    return (
+        basis @ l[:, :number_of_singular_vectors],
+        s[:number_of_singular_vectors],
+        r[:number_of_singular_vectors],
+    )
@@ -27,6 +27,7 @@ class Model:
     model_dimension: str
     global_dimension: str
     global_matrix = None
+    matrices = None
     finalize_data: FinalizeFunction | None = ...
     grouped: Callable[[], bool]
     index_dependent: Callable[[], bool]
@@ -13,6 +13,8 @@ from glotaran.plugin_system.model_registration import register_model
 if TYPE_CHECKING:
     from typing import Any
     from typing import Callable
+    from typing import Hashable
+    from typing import Optional
     from typing import Tuple
     from typing import Type
     from typing import Union
@@ -33,6 +35,17 @@ if TYPE_CHECKING:
     ]
     """A `MatrixFunction` calculates the matrix for a model."""
 
+    MatricesFunction = Callable[
+        [Type[DatasetDescriptor], np.ndarray, np.ndarray],
+        Optional[Tuple[List[str], np.ndarray]],
+    ]
+    """A `MatricesFunction` calculates the matrices for all indices of the global axis."""
+
+    MatrixDerivativesFunction = Callable[
+        [Type[DatasetDescriptor], np.ndarray], Dict[str, np.ndarray]
+    ]
+    """A `MatrixDerivativesFunction` calculates the derivatives of the matrix by parameters."""
+
     GlobalMatrixFunction = Callable[
         [Type[DatasetDescriptor], np.ndarray], Tuple[List[str], np.ndarray]
     ]
@@ -57,6 +70,9 @@ if TYPE_CHECKING:
     ]
     """A `RetrieveClpFunction` retrieves the full set of clp from a reduced set."""
 
+    MatrixSignatureFunction = Callable[[Type[Model], str, Any], Optional[Hashable]]
+    """A `MatrixSignatureFunction` returns a signature of the reduced matrix at an index."""
+
     FinalizeFunction = Callable[[Problem, Dict[str, xr.Dataset]], None]
     """A `FinalizeFunction` gets called after optimization."""
 
@@ -74,6 +90,9 @@ if TYPE_CHECKING:
     ]
     """A `PenaltyFunction` calculates additional penalties for the optimization."""
 
+    PreparePenaltyFunction = Callable[[Type[Model], Problem], Any]
+    """A `PreparePenaltyFunction` precomputes the structure of the additional penalties."""
+
 
 def model(
     model_type: str,
@@ -81,14 +100,19 @@ def model(
     dataset_type: type[DatasetDescriptor] = DatasetDescriptor,
     megacomplex_type: Any = None,
     matrix: MatrixFunction | IndexDependentMatrixFunction = None,
+    matrices: MatricesFunction = None,
+    matrix_derivatives: MatrixDerivativesFunction = None,
     global_matrix: GlobalMatrixFunction = None,
     model_dimension: str = None,
     global_dimension: str = None,
     has_matrix_constraints_function: Callable[[type[Model]], bool] = None,
     constrain_matrix_function: ConstrainMatrixFunction = None,
     retrieve_clp_function: RetrieveClpFunction = None,
+    matrix_signature_function: MatrixSignatureFunction = None,
     has_additional_penalty_function: Callable[[type[Model]], bool] = None,
     additional_penalty_function: PenaltyFunction = None,
+    additional_penalty_size_function: Callable[[type[Model]], int] = None,
+    prepare_additional_penalty_function: PreparePenaltyFunction = None,
     finalize_data_function: FinalizeFunction = None,
     grouped: bool | Callable[[type[Model]], bool] = False,
     index_dependent: bool | Callable[[type[Model]], bool] = False,
@@ -112,6 +136,18 @@ def model(
         :func:`glotaran.model.model_attribute` decorator, by default None
     matrix : Union[MatrixFunction, IndexDependentMatrixFunction], optional
         A function to calculate the matrix for the model, by default None
+    matrices : MatricesFunction, optional
+        A function to calculate the matrices of an index dependent model for all indices of the
+        global axis at once, by default None. It returns the clp labels, which must be the same
+        for all indices, and an array of shape (global index, model index, clp) or `None` to
+        fall back to `matrix`.
+    matrix_derivatives : MatrixDerivativesFunction, optional
+        A function to calculate the derivatives of the matrix of an index independent model by
+        its parameters, by default None. It returns a dictionary of the derivatives by the full
+        labels of the parameters, with the shape and clp labels of the matrix. A parameter must
+        only be included if the derivative captures every dependency of the matrix on it. The
+        derivatives are used to calculate the variable projection Jacobian, all other
+        parameters are derived by finite differences.
     global_matrix : GlobalMatrixFunction, optional
         A function to calculate the global matrix for the model, by default None
     model_dimension : str, optional
@@ -124,10 +160,23 @@ def model(
         A function to constrain the global matrix for the model, by default None
     retrieve_clp_function : RetrieveClpFunction, optional
         A function to retrieve the full clp from the reduced, by default None
+    matrix_signature_function : MatrixSignatureFunction, optional
+        A function which returns for a dataset label and an index on the global axis a
+        signature of the reduced matrix of an index dependent model, by default None.
+        Indices with the same signature must have the same reduced matrix, which is then
+        calculated only once. If it returns `None` for any index, the matrix of the dataset
+        is calculated for every index.
     has_additional_penalty_function : Callable[[Type[Model]], bool], optional
         True if model has a additional_penalty_function set, by default None
     additional_penalty_function : PenaltyFunction, optional
         A function to calculate additional penalties when optimizing the model, by default None
+    additional_penalty_size_function : Callable[[Type[Model]], int], optional
+        A function which returns the number of additional penalties of the model, by default
+        None. If set, the buffer for the penalty is allocated once when a problem is created.
+    prepare_additional_penalty_function : PreparePenaltyFunction, optional
+        A function which is called once with the problem when a problem is created, by default
+        None. Its result is passed to the `additional_penalty_function` as keyword argument
+        `prepared`, so the penalty function does not need to recompute it on every evaluation.
     finalize_data_function : FinalizeFunction, optional
         A function to finalize data after optimization, by default None
     grouped : Union[bool, Callable[[Type[Model]], bool]], optional
@@ -181,6 +230,14 @@ def model(
             setattr(cls, "constrain_matrix_function", None)
             setattr(cls, "retrieve_clp_function", None)
 
+        if matrix_signature_function:
+            m_sig = wrap_func_as_method(cls, name="matrix_signature_function")(
+                matrix_signature_function
+            )
+            setattr(cls, "matrix_signature_function", m_sig)
+        else:
+            setattr(cls, "matrix_signature_function", None)
+
         if has_additional_penalty_function:
             if not additional_penalty_function:
                 raise ValueError(
@@ -195,9 +252,25 @@ def model(
             )
             setattr(cls, "additional_penalty_function", pen)
             setattr(cls, "has_additional_penalty_function", has_pen)
+            if additional_penalty_size_function:
+                pen_size = wrap_func_as_method(cls, name="additional_penalty_size_function")(
+                    additional_penalty_size_function
+                )
+                setattr(cls, "additional_penalty_size_function", pen_size)
+            else:
+                setattr(cls, "additional_penalty_size_function", None)
+            if prepare_additional_penalty_function:
+                prepare_pen = wrap_func_as_method(cls, name="prepare_additional_penalty_function")(
+                    prepare_additional_penalty_function
+                )
+                setattr(cls, "prepare_additional_penalty_function", prepare_pen)
+            else:
+                setattr(cls, "prepare_additional_penalty_function", None)
         else:
             setattr(cls, "has_additional_penalty_function", None)
             setattr(cls, "additional_penalty_function", None)
+            setattr(cls, "additional_penalty_size_function", None)
+            setattr(cls, "prepare_additional_penalty_function", None)
 
         setattr(
             cls,
@@ -215,6 +288,20 @@ def model(
         mat = staticmethod(mat)
         setattr(cls, "matrix", mat)
 
+        if matrices:
+            mats = wrap_func_as_method(cls, name="matrices")(matrices)
+            mats = staticmethod(mats)
+            setattr(cls, "matrices", mats)
+        else:
+            setattr(cls, "matrices", None)
+
+        if matrix_derivatives:
+            mat_der = wrap_func_as_method(cls, name="matrix_derivatives")(matrix_derivatives)
+            mat_der = staticmethod(mat_der)
+            setattr(cls, "matrix_derivatives", mat_der)
+        else:
+            setattr(cls, "matrix_derivatives", None)
+
         if model_dimension is None:
             raise ValueError(f"Model dimension not specified for model {model_type}")
         setattr(cls, "model_dimension", model_dimension)
@@ -248,6 +248,13 @@ class Parameter:
                 )
         return self._transformed_expression
 
+    @property
+    def expression_parameter_labels(self) -> list[str]:
+        """The full labels of the parameters used in the expression."""
+        if self.expression is None:
+            return []
+        return [match[1:] for match in Parameter._find_parameter.findall(self.expression)]
+
     @property
     def standard_error(self) -> float:
         """The standard error of the optimized parameter."""
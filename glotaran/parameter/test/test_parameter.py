@@ -277,6 +277,12 @@ def test_transform_expression(case):
     assert parameter.transformed_expression == wanted_parameters
 
 
+def test_expression_parameter_labels():
+    assert Parameter().expression_parameter_labels == []
+    parameter = Parameter(expression="$group.sub_group.param1 + exp($kinetic6) - $1")
+    assert parameter.expression_parameter_labels == ["group.sub_group.param1", "kinetic6", "1"]
+
+
 def test_label_validator():
     valid_names = [
         "1",
@@ -2,6 +2,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Mapping
 
 import numpy as np
 import xarray as xr
@@ -22,13 +23,14 @@ class Result:
     additional_penalty: np.ndarray | None
     """A vector with the value for each additional penalty, or None"""
     cost: ArrayLike
-    data: dict[str, xr.Dataset]
+    data: Mapping[str, xr.Dataset]
     """The resulting data as a dictionary of :xarraydoc:`Dataset`.
 
     Notes
     -----
     The actual content of the data depends on the actual model and can be found in the
     documentation for the model.
+    If the scheme requests lazy result data, the datasets are created on first access.
     """
     free_parameter_labels: list[str]
     """List of labels of the free parameters used in optimization."""
@@ -104,10 +106,16 @@ class Result:
             data=data,
             group_tolerance=self.scheme.group_tolerance,
             non_negative_least_squares=self.scheme.non_negative_least_squares,
+            variable_projection_jacobian=self.scheme.variable_projection_jacobian,
+            jacobian_sparsity=self.scheme.jacobian_sparsity,
             maximum_number_function_evaluations=self.scheme.maximum_number_function_evaluations,
             ftol=self.scheme.ftol,
             gtol=self.scheme.gtol,
             xtol=self.scheme.xtol,
+            number_of_threads=self.scheme.number_of_threads,
+            add_svd=self.scheme.add_svd,
+            number_of_singular_vectors=self.scheme.number_of_singular_vectors,
+            lazy_result_data=self.scheme.lazy_result_data,
             optimization_method=self.scheme.optimization_method,
         )
 
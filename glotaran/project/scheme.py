@@ -34,10 +34,32 @@ class Scheme:
     data: dict[str, xr.DataArray | xr.Dataset | str]
     group_tolerance: float = 0.0
     non_negative_least_squares: bool = False
+    #: Use the Kaufman approximation of the variable projection jacobian instead of finite
+    #: differences of the full residual. The derivatives of the matrices are analytic where the
+    #: model provides them (e.g. for the rates and irf of index independent kinetic models) and
+    #: forward differences of the reduced matrices for all other parameters.
+    variable_projection_jacobian: bool = False
+    #: Pass the sparsity structure of the jacobian to the optimizer, so that the finite
+    #: differences of independent parameters are evaluated together. Only used with the
+    #: 'TrustRegionReflection' and 'Dogbox' methods and without a variable projection jacobian.
+    jacobian_sparsity: bool = False
     maximum_number_function_evaluations: int = None
     ftol: float = 1e-8
     gtol: float = 1e-8
     xtol: float = 1e-8
+    #: The number of threads used to calculate the matrices and residuals. With more than one
+    #: thread, the problem runs the calculations on a thread pool, which is shut down after
+    #: the optimization.
+    number_of_threads: int = 1
+    #: Add the singular value decompositions of the data, the residual and the weighted
+    #: residual to the result datasets.
+    add_svd: bool = True
+    #: If given, only this number of singular vectors of the largest singular values is
+    #: calculated with a randomized algorithm, which is much faster for large data.
+    number_of_singular_vectors: int | None = None
+    #: Create the result dataset of a dataset only when it is accessed. The result keeps the
+    #: problem until all datasets have been accessed.
+    lazy_result_data: bool = False
     optimization_method: Literal[
         "TrustRegionReflection",
         "Dogbox",